@@ -3,6 +3,14 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The streaming recipe endpoint (``/api/recipes/stream/``) is an async view and
+should be served through this entry point, e.g.::
+
+    gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker
+
+so that open generations are coroutines on the event loop instead of
+occupying a sync worker each.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -159,13 +159,14 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'if-none-match',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
 
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'ETag']
 
 # CSRF settings
 CSRF_TRUSTED_ORIGINS = [
@@ -185,13 +186,141 @@ SESSION_COOKIE_SAMESITE = 'None'  # Required for cross-origin requests
 SESSION_COOKIE_SECURE = True  # Required when SameSite is None
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_DOMAIN = None  # Allow the cookie to be sent to any domain
+# "django.contrib.sessions.backends.db" reads the session table on every
+# request. "...cached_db" serves reads from SESSION_CACHE_ALIAS; point that
+# at a cache shared by all workers, or a logout in one worker isn't seen by
+# the others. "...signed_cookies" needs no storage at all, but a copied
+# cookie stays valid until it expires even after logout.
+SESSION_ENGINE = os.environ.get("SESSION_ENGINE", "django.contrib.sessions.backends.db")
+SESSION_CACHE_ALIAS = os.environ.get("SESSION_CACHE_ALIAS", "default")
+
+# Authentication
+# AccountBackend loads request.user together with its Account. ModelBackend
+# stays listed so sessions created before it keep working.
+AUTHENTICATION_BACKENDS = [
+    'core.backends.AccountBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+# Seconds a user (with account) loaded for authentication is reused from
+# the default cache. Entries are keyed by the user's account data version,
+# read from the database on each request, so a save in any worker is seen at
+# once; 0 disables it.
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get("AUTH_USER_CACHE_TIMEOUT", "0"))
+# Lifetime of the signed API tokens from /api/auth/token/
+API_TOKEN_MAX_AGE = int(os.environ.get("API_TOKEN_MAX_AGE", str(60 * 60 * 24 * 7)))
 
 # REST Framework settings
+# JSON encoding of API requests and responses: "stdlib" (DRF's json-based
+# renderer/parser) or "orjson" (core/renderers.py; same output, and falls
+# back to stdlib when the optional orjson package isn't installed)
+API_JSON_BACKEND = os.environ.get("API_JSON_BACKEND", "stdlib")
+JSON_BACKENDS = {
+    'stdlib': ('rest_framework.renderers.JSONRenderer', 'rest_framework.parsers.JSONParser'),
+    'orjson': ('core.renderers.ORJSONRenderer', 'core.renderers.ORJSONParser'),
+}
+JSON_RENDERER, JSON_PARSER = JSON_BACKENDS[API_JSON_BACKEND]
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'core.authentication.SignedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        JSON_RENDERER,
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        JSON_PARSER,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Per-user cache of rendered ingredient/recipe list pages
+# (core/response_cache.py). Pages are keyed by ETags built from the data
+# versions in the database, so a write in any worker retires the pages every
+# worker cached. The "lists" alias is per process and holds at most
+# LIST_CACHE_MAX_ENTRIES pages of at most LIST_CACHE_MAX_ENTRY_BYTES; point
+# LIST_CACHE_ALIAS at a shared cache to also share the pages themselves.
+LIST_CACHE_ENABLED = os.environ.get("LIST_CACHE_ENABLED", "1") == "1"
+LIST_CACHE_ALIAS = os.environ.get("LIST_CACHE_ALIAS", "lists")
+LIST_CACHE_TTL = int(os.environ.get("LIST_CACHE_TTL", "300"))
+LIST_CACHE_MAX_ENTRIES = int(os.environ.get("LIST_CACHE_MAX_ENTRIES", "2000"))
+LIST_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("LIST_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'lists': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'list-pages',
+        'TIMEOUT': LIST_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': LIST_CACHE_MAX_ENTRIES},
+    },
+}
+
+# Largest list accepted by the bulk ingredient endpoint
+INGREDIENT_BULK_MAX = int(os.environ.get("INGREDIENT_BULK_MAX", "200"))
+# Rows per bulk_create batch when importing receipts/CSV files
+INGREDIENT_IMPORT_BATCH_SIZE = int(os.environ.get("INGREDIENT_IMPORT_BATCH_SIZE", "500"))
+# manage.py sweep_expiry --suggest queues a "use it up" batch for users with
+# at least this many items expiring within three days
+EXPIRY_SUGGEST_MIN_ITEMS = int(os.environ.get("EXPIRY_SUGGEST_MIN_ITEMS", "2"))
+
+
+# Groq (upstream LLM) settings
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+GROQ_API_URL = os.environ.get("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_POOL_SIZE = int(os.environ.get("GROQ_POOL_SIZE", "10"))
+GROQ_CONNECT_TIMEOUT = float(os.environ.get("GROQ_CONNECT_TIMEOUT", "3.05"))
+GROQ_READ_TIMEOUT = float(os.environ.get("GROQ_READ_TIMEOUT", "60"))
+GROQ_MAX_RETRIES = int(os.environ.get("GROQ_MAX_RETRIES", "2"))
+GROQ_MAX_CONCURRENCY = int(os.environ.get("GROQ_MAX_CONCURRENCY", "16"))
+GROQ_BREAKER_THRESHOLD = int(os.environ.get("GROQ_BREAKER_THRESHOLD", "5"))
+GROQ_BREAKER_RESET = float(os.environ.get("GROQ_BREAKER_RESET", "30"))
+
+
+# Generated recipe response cache: "memory", "django" or "db"
+RECIPE_CACHE_BACKEND = os.environ.get("RECIPE_CACHE_BACKEND", "memory")
+RECIPE_CACHE_ALIAS = os.environ.get("RECIPE_CACHE_ALIAS", "default")
+RECIPE_CACHE_TTL = int(os.environ.get("RECIPE_CACHE_TTL", "3600"))
+RECIPE_CACHE_MAX_ENTRIES = int(os.environ.get("RECIPE_CACHE_MAX_ENTRIES", "1000"))
+
+# Coalescing of identical in-flight generations: "thread", "file" or "db".
+# The cross-process modes hand results over through the response cache, so
+# pair them with RECIPE_CACHE_BACKEND "django" or "db".
+RECIPE_SINGLEFLIGHT = os.environ.get("RECIPE_SINGLEFLIGHT", "thread")
+RECIPE_SINGLEFLIGHT_TIMEOUT = float(os.environ.get("RECIPE_SINGLEFLIGHT_TIMEOUT", "90"))
+RECIPE_SINGLEFLIGHT_LOCK_DIR = os.environ.get("RECIPE_SINGLEFLIGHT_LOCK_DIR")
+
+# Token budget for the fridge section of server-built generation prompts
+RECIPE_FRIDGE_TOKEN_BUDGET = int(os.environ.get("RECIPE_FRIDGE_TOKEN_BUDGET", "600"))
+
+# Batch generation (manage.py generation_worker)
+RECIPE_BATCH_MAX_JOBS = int(os.environ.get("RECIPE_BATCH_MAX_JOBS", "21"))
+RECIPE_WORKER_CONCURRENCY = int(os.environ.get("RECIPE_WORKER_CONCURRENCY", "8"))
+RECIPE_JOB_MAX_ATTEMPTS = int(os.environ.get("RECIPE_JOB_MAX_ATTEMPTS", "3"))
+RECIPE_JOB_LEASE = int(os.environ.get("RECIPE_JOB_LEASE", "300"))
+
+# Rate limiting for the LLM proxy and auth endpoints (core/throttling.py):
+# "memory" (per process) or "cache" (shared through RATE_LIMIT_CACHE_ALIAS)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_CACHE_ALIAS = os.environ.get("RATE_LIMIT_CACHE_ALIAS", "default")
+RATE_LIMITS = {
+    'llm': {'capacity': 5, 'refill_per_second': 5 / 60},    # bursts of 5, 5 per minute sustained
+    'auth': {'capacity': 10, 'refill_per_second': 10 / 60},
 }
+LLM_DEFAULT_MAX_TOKENS = 600
+# Largest max_tokens a single generation may ask for
+LLM_MAX_TOKENS = int(os.environ.get("LLM_MAX_TOKENS", "4096"))
+LLM_DAILY_TOKEN_BUDGET = int(os.environ.get("LLM_DAILY_TOKEN_BUDGET", "60000"))
+LLM_MAX_CONCURRENT_PER_USER = int(os.environ.get("LLM_MAX_CONCURRENT_PER_USER", "2"))
+
+# Upstream latency/token accounting (recipes_api/metrics.py). METRICS_TOKEN
+# lets a Prometheus scraper read /api/recipes/metrics/ with a bearer token.
+UPSTREAM_METRICS_ENABLED = os.environ.get("UPSTREAM_METRICS_ENABLED", "True").lower() == "true"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Account, Ingredient, Recipe
+from .models import Account, Ingredient, Recipe, RecipeIngredient
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
@@ -30,9 +30,23 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    fields = ('position', 'name', 'normalized_name', 'quantity', 'amount', 'unit')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('title', 'user', 'created_at', 'favorite')
     list_filter = ('created_at','favorite',)
-    search_fields = ('title', 'user__username', 'ingredients')
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    # Ingredient search goes through the indexed RecipeIngredient rows
+    # rather than a text scan of the JSON column
+    search_fields = ('title', 'user__username', '^ingredient_rows__normalized_name')
+    readonly_fields = ('created_at', 'updated_at')
+    inlines = [RecipeIngredientInline]
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Stateless signed-token authentication for API clients.
+
+A token is the user id and a prefix of the user's session auth hash,
+signed with SECRET_KEY and timestamped (django.core.signing). Checking one
+needs no token table; the user comes from core.backends.load_user, so with
+AUTH_USER_CACHE_TIMEOUT set a token request costs one version lookup instead
+of the user query. Changing the password changes the hash and revokes every
+token issued before, in every worker, since the cached user is keyed by the
+account version that the save bumps.
+Token requests skip CSRF, which only applies to session authentication.
+"""
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .backends import load_user
+
+TOKEN_SALT = 'core.authentication.SignedTokenAuthentication'
+HASH_PREFIX = 16
+
+
+def issue_token(user):
+    return signing.dumps(
+        {'u': user.pk, 'h': user.get_session_auth_hash()[:HASH_PREFIX]}, salt=TOKEN_SALT, compress=True,
+    )
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authorization: Token <token from /api/auth/token/>
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            data = signing.loads(auth[1].decode(), salt=TOKEN_SALT, max_age=settings.API_TOKEN_MAX_AGE)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        except (signing.BadSignature, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        user = load_user(data.get('u'))
+        if (user is None or not user.is_active
+                or not constant_time_compare(data.get('h', ''), user.get_session_auth_hash()[:HASH_PREFIX])):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return user, auth[1].decode()
+
+    def authenticate_header(self, request):
+        return self.keyword
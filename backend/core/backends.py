@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .versions import ACCOUNT, current
+
+ACCOUNT_BACKEND = 'core.backends.AccountBackend'
+
+
+def load_user(user_id):
+    """
+    The user with its Account joined, so request.user.account costs no
+    extra query. With AUTH_USER_CACHE_TIMEOUT set it comes from the cache,
+    under a key that includes the user's account data version. That version
+    is read from the database on every call, so any User or Account save (a
+    password change, deactivation, new allergies) in any worker moves it to
+    a fresh key.
+    """
+    UserModel = get_user_model()
+    timeout = settings.AUTH_USER_CACHE_TIMEOUT
+    if timeout:
+        key = "auth-user:%s:%s" % (user_id, *current(user_id, ACCOUNT))
+        user = cache.get(key)
+        if user is not None:
+            return user
+    try:
+        user = UserModel._default_manager.select_related('account').get(pk=user_id)
+    except (UserModel.DoesNotExist, ValueError, TypeError):
+        return None
+    if timeout:
+        cache.set(key, user, timeout)
+    return user
+
+
+class AccountBackend(ModelBackend):
+    """
+    ModelBackend that loads the session's user through load_user().
+    """
+
+    def get_user(self, user_id):
+        user = load_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
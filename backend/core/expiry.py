@@ -0,0 +1,133 @@
+"""
+Per-user expiry digests: counts of expired / expiring-soon / expiring-this-
+week ingredients plus the soonest items, computed for a given day.
+
+The sweeper streams only the ingredients inside the one-week window, in
+(user, expiration_date) order, folding each row into the current user's
+digest, and writes digests in batches; memory is bounded by the batch
+size, not the table. Ingredient writes mark the user's digest stale, and
+get_digest() recomputes a missing or stale one for that user alone. A
+digest marked stale while it was being computed is not overwritten.
+"""
+from datetime import date, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ExpiryDigest, Ingredient
+
+SOON_DAYS = 3
+WEEK_DAYS = 7
+DIGEST_ITEMS = 20
+DIGEST_FIELDS = ['date', 'expired', 'expiring_soon', 'expiring_week', 'items', 'computed_at']
+
+
+def _add(digest, ingredient_id, name, expiration):
+    days_left = (expiration - digest.date).days
+    if days_left < 0:
+        digest.expired += 1
+        return
+    if days_left <= SOON_DAYS:
+        digest.expiring_soon += 1
+    else:
+        digest.expiring_week += 1
+    if len(digest.items) < DIGEST_ITEMS:
+        digest.items.append({
+            'id': ingredient_id, 'name': name,
+            'expiration_date': expiration.isoformat(), 'days_left': days_left,
+        })
+
+
+def _save(digests, started):
+    """
+    Write digests computed from rows read at `started`, except over ones
+    marked stale since then: the write that marked them may not be counted.
+    """
+    existing = set(
+        ExpiryDigest.objects.filter(user_id__in=[d.user_id for d in digests]).values_list('user_id', flat=True)
+    )
+    ExpiryDigest.objects.bulk_create([d for d in digests if d.user_id not in existing], ignore_conflicts=True)
+    # One conditional UPDATE, so a mark_stale() can't slip in between the
+    # check and the write
+    ExpiryDigest.objects.filter(Q(invalidated_at__isnull=True) | Q(invalidated_at__lt=started)).bulk_update(
+        [d for d in digests if d.user_id in existing], DIGEST_FIELDS,
+    )
+
+
+def window(today):
+    """
+    Ingredients the digests care about: everything expiring within a week,
+    including the already expired (counted, never listed).
+    """
+    return Ingredient.objects.filter(user__isnull=False, expiration_date__lte=today + timedelta(days=WEEK_DAYS))
+
+
+def sweep(today=None, chunk_size=5000, write_batch=500, progress=None):
+    """
+    Recompute every user's digest for `today`. Returns
+    (users with a digest, ingredients scanned).
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    rows = (
+        window(today)
+        .order_by('user_id', 'expiration_date', 'id')
+        .values_list('user_id', 'id', 'name', 'expiration_date')
+        .iterator(chunk_size=chunk_size)
+    )
+    pending = []
+    digest = None
+    users = scanned = 0
+
+    for user_id, ingredient_id, name, expiration in rows:
+        scanned += 1
+        if digest is None or user_id != digest.user_id:
+            if digest is not None:
+                pending.append(digest)
+            if len(pending) >= write_batch:
+                _save(pending, now)
+                pending.clear()
+            digest = ExpiryDigest(user_id=user_id, date=today, computed_at=now)
+            users += 1
+            if progress and users % 10000 == 0:
+                progress(users, scanned)
+        _add(digest, ingredient_id, name, expiration)
+    if digest is not None:
+        pending.append(digest)
+    if pending:
+        _save(pending, now)
+
+    # Users whose window emptied since the last run
+    ExpiryDigest.objects.filter(date__lt=today).delete()
+    return users, scanned
+
+
+def refresh(user, today=None):
+    """
+    Compute and store one user's digest (used when the sweeper hasn't run
+    today yet).
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    rows = (
+        window(today).filter(user=user)
+        .order_by('expiration_date', 'id')
+        .values_list('id', 'name', 'expiration_date')
+    )
+    digest = ExpiryDigest(user=user, date=today, computed_at=now)
+    for row in rows:
+        _add(digest, *row)
+    _save([digest], now)
+    return digest
+
+
+def get_digest(user, today=None):
+    today = today or timezone.localdate()
+    digest = ExpiryDigest.objects.filter(user=user).first()
+    if digest is None or digest.date != today:
+        digest = refresh(user, today)
+    return digest
+
+
+def mark_stale(user_id):
+    ExpiryDigest.objects.filter(user_id=user_id).update(date=date.min, invalidated_at=timezone.now())
@@ -0,0 +1,261 @@
+"""
+Streaming import of grocery lists into Ingredient rows.
+
+Accepts CSV (with a header naming the Ingredient fields, or positional
+name/quantity/unit/category/expiration_date columns), NDJSON (one object
+per line with the same keys) or plain text receipts (one item per line,
+e.g. "2 x Whole milk 1l  3.49"). Input is consumed line by line and
+written in bulk_create batches, so memory stays bounded by the batch size
+regardless of file length.
+"""
+import csv
+import json
+import math
+import re
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Ingredient
+from .signals import ingredients_bulk_changed
+from .units import normalize_unit
+
+CATEGORIES = {code for code, _ in Ingredient.CATEGORY}
+UNITS = {code for code, _ in Ingredient.UNITS}
+FIELDS = ('name', 'quantity', 'unit', 'category', 'expiration_date')
+
+# Shelf life assumed when an import row doesn't give an expiration date
+DEFAULT_SHELF_LIFE_DAYS = {
+    'VEG': 7, 'FRUIT': 7, 'LEGUME': 180, 'MUSH': 5, 'GRAIN': 365, 'BAKED': 5,
+    'PORK': 3, 'CHICKEN': 2, 'BEEF': 3, 'SEAFOOD': 2, 'EGG': 21, 'MEAT': 3,
+    'DAIRY': 10, 'H&S': 180, 'COND': 180, 'BEV': 30, 'ALCO': 365, 'OTHER': 14,
+}
+
+CATEGORY_KEYWORDS = {
+    'CHICKEN': 'chicken drumstick drumsticks wing wings thigh thighs',
+    'BEEF': 'beef steak mince brisket veal',
+    'PORK': 'pork bacon ham sausage sausages chorizo prosciutto',
+    'SEAFOOD': 'fish salmon tuna cod shrimp prawn prawns crab mussels squid tilapia',
+    'MEAT': 'lamb turkey duck venison salami',
+    'EGG': 'egg eggs',
+    'DAIRY': 'milk cheese cheddar mozzarella parmesan yogurt yoghurt butter cream kefir',
+    'ALCO': 'beer wine vodka whisky whiskey rum gin cider',
+    'BEV': 'juice soda water coffee tea cola lemonade',
+    'BAKED': 'bread bagel bagels bun buns croissant tortilla tortillas muffin baguette',
+    'GRAIN': 'rice pasta spaghetti noodles oats flour cereal quinoa couscous barley',
+    'LEGUME': 'bean beans lentil lentils chickpea chickpeas tofu peas',
+    'MUSH': 'mushroom mushrooms shiitake portobello',
+    'H&S': 'basil parsley cilantro coriander thyme oregano rosemary cumin paprika salt cinnamon mint',
+    'COND': 'sauce ketchup mustard mayo mayonnaise vinegar oil soy honey jam salsa',
+    'FRUIT': 'apple apples banana bananas orange oranges lemon lemons lime limes berries strawberries '
+             'blueberries grape grapes mango pear pears peach avocado',
+    'VEG': 'lettuce tomato tomatoes onion onions garlic carrot carrots potato potatoes spinach broccoli '
+           'pepper peppers cucumber cabbage celery zucchini kale cauliflower',
+}
+KEYWORD_CATEGORY = {word: category for category, words in CATEGORY_KEYWORDS.items() for word in words.split()}
+
+PRICE_RE = re.compile(r'\s*(?:[$€£]\s*)?\d+[.,]\d{2}\s*[A-Z]?\s*$')
+AMOUNT_RE = re.compile(r'(?<![\w.])(\d+(?:[.,]\d+)?)\s*([a-zA-Z]+)\b')
+COUNT_RE = re.compile(r'^\s*(\d+)\s*[xX]?\s+')
+WORD_RE = re.compile(r'[a-z]+')
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def detect_format(filename, content_type=''):
+    name = (filename or '').lower()
+    if name.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type:
+        return 'ndjson'
+    return 'text'
+
+
+def infer_category(name):
+    for word in WORD_RE.findall(name.lower()):
+        if word in KEYWORD_CATEGORY:
+            return KEYWORD_CATEGORY[word]
+    return 'OTHER'
+
+
+def parse_receipt_line(line):
+    """
+    Split a free-text line into name, quantity and unit. Trailing prices
+    are dropped, "2 x" prefixes become a piece count, and the first number
+    followed by a known unit is taken as the amount.
+    """
+    text = PRICE_RE.sub('', line).strip()
+    quantity, unit = None, None
+    for match in AMOUNT_RE.finditer(text):
+        unit = normalize_unit(match.group(2))
+        if unit:
+            quantity = float(match.group(1).replace(',', '.'))
+            text = (text[:match.start()] + text[match.end():]).strip()
+            break
+    count = COUNT_RE.match(text)
+    if count:
+        text = text[count.end():]
+        if quantity is None:
+            quantity, unit = float(count.group(1)), 'pc'
+        else:
+            quantity *= int(count.group(1))
+    name = ' '.join(text.strip(' -*,;:').split())
+    return {'name': name, 'quantity': quantity if quantity is not None else 1, 'unit': unit or 'pc'}
+
+
+def iter_records(lines, fmt):
+    """
+    Yield (line number, raw record dict) from an iterable of text lines.
+    """
+    if fmt == 'csv':
+        reader = csv.reader(lines)
+        header = None
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if header is None:
+                normalized = [cell.strip().lower() for cell in row]
+                if 'name' in normalized:
+                    header = normalized
+                    continue
+                header = list(FIELDS)
+            yield reader.line_num, dict(zip(header, (cell.strip() for cell in row)))
+    elif fmt == 'ndjson':
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield number, record if isinstance(record, dict) else {'_error': 'Invalid JSON object'}
+    else:
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                yield number, parse_receipt_line(line)
+
+
+def text_field(record, field):
+    """
+    A record's text value, stripped. NDJSON rows can hold any JSON type, so
+    anything but a string (or a missing value) is a row error.
+    """
+    value = record.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ImportRowError(f'Invalid {field}: expected text, got {type(value).__name__}')
+    return value.strip()
+
+
+def build_ingredient(record, user, today):
+    if '_error' in record:
+        raise ImportRowError(record['_error'])
+    name = text_field(record, 'name')
+    if not name:
+        raise ImportRowError('Missing name')
+    if len(name) > 100:
+        raise ImportRowError('Name longer than 100 characters')
+
+    quantity = record.get('quantity')
+    if isinstance(quantity, bool) or not isinstance(quantity, (int, float, str, type(None))):
+        raise ImportRowError(f'Invalid quantity: {quantity}')
+    try:
+        quantity = float(str(quantity).replace(',', '.')) if quantity not in (None, '') else 1.0
+    except ValueError:
+        raise ImportRowError(f'Invalid quantity: {quantity}')
+    if not math.isfinite(quantity):
+        raise ImportRowError(f'Invalid quantity: {quantity}')
+    if quantity <= 0:
+        raise ImportRowError('Quantity must be positive')
+
+    raw_unit = text_field(record, 'unit')
+    unit = normalize_unit(raw_unit) if raw_unit else 'pc'
+    if unit not in UNITS:
+        raise ImportRowError(f'Unknown unit: {raw_unit}')
+
+    category = text_field(record, 'category').upper() or infer_category(name)
+    if category not in CATEGORIES:
+        raise ImportRowError(f'Unknown category: {category}')
+
+    expiration = text_field(record, 'expiration_date')
+    if expiration:
+        try:
+            expiration = date.fromisoformat(expiration)
+        except ValueError:
+            raise ImportRowError(f'Invalid expiration_date: {expiration}')
+    else:
+        expiration = today + timedelta(days=DEFAULT_SHELF_LIFE_DAYS[category])
+
+    return Ingredient(
+        user=user, name=name, category=category, expiration_date=expiration, quantity=quantity, unit=unit,
+    )
+
+
+def import_ingredients(user, lines, fmt, dry_run=False, batch_size=None, max_errors=50, preview=10):
+    """
+    Parse `lines` and create the user's ingredients in batches inside one
+    transaction. Rows that fail validation are skipped and reported (the
+    first `max_errors` of them). With dry_run nothing is written and the
+    first `preview` parsed rows are returned instead.
+    """
+    batch_size = batch_size or settings.INGREDIENT_IMPORT_BATCH_SIZE
+    today = timezone.localdate()
+    report = {'format': fmt, 'dry_run': dry_run, 'rows': 0, 'created': 0, 'skipped': 0, 'errors': []}
+    sample = []
+    batch = []
+    started = time.perf_counter()
+
+    def flush():
+        if batch and not dry_run:
+            Ingredient.objects.bulk_create(batch, batch_size=batch_size)
+        report['created'] += len(batch)
+        batch.clear()
+
+    with transaction.atomic():
+        for number, record in iter_records(lines, fmt):
+            report['rows'] += 1
+            try:
+                ingredient = build_ingredient(record, user, today)
+            except ImportRowError as e:
+                report['skipped'] += 1
+                if len(report['errors']) < max_errors:
+                    report['errors'].append({'line': number, 'error': str(e)})
+                continue
+            if dry_run and len(sample) < preview:
+                sample.append({
+                    'name': ingredient.name, 'category': ingredient.category, 'quantity': ingredient.quantity,
+                    'unit': ingredient.unit, 'expiration_date': ingredient.expiration_date,
+                })
+            batch.append(ingredient)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+    elapsed = time.perf_counter() - started
+    report['elapsed_ms'] = round(elapsed * 1000, 1)
+    report['rows_per_second'] = round(report['rows'] / elapsed) if elapsed else None
+    if dry_run:
+        report['would_create'] = report.pop('created')
+        report['preview'] = sample
+        report['created'] = 0
+    elif report['created']:
+        ingredients_bulk_changed.send(sender=Ingredient, user_id=user.id)
+    return report
+
+
+def decode_lines(chunks, encoding='utf-8'):
+    """
+    Text lines from an iterable of byte lines (e.g. an UploadedFile).
+    """
+    first = True
+    for line in chunks:
+        text = line.decode(encoding, errors='replace')
+        if first:
+            text = text.lstrip('\ufeff')
+            first = False
+        yield text
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.matching import sync_recipe_ingredients
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Derive RecipeIngredient rows from every recipe's ingredients JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Recipes per batch")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipes = Recipe.objects.only('id', 'user_id', 'ingredients').order_by('pk')
+        last_pk = 0
+        processed = rows = 0
+        while True:
+            batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            rows += sync_recipe_ingredients(batch)
+            processed += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"{processed} recipes, {rows} ingredient rows")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {rows} rows for {processed} recipes"))
@@ -0,0 +1,86 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from core.authentication import issue_token
+
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+ACCOUNT_BACKEND = 'core.backends.AccountBackend'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-request authentication overhead for each auth option: ms and queries for a revalidated "
+        "(304) GET /api/auth/user/, which does no work beyond middleware and authentication, plus the "
+        "queries of a full 200 response that reads request.user.account. Uses a throwaway user inside "
+        "a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, requests):
+        user = User.objects.create_user(username='bench-auth', password='bench-auth')
+        token = issue_token(user)
+        db = 'django.contrib.sessions.backends.db'
+        cases = [
+            ('session db, ModelBackend', {'SESSION_ENGINE': db}, MODEL_BACKEND, None),
+            ('session db, AccountBackend', {'SESSION_ENGINE': db}, ACCOUNT_BACKEND, None),
+            ('session cached_db', {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db'},
+             ACCOUNT_BACKEND, None),
+            ('session signed_cookies', {'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies'},
+             ACCOUNT_BACKEND, None),
+            ('signed_cookies + user cache', {
+                'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+                'AUTH_USER_CACHE_TIMEOUT': 300,
+            }, ACCOUNT_BACKEND, None),
+            ('token', {}, None, token),
+            ('token + user cache', {'AUTH_USER_CACHE_TIMEOUT': 300}, None, token),
+        ]
+        self.stdout.write(f"{'auth':<32}{'ms/request':>12}{'queries':>10}{'queries (200)':>14}")
+        for label, overrides, backend, token in cases:
+            with override_settings(**overrides):
+                cache.clear()
+                client = Client()
+                headers = {'HTTP_ACCEPT': 'application/json'}
+                if token:
+                    headers['HTTP_AUTHORIZATION'] = f"Token {token}"
+                else:
+                    client.force_login(user, backend=backend)
+                tag = client.get('/api/auth/user/', **headers)['ETag']
+                headers['HTTP_IF_NONE_MATCH'] = tag
+
+                full = self.count_queries(client, {k: v for k, v in headers.items() if k != 'HTTP_IF_NONE_MATCH'})
+                queries = self.count_queries(client, headers)
+                started = time.perf_counter()
+                for _ in range(requests):
+                    client.get('/api/auth/user/', **headers)
+                elapsed = (time.perf_counter() - started) / requests
+            self.stdout.write(f"{label:<32}{elapsed * 1000:>12.3f}{queries:>10}{full:>14}")
+
+    def count_queries(self, client, headers):
+        queries = []
+
+        def count(execute, sql, *args):
+            queries.append(sql)
+            return execute(sql, *args)
+
+        with connection.execute_wrapper(count):
+            client.get('/api/auth/user/', **headers)
+        return len(queries)
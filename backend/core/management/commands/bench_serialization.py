@@ -0,0 +1,123 @@
+import io
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.models import Ingredient, Recipe
+from core.renderers import ORJSONParser, ORJSONRenderer
+from core.serializers import AccountSerializer, IngredientSerializer, RecipeSerializer, ValuesRenderer
+
+
+class Rollback(Exception):
+    pass
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-page CPU time and payload size of the list representations: model serializer, "
+        "values()-based rendering, and the compact variants; then JSON render/parse time of DRF's "
+        "stdlib renderer against the orjson one on ingredient, recipe and account payloads. Uses "
+        "throwaway rows inside a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['page_size'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, page_size, repeat):
+        user = User.objects.create_user(username='bench-serialization', email='bench@example.com',
+                                        first_name='Bench', last_name='Señora')
+        user.account.dietary_preferences = ['vegetarian', 'low-sodium']
+        user.account.allergies = ['peanuts', 'shellfish', 'sesame']
+        user.account.saved_recipes = list(range(200))
+        user.account.save()
+        Ingredient.objects.bulk_create([
+            Ingredient(user=user, name=f'Ingredient {i}', category='VEG', expiration_date='2030-01-01',
+                       quantity=i + 0.5, unit='g')
+            for i in range(page_size)
+        ])
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=user, title=f'Recipe {i}',
+                ingredients=[{'name': f'jalapeño {j}', 'quantity': f'{j} g'} for j in range(10)],
+                steps=[f'Step {j}: ' + 'stir and simmer gently — about 2–3 min ' * 4 for j in range(8)],
+            )
+            for i in range(page_size)
+        ])
+
+        cases = [
+            ('ingredients', Ingredient, IngredientSerializer, ('expiration_date', 'id')),
+            ('recipes', Recipe, RecipeSerializer, ('-created_at', '-id')),
+        ]
+        self.stdout.write(f"{'page':<12}{'representation':<24}{'ms/page':>10}{'bytes':>10}")
+        for label, model, serializer_class, ordering in cases:
+            queryset = model.objects.filter(user=user).order_by(*ordering)
+            variants = [
+                ('serializer', lambda: serializer_class(list(queryset[:page_size]), many=True).data),
+                ('values', self.values_fn(queryset, serializer_class, None, None, page_size)),
+                ('serializer compact', lambda: serializer_class(
+                    list(queryset[:page_size]), many=True,
+                    fields=serializer_class.compact_fields, expand=(),
+                ).data),
+                ('values compact', self.values_fn(
+                    queryset, serializer_class, serializer_class.compact_fields, (), page_size,
+                )),
+            ]
+            for name, fn in variants:
+                seconds, data = best_of(fn, repeat)
+                size = len(json.dumps(data, default=str))
+                self.stdout.write(f"{label:<12}{name:<24}{seconds * 1000:>10.3f}{size:>10}")
+
+        payloads = [
+            ('ingredients', IngredientSerializer(Ingredient.objects.filter(user=user), many=True).data),
+            ('recipes', RecipeSerializer(Recipe.objects.filter(user=user), many=True).data),
+            ('account', AccountSerializer(user.account).data),
+        ]
+        self.run_json(payloads, repeat)
+
+    def run_json(self, payloads, repeat):
+        if renderers.orjson is None:
+            self.stdout.write("\norjson is not installed; ORJSONRenderer falls back to the stdlib renderer.")
+        self.stdout.write(
+            f"\n{'payload':<12}{'bytes':>8}{'stdlib render':>15}{'orjson render':>15}"
+            f"{'stdlib parse':>14}{'orjson parse':>14}  (µs)"
+        )
+        for label, data in payloads:
+            stdlib_seconds, expected = best_of(lambda: JSONRenderer().render(data), repeat)
+            orjson_seconds, rendered = best_of(lambda: ORJSONRenderer().render(data), repeat)
+            if rendered != expected:
+                self.stderr.write(f"{label}: orjson output differs from the stdlib renderer")
+            parse_stdlib, _ = best_of(lambda: JSONParser().parse(io.BytesIO(expected)), repeat)
+            parse_orjson, _ = best_of(lambda: ORJSONParser().parse(io.BytesIO(expected)), repeat)
+            self.stdout.write(
+                f"{label:<12}{len(expected):>8}{stdlib_seconds * 1e6:>15.1f}{orjson_seconds * 1e6:>15.1f}"
+                f"{parse_stdlib * 1e6:>14.1f}{parse_orjson * 1e6:>14.1f}"
+            )
+
+    def values_fn(self, queryset, serializer_class, fields, expand, page_size):
+        renderer = ValuesRenderer(serializer_class, fields=fields, expand=expand)
+        return lambda: renderer.render(queryset.values(*renderer.lookups)[:page_size])
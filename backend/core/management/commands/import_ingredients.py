@@ -0,0 +1,30 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import detect_format, import_ingredients
+
+
+class Command(BaseCommand):
+    help = "Import a CSV, NDJSON or plain-text receipt file into a user's ingredients"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson', 'text'], help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, help="Rows per bulk_create batch")
+        parser.add_argument('--dry-run', action='store_true', help="Parse and validate without writing")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']}")
+
+        fmt = options['format'] or detect_format(options['path'])
+        with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+            report = import_ingredients(
+                user, lines, fmt, dry_run=options['dry_run'], batch_size=options['batch_size'],
+            )
+        self.stdout.write(json.dumps(report, indent=2, default=str))
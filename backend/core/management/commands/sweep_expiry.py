@@ -0,0 +1,63 @@
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.expiry import sweep
+from core.models import ExpiryDigest
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute every user's expiry digest for today. Schedule it nightly (cron, systemd timer). "
+        "With --suggest, also queue a \"use it up\" recipe batch for users with items about to expire."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Compute digests as of this ISO date instead of today")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows fetched per database round trip")
+        parser.add_argument('--suggest', action='store_true', help="Queue use-it-up generation batches")
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD")
+
+        started = time.perf_counter()
+        users, scanned = sweep(
+            today, chunk_size=options['chunk_size'],
+            progress=lambda users, scanned: self.stdout.write(f"{users} users, {scanned} ingredients"),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {users} digests from {scanned} ingredients in {elapsed:.1f}s"
+        ))
+
+        if options['suggest']:
+            queued = self.suggest(today)
+            self.stdout.write(self.style.SUCCESS(f"Queued {queued} use-it-up batch(es)"))
+
+    def suggest(self, today):
+        from recipes_api.jobs import submit_batch
+        from recipes_api.serializers import RecipeGenerateSerializer
+
+        digests = (
+            ExpiryDigest.objects.filter(date=today, expiring_soon__gte=settings.EXPIRY_SUGGEST_MIN_ITEMS)
+            .exclude(suggested_on=today)
+            .select_related('user')
+        )
+        queued = 0
+        for digest in digests.iterator(chunk_size=500):
+            names = [item['name'] for item in digest.items if item['days_left'] <= 3][:8]
+            serializer = RecipeGenerateSerializer(data={
+                'type': 'Any', 'cuisine': 'Any', 'time': 'Any', 'style': 'Any',
+                'notes': f"Use up soon: {', '.join(names)}."[:500],
+            })
+            serializer.is_valid(raise_exception=True)
+            submit_batch(digest.user, [serializer.validated_data])
+            ExpiryDigest.objects.filter(pk=digest.pk).update(suggested_on=today)
+            queued += 1
+        return queued
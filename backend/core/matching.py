@@ -0,0 +1,292 @@
+"""
+"What can I cook now": ranks a user's saved recipes by how much of each
+the current fridge covers.
+
+Each user gets an in-process inverted index over their recipes'
+ingredient names (token -> ingredient entries). A query looks up every
+fridge item once, collects the matched
+entries as sets, and accumulates per-recipe counts from those sets, so the
+cost follows the number of matches rather than recipes x fridge items.
+Each index is tagged with the user's recipe ingredients data version
+(core/versions.py), which lives in the database: writes that change a
+recipe's ingredients bump it and update this process's index in place once
+they commit, and processes that didn't see the write find the version moved
+on and rebuild.
+
+The same name normalization feeds the RecipeIngredient rows derived from
+each recipe's ingredients JSON.
+"""
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Ingredient, Recipe, RecipeIngredient
+from .units import COUNT, DIMENSIONS, MASS, VOLUME, normalize_amount
+from .versions import RECIPE_INGREDIENTS, RECIPES, bump, current
+
+EXPIRING_DAYS = 3
+EXPIRING_BONUS = 0.1
+MAX_INDEXED_USERS = 256
+# Words of a fridge item name considered when matching
+MAX_QUERY_TOKENS = 16
+CANONICAL_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: 'pc'}
+
+STOPWORDS = frozenset(
+    'a an and or of to the for with fresh freshly chopped diced sliced minced grated large small medium '
+    'ground whole optional taste finely roughly boneless skinless peeled raw cooked dried organic'.split()
+)
+WORD_RE = re.compile(r'[a-z]+')
+
+
+def singular(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        return word[:-1]
+    return word
+
+
+def name_tokens(name):
+    """
+    The significant words of an ingredient name, singularised:
+    "2 Large Tomatoes, diced" -> ('tomato',).
+    """
+    words = (singular(w) for w in WORD_RE.findall(str(name).lower()) if w not in STOPWORDS)
+    return tuple(dict.fromkeys(w for w in words if len(w) > 1))
+
+
+def normalize_name(name):
+    return ' '.join(name_tokens(name))
+
+
+def ingredient_rows(recipe):
+    """
+    Unsaved RecipeIngredient rows for a recipe's ingredients JSON.
+    """
+    rows = []
+    for position, item in enumerate(recipe.ingredients or []):
+        if isinstance(item, dict):
+            name, quantity, unit = item.get('name'), item.get('quantity'), item.get('unit')
+        else:
+            name, quantity, unit = item, None, None
+        normalized = normalize_name(name or '')
+        if not normalized:
+            continue
+        amounts = normalize_amount(quantity, unit)
+        dimension = next((d for d in DIMENSIONS if amounts[d] is not None), None)
+        text = ' '.join(str(part) for part in (quantity, unit) if part not in (None, ''))
+        rows.append(RecipeIngredient(
+            recipe_id=recipe.pk, user_id=recipe.user_id, position=position,
+            name=str(name)[:200], normalized_name=normalized[:200], quantity=text[:100],
+            amount=amounts[dimension] if dimension else None, unit=CANONICAL_UNITS.get(dimension, ''),
+        ))
+    return rows
+
+
+def sync_recipe_ingredients(recipes, batch_size=1000):
+    """
+    Replace the RecipeIngredient rows of `recipes` with ones derived from
+    their current ingredients JSON.
+    """
+    recipes = [recipe for recipe in recipes if recipe.pk]
+    if not recipes:
+        return 0
+    rows = [row for recipe in recipes for row in ingredient_rows(recipe)]
+    with transaction.atomic():
+        RecipeIngredient.objects.filter(recipe_id__in=[recipe.pk for recipe in recipes]).delete()
+        RecipeIngredient.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+class RecipeIndex:
+    def __init__(self, version):
+        self.version = version
+        self.lock = threading.Lock()
+        self.next_entry = 0
+        self.entry_recipe = {}     # entry id -> recipe id
+        self.entry_name = {}       # entry id -> display name
+        self.entry_key = {}        # entry id -> frozenset of tokens
+        self.recipe_entries = {}   # recipe id -> [entry ids]
+        self.postings = {}         # token -> {entry ids}
+
+    def add(self, recipe_id, ingredients):
+        self.remove(recipe_id)
+        entries = []
+        seen = set()
+        for item in ingredients or []:
+            name = item.get('name') if isinstance(item, dict) else item
+            tokens = name_tokens(name or '')
+            key = frozenset(tokens)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            entry = self.next_entry
+            self.next_entry += 1
+            self.entry_recipe[entry] = recipe_id
+            self.entry_name[entry] = str(name)
+            self.entry_key[entry] = key
+            for token in key:
+                self.postings.setdefault(token, set()).add(entry)
+            entries.append(entry)
+        self.recipe_entries[recipe_id] = entries
+
+    def remove(self, recipe_id):
+        for entry in self.recipe_entries.pop(recipe_id, ()):
+            key = self.entry_key.pop(entry)
+            for token in key:
+                self.postings[token].discard(entry)
+                if not self.postings[token]:
+                    del self.postings[token]
+            del self.entry_recipe[entry]
+            del self.entry_name[entry]
+
+    def match(self, tokens):
+        """
+        Entries naming this fridge item: recipe ingredients that contain all
+        of its words ("chicken" -> "chicken thigh") or whose words are all
+        in it ("chicken thigh" -> "chicken").
+        """
+        tokens = tokens[:MAX_QUERY_TOKENS]
+        if not tokens:
+            return set()
+        postings = sorted((self.postings.get(token, set()) for token in tokens), key=len)
+        matched = set(postings[0]).intersection(*postings[1:])
+        # Entries whose words are a subset of the item's are in the postings
+        # of at least one of its words; no need to try every subset.
+        words = frozenset(tokens)
+        for posting in postings:
+            matched.update(entry for entry in posting if self.entry_key[entry] <= words)
+        return matched
+
+    def rank(self, fridge, limit, today):
+        """
+        fridge: iterable of (name, expiration_date). Returns the top `limit`
+        recipes as dicts, best first.
+        """
+        matched = set()
+        expiring = set()
+        soon = today + timedelta(days=EXPIRING_DAYS)
+        lookups = {}
+        for name, expiration in fridge:
+            tokens = name_tokens(name)
+            if tokens not in lookups:
+                lookups[tokens] = self.match(tokens)
+            entries = lookups[tokens]
+            matched |= entries
+            if expiration <= soon:
+                expiring |= entries
+
+        have = {}
+        for entry in matched:
+            recipe_id = self.entry_recipe[entry]
+            have[recipe_id] = have.get(recipe_id, 0) + 1
+        bonus = {}
+        for entry in expiring:
+            recipe_id = self.entry_recipe[entry]
+            bonus[recipe_id] = bonus.get(recipe_id, 0) + 1
+
+        def scored():
+            for recipe_id, count in have.items():
+                total = len(self.recipe_entries[recipe_id])
+                used = bonus.get(recipe_id, 0)
+                yield count / total + EXPIRING_BONUS * used, -(total - count), used, recipe_id
+
+        top = heapq.nlargest(limit, scored())
+        results = []
+        for score, negative_missing, used, recipe_id in top:
+            entries = self.recipe_entries[recipe_id]
+            results.append({
+                'recipe_id': recipe_id,
+                'score': round(score, 4),
+                'coverage': round(have[recipe_id] / len(entries), 4),
+                'missing_count': -negative_missing,
+                'expiring_used': used,
+                'missing': [self.entry_name[e] for e in entries if e not in matched],
+            })
+        return results
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def build_index(user_id, version):
+    index = RecipeIndex(version)
+    for recipe_id, ingredients in Recipe.objects.filter(user_id=user_id).values_list('id', 'ingredients').iterator():
+        index.add(recipe_id, ingredients)
+    return index
+
+
+def get_index(user_id):
+    version, = current(user_id, RECIPE_INGREDIENTS)
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is not None:
+            _indexes.move_to_end(user_id)
+    if index is None or index.version != version:
+        index = build_index(user_id, version)
+        with _indexes_lock:
+            _indexes[user_id] = index
+            _indexes.move_to_end(user_id)
+            while len(_indexes) > MAX_INDEXED_USERS:
+                _indexes.popitem(last=False)
+    return index
+
+
+def recipe_changed(user_id, recipe_id, ingredients=None, deleted=False):
+    """
+    Bump the user's recipes version. When the recipe's ingredients changed
+    (given, or the recipe was deleted) also bump the recipe ingredients
+    version, which tells other processes to rebuild their index, and apply
+    the write to this process's index once it commits.
+    """
+    if ingredients is None and not deleted:
+        bump(user_id, RECIPES)
+        return
+    _, (previous, version) = bump(user_id, RECIPES, RECIPE_INGREDIENTS)
+    transaction.on_commit(lambda: _apply(user_id, previous, version, recipe_id, ingredients, deleted))
+
+
+def _apply(user_id, previous, version, recipe_id, ingredients, deleted):
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+    if index is None:
+        return
+    with index.lock:
+        if index.version != previous:
+            # Missed another process's write; rebuild on next use.
+            with _indexes_lock:
+                _indexes.pop(user_id, None)
+            return
+        if deleted:
+            index.remove(recipe_id)
+        else:
+            index.add(recipe_id, ingredients)
+        index.version = version
+
+
+def recipes_reset(user_id):
+    bump(user_id, RECIPES, RECIPE_INGREDIENTS)
+    with _indexes_lock:
+        _indexes.pop(user_id, None)
+
+
+def cook_now(user, limit=10):
+    started = time.perf_counter()
+    today = timezone.localdate()
+    fridge = list(
+        Ingredient.objects.filter(user=user, expiration_date__gte=today).values_list('name', 'expiration_date')
+    )
+    index = get_index(user.id)
+    with index.lock:
+        results = index.rank(fridge, limit, today)
+        size = len(index.recipe_entries)
+    return results, {'recipes_indexed': size, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)}
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 10:50
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='count',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1.0)), unit='pc'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1.0)), unit='bunch'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1.0)), unit='slice'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1.0)), unit='pack'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1.0)), unit='bottle'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1.0)), unit='can'), default=None, output_field=models.FloatField()), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='mass_g',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1.0)), unit='g'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1000.0)), unit='kg'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(28.349523125)), unit='oz'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(453.59237)), unit='lb'), default=None, output_field=models.FloatField()), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='volume_ml',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1.0)), unit='ml'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(1000.0)), unit='l'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(4.92892159375)), unit='tsp'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(14.78676478125)), unit='tbsp'), models.When(then=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.Value(236.5882365)), unit='cup'), default=None, output_field=models.FloatField()), output_field=models.FloatField()),
+        ),
+    ]
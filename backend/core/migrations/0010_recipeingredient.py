@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 10:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_canonical_quantities'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('name', models.CharField(max_length=200)),
+                ('normalized_name', models.CharField(max_length=200)),
+                ('quantity', models.CharField(blank=True, help_text='Quantity as written in the recipe', max_length=100)),
+                ('amount', models.FloatField(blank=True, help_text='Quantity in canonical units', null=True)),
+                ('unit', models.CharField(blank=True, help_text='Canonical unit: g, ml or pc', max_length=5)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_rows', to='core.recipe')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['recipe', 'position'],
+                'indexes': [models.Index(fields=['user', 'normalized_name', 'recipe'], name='recipeingr_user_name_idx'), models.Index(fields=['normalized_name'], name='recipeingr_name_idx')],
+            },
+        ),
+    ]
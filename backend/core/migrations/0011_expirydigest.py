@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 10:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0010_recipeingredient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryDigest',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='expiry_digest', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('date', models.DateField()),
+                ('expired', models.PositiveIntegerField(default=0)),
+                ('expiring_soon', models.PositiveIntegerField(default=0)),
+                ('expiring_week', models.PositiveIntegerField(default=0)),
+                ('items', models.JSONField(default=list, help_text='Soonest-expiring items not yet expired')),
+                ('computed_at', models.DateTimeField()),
+                ('suggested_on', models.DateField(blank=True, help_text='Last day a use-it-up batch was queued', null=True)),
+            ],
+        ),
+    ]
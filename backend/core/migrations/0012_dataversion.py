@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0011_expirydigest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('user', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ingredients', models.BigIntegerField(default=0)),
+                ('recipes', models.BigIntegerField(default=0)),
+                ('account', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
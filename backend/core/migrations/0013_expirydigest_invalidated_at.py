@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expirydigest',
+            name='invalidated_at',
+            field=models.DateTimeField(blank=True, help_text='Last time an ingredient write marked it stale', null=True),
+        ),
+    ]
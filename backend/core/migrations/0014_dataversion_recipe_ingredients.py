@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_expirydigest_invalidated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='recipe_ingredients',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,8 +1,13 @@
+import copy
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .signals import ingredients_bulk_changed, recipes_bulk_changed
+from .units import CONVERSIONS, COUNT, MASS, VOLUME
+
 class Account(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='account')
     
@@ -34,10 +39,15 @@ def create_user_account(sender, instance, created, **kwargs):
     if created:
         Account.objects.create(user=instance)
 
-# Signal to save Account when User is saved
-@receiver(post_save, sender=User)
-def save_user_account(sender, instance, **kwargs):
-    instance.account.save()
+def canonical_quantity(dimension):
+    return models.Case(
+        *[
+            models.When(unit=unit, then=models.F('quantity') * factor)
+            for unit, (unit_dimension, factor) in CONVERSIONS.items() if unit_dimension == dimension
+        ],
+        default=None,
+        output_field=models.FloatField(),
+    )
 
 class Ingredient(models.Model):
     CATEGORY = [
@@ -92,11 +102,29 @@ class Ingredient(models.Model):
     quantity = models.FloatField()
     unit = models.CharField(max_length=20, choices=UNITS)
 
+    # Quantity in canonical units (see core/units.py), computed by the
+    # database on every write so sums and comparisons can run in SQL.
+    # Only the column matching the unit's dimension is set.
+    mass_g = models.GeneratedField(
+        expression=canonical_quantity(MASS), output_field=models.FloatField(), db_persist=True,
+    )
+    volume_ml = models.GeneratedField(
+        expression=canonical_quantity(VOLUME), output_field=models.FloatField(), db_persist=True,
+    )
+    count = models.GeneratedField(
+        expression=canonical_quantity(COUNT), output_field=models.FloatField(), db_persist=True,
+    )
+
     def __str__(self):
         return f"{self.name} ({self.quantity} {self.unit})"
 
     class Meta:
         ordering = ['expiration_date']
+        indexes = [
+            # Fridge list: per-user, optionally by category, ordered by expiry
+            models.Index(fields=['user', 'expiration_date', 'id'], name='ingredient_user_exp_idx'),
+            models.Index(fields=['user', 'category', 'expiration_date', 'id'], name='ingredient_user_cat_exp_idx'),
+        ]
 
 
 class Recipe(models.Model):
@@ -117,5 +145,167 @@ class Recipe(models.Model):
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Compared on save, so writes that leave the ingredients alone (a
+        # favorite toggle, a rename) skip re-deriving their rows
+        if 'ingredients' in field_names:
+            instance._loaded_ingredients = copy.deepcopy(instance.ingredients)
+        return instance
+
+    def ingredients_changed(self, update_fields=None):
+        if update_fields is not None:
+            return 'ingredients' in update_fields
+        return not hasattr(self, '_loaded_ingredients') or self.ingredients != self._loaded_ingredients
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='recipe_user_created_idx'),
+            models.Index(
+                fields=['user', '-created_at', '-id'], condition=models.Q(favorite=True),
+                name='recipe_user_favorite_idx',
+            ),
+        ]
+
+
+class RecipeIngredient(models.Model):
+    """
+    One row per entry of Recipe.ingredients, derived on save so ingredient
+    lookups can use an index instead of scanning the JSON.
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredient_rows')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    position = models.PositiveSmallIntegerField()
+    name = models.CharField(max_length=200)
+    normalized_name = models.CharField(max_length=200)
+    quantity = models.CharField(max_length=100, blank=True, help_text="Quantity as written in the recipe")
+    amount = models.FloatField(null=True, blank=True, help_text="Quantity in canonical units")
+    unit = models.CharField(max_length=5, blank=True, help_text="Canonical unit: g, ml or pc")
+
+    def __str__(self):
+        return f"{self.name} ({self.quantity})" if self.quantity else self.name
+
+    class Meta:
+        ordering = ['recipe', 'position']
+        indexes = [
+            models.Index(fields=['user', 'normalized_name', 'recipe'], name='recipeingr_user_name_idx'),
+            models.Index(fields=['normalized_name'], name='recipeingr_name_idx'),
+        ]
+
+
+class ExpiryDigest(models.Model):
+    """
+    Per-user expiry snapshot written by the nightly sweeper
+    (manage.py sweep_expiry) for `date`.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='expiry_digest')
+    date = models.DateField()
+    expired = models.PositiveIntegerField(default=0)
+    expiring_soon = models.PositiveIntegerField(default=0)
+    expiring_week = models.PositiveIntegerField(default=0)
+    items = models.JSONField(default=list, help_text="Soonest-expiring items not yet expired")
+    computed_at = models.DateTimeField()
+    invalidated_at = models.DateTimeField(null=True, blank=True, help_text="Last time an ingredient write marked it stale")
+    suggested_on = models.DateField(null=True, blank=True, help_text="Last day a use-it-up batch was queued")
+
+    def __str__(self):
+        return f"{self.user.username} expiry digest for {self.date}"
+
+
+class DataVersion(models.Model):
+    """
+    Per-user write counters behind the list ETags (core/versions.py), one
+    column per scope. Kept in the database so every worker sees a bump as
+    soon as the write commits. Rows outlive their user (no FK constraint,
+    DO_NOTHING), so a reused user id carries on from the old counters.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, primary_key=True, related_name='+',
+    )
+    ingredients = models.BigIntegerField(default=0)
+    recipes = models.BigIntegerField(default=0)
+    recipe_ingredients = models.BigIntegerField(default=0)
+    account = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"data versions for user {self.user_id}"
+
+
+# Keep the "cook now" recipe index and the RecipeIngredient rows in step
+# with recipe writes. recipe_changed/recipes_reset also bump the recipes
+# data version behind the list ETags.
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, created, update_fields=None, **kwargs):
+    from .matching import recipe_changed, sync_recipe_ingredients
+
+    ingredients = None
+    if created or instance.ingredients_changed(update_fields):
+        sync_recipe_ingredients([instance])
+        ingredients = instance.ingredients
+        instance._loaded_ingredients = copy.deepcopy(ingredients)
+    if instance.user_id:
+        recipe_changed(instance.user_id, instance.pk, ingredients)
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    from .matching import recipe_changed
+
+    if instance.user_id:
+        recipe_changed(instance.user_id, instance.pk, deleted=True)
+
+@receiver(recipes_bulk_changed)
+def reindex_recipes(sender, user_id, recipes=(), **kwargs):
+    from .matching import recipes_reset, sync_recipe_ingredients
+
+    sync_recipe_ingredients(recipes)
+    recipes_reset(user_id)
+
+
+# Ingredient writes invalidate the user's precomputed expiry digest
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def expire_digest(sender, instance, **kwargs):
+    from .expiry import mark_stale
+
+    if instance.user_id:
+        mark_stale(instance.user_id)
+
+@receiver(ingredients_bulk_changed)
+def expire_digest_bulk(sender, user_id, **kwargs):
+    from .expiry import mark_stale
+
+    mark_stale(user_id)
+
+
+# Every write bumps the per-user data version behind the list ETags (recipe
+# writes bump theirs through the index receivers above)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, instance, **kwargs):
+    from .versions import INGREDIENTS, bump
+
+    if instance.user_id:
+        bump(instance.user_id, INGREDIENTS)
+
+@receiver(ingredients_bulk_changed)
+def bump_ingredients_version_bulk(sender, user_id, **kwargs):
+    from .versions import INGREDIENTS, bump
+
+    bump(user_id, INGREDIENTS)
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def bump_account_version(sender, instance, **kwargs):
+    from .versions import ACCOUNT, bump
+
+    bump(instance.user_id, ACCOUNT)
+
+@receiver(post_save, sender=User)
+def bump_user_version(sender, instance, update_fields=None, **kwargs):
+    from .versions import ACCOUNT, bump
+
+    # login() only touches last_login, which no serializer exposes
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump(instance.pk, ACCOUNT)
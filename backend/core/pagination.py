@@ -0,0 +1,94 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a queryset ordered by `ordering`, a
+    (sort field, unique tie-breaker) pair such as ('expiration_date', 'id')
+    or ('-created_at', '-id'). Each page is a range read on the matching
+    index, so deep pages cost the same as the first one.
+
+    Cursors are opaque strings that encode the boundary row's key and the
+    direction to read in.
+    """
+
+    def __init__(self, queryset, ordering, per_page, count_limit=1000):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.count_limit = count_limit
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = ordering[0].startswith('-')
+
+    def encode(self, obj, direction):
+        key = [obj[name] if isinstance(obj, dict) else getattr(obj, name) for name in self.fields]
+        key = [value.isoformat() if hasattr(value, 'isoformat') else value for value in key]
+        raw = json.dumps({'k': key, 'd': direction}, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            data = json.loads(raw)
+            direction = data['d']
+            key = data['k']
+            if direction not in ('next', 'prev') or len(key) != len(self.fields):
+                raise ValueError
+            model = self.queryset.model
+            key = [model._meta.get_field(name).to_python(value) for name, value in zip(self.fields, key)]
+        except Exception:
+            raise InvalidCursor("Invalid cursor")
+        return key, direction
+
+    def _after(self, key, forward):
+        # (a, b) > (x, y) written as a >= x AND (a > x OR b > y), so the
+        # database can seek straight to the boundary on the leading column.
+        first, second = self.fields
+        upward = forward != self.descending
+        op = 'gt' if upward else 'lt'
+        return (
+            Q(**{f'{first}__{op}e': key[0]})
+            & (Q(**{f'{first}__{op}': key[0]}) | Q(**{f'{second}__{op}': key[1]}))
+        )
+
+    def approximate_count(self):
+        """
+        Exact up to count_limit; past that, the limit is returned and the
+        total flagged as an estimate.
+        """
+        count = self.queryset.order_by()[:self.count_limit + 1].count()
+        return min(count, self.count_limit), count > self.count_limit
+
+    def page(self, cursor=None):
+        """
+        Returns (items, next_cursor, previous_cursor) for the page after or
+        before `cursor`, or the first page when it is empty.
+        """
+        queryset = self.queryset
+        direction = 'next'
+        if cursor:
+            key, direction = self.decode(cursor)
+            queryset = queryset.filter(self._after(key, forward=direction == 'next'))
+
+        if direction == 'next':
+            rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            items = rows[:self.per_page]
+            has_next, has_previous = has_more, bool(cursor)
+        else:
+            reverse = [name[1:] if name.startswith('-') else '-' + name for name in self.ordering]
+            rows = list(queryset.order_by(*reverse)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            items = rows[:self.per_page][::-1]
+            has_next, has_previous = True, has_more
+
+        next_cursor = self.encode(items[-1], 'next') if items and has_next else None
+        previous_cursor = self.encode(items[0], 'prev') if items and has_previous else None
+        return items, next_cursor, previous_cursor
@@ -0,0 +1,64 @@
+"""
+orjson-backed JSON renderer and parser for DRF, selected with
+API_JSON_BACKEND = "orjson" (see settings.py).
+
+Output matches rest_framework's JSONRenderer byte for byte for the
+payloads the API produces: compact separators, UTF-8 without escaping,
+U+2028/U+2029 escaped, and dates, datetimes, times, Decimals and anything
+else orjson doesn't encode natively handed to DRF's own JSONEncoder. The
+one difference is NaN/Infinity, which orjson writes as null where
+STRICT_JSON would raise.
+
+orjson is optional: without it, or for requests DRF's renderer handles
+differently (?indent, non-UTF-8 bodies, UNICODE_JSON/COMPACT_JSON off),
+both classes defer to the stdlib implementation.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+ORJSON_OPTIONS = (
+    # Dates go to JSONEncoder so they keep DRF's millisecond/"Z" formatting
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+)
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+# Covers dates, Decimal, lazy strings, querysets, generators, ...
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,114 @@
+"""
+Per-user cache of rendered list pages (ingredient_list, the recipe list).
+
+Entries are keyed by the page's ETag (core/versions.py), which already
+hashes the user, path, normalized query params, Accept header and the
+user's data versions. A write bumps the version in the database, so every
+page it could affect stops being addressable at once, in every worker and
+whichever cache alias holds the pages; the orphaned entries age out
+through the TTL and the cache backend's own eviction (LocMemCache's
+MAX_ENTRIES for the default "lists" alias).
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .versions import conditional, tagged
+
+
+class ListCache:
+    def __init__(self, alias, ttl, max_entry_bytes):
+        self.alias = alias
+        self.cache = caches[alias]
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "sets": 0, "skipped": 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def _key(self, tag):
+        return "list-page:" + tag.strip('"')
+
+    def get(self, tag):
+        entry = self.cache.get(self._key(tag))
+        self._count("hits" if entry is not None else "misses")
+        if entry is None:
+            return None
+        content, headers = entry
+        response = HttpResponse(content)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def store(self, tag, response):
+        """
+        Save `response` once it has been rendered. Only 200 JSON pages
+        under max_entry_bytes are kept.
+        """
+        def save(rendered):
+            renderer = getattr(rendered, 'accepted_renderer', None)
+            if (rendered.status_code != 200 or renderer is None or renderer.format != 'json'
+                    or len(rendered.content) > self.max_entry_bytes):
+                self._count("skipped")
+                return
+            headers = {name: rendered[name] for name in ('Content-Type', 'Allow') if rendered.has_header(name)}
+            self.cache.set(self._key(tag), (rendered.content, headers), self.ttl)
+            self._count("sets")
+
+        response.add_post_render_callback(save)
+        return response
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "alias": self.alias,
+            "ttl": self.ttl,
+            "max_entries": settings.CACHES[self.alias].get("OPTIONS", {}).get("MAX_ENTRIES"),
+            "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else None,
+            **counters,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_list_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ListCache(settings.LIST_CACHE_ALIAS, settings.LIST_CACHE_TTL,
+                                   settings.LIST_CACHE_MAX_ENTRY_BYTES)
+    return _cache
+
+
+def cached_page(request, *scopes):
+    """
+    conditional() plus the list cache: (response, tag) where response is
+    a 304, a cached page, or None when the page has to be built and
+    passed to store_page().
+    """
+    response, tag = conditional(request, *scopes)
+    if response is not None or not settings.LIST_CACHE_ENABLED:
+        return response, tag
+    response = get_list_cache().get(tag)
+    if response is not None:
+        response['X-Cache'] = 'HIT'
+        return tagged(response, tag), tag
+    return None, tag
+
+
+def store_page(tag, response):
+    response = tagged(response, tag)
+    if settings.LIST_CACHE_ENABLED:
+        response['X-Cache'] = 'MISS'
+        get_list_cache().store(tag, response)
+    return response
@@ -2,30 +2,125 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Account, Ingredient, Recipe
 
-class UserSerializer(serializers.ModelSerializer):
+
+class DynamicFieldsMixin:
+    """
+    `fields` limits the output to the named fields; `expand` names the
+    nested relations to render in full, the others collapse to their id.
+    Leaving both as None keeps the serializer's normal output.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand is not None:
+            for name, field in list(self.fields.items()):
+                if isinstance(field, serializers.BaseSerializer) and name not in expand:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name')
-        read_only_fields = ['id'] 
+        read_only_fields = ['id']
 
-class AccountSerializer(serializers.ModelSerializer):
+class AccountSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = Account
         fields = ('id', 'user', 'dietary_preferences', 'saved_recipes', 'allergies')
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
+    # List rows without the repeated nested user
+    compact_fields = ('id', 'name', 'icon_name', 'category', 'expiration_date', 'quantity', 'unit')
+
     class Meta:
         model = Ingredient
         fields = ('id', 'user', 'name', 'icon_name', 'category', 'expiration_date', 'quantity', 'unit')
         read_only_fields = ('user',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Recipe cards: no steps
+    compact_fields = ('id', 'title', 'ingredients', 'favorite', 'created_at')
+
     class Meta:
         model = Recipe
         fields = '__all__'
-        read_only_fields = ['user', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['user', 'created_at', 'updated_at']
+
+
+def representation_options(request, serializer_class):
+    """
+    (fields, expand) from ?view=compact, ?fields=a,b and ?expand=user.
+    Without any of them the full representation is used.
+    """
+    params = request.GET
+    fields = expand = None
+    if params.get('view') == 'compact':
+        fields, expand = serializer_class.compact_fields, ()
+    if params.get('fields'):
+        fields, expand = tuple(name.strip() for name in params['fields'].split(',') if name.strip()), ()
+    if params.get('expand'):
+        expand = tuple(name.strip() for name in params['expand'].split(','))
+        if fields is not None:
+            fields = fields + tuple(name for name in expand if name not in fields)
+    return fields, expand
+
+
+class ValuesRenderer:
+    """
+    Renders rows from queryset.values(*renderer.lookups) exactly as
+    `serializer_class` would render the model instances, without building
+    them. Only plain model fields, primary-key relations and nested model
+    serializers are supported, which covers the core serializers.
+    """
+    converted = (serializers.DateField, serializers.DateTimeField, serializers.FloatField,
+                 serializers.DecimalField)
+
+    def __init__(self, serializer_class, fields=None, expand=None):
+        serializer = serializer_class(fields=fields, expand=expand)
+        model = serializer.Meta.model
+        self.columns = []
+        self.lookups = []
+        for name, field in serializer.fields.items():
+            model_field = model._meta.get_field(field.source)
+            if isinstance(field, serializers.BaseSerializer):
+                nested = [
+                    (sub_name, f'{model_field.name}__{sub_field.source}', self.converter(sub_field))
+                    for sub_name, sub_field in field.fields.items()
+                ]
+                self.columns.append((name, model_field.attname, nested))
+                self.lookups += [model_field.attname] + [lookup for _, lookup, _ in nested]
+            else:
+                lookup = model_field.attname if model_field.is_relation else model_field.name
+                self.columns.append((name, lookup, self.converter(field)))
+                self.lookups.append(lookup)
+
+    def converter(self, field):
+        return field.to_representation if isinstance(field, self.converted) else None
+
+    def render_row(self, row):
+        data = {}
+        for name, lookup, convert in self.columns:
+            value = row[lookup]
+            if isinstance(convert, list):
+                if value is not None:
+                    value = {
+                        sub_name: sub_convert(row[sub_lookup]) if sub_convert and row[sub_lookup] is not None
+                        else row[sub_lookup]
+                        for sub_name, sub_lookup, sub_convert in convert
+                    }
+            elif convert is not None and value is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+    def render(self, rows):
+        return [self.render_row(row) for row in rows]
@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+# Sent with `user_id` after bulk_create/bulk_update write a user's
+# ingredients, which bypass the per-instance post_save signal.
+ingredients_bulk_changed = Signal()
+
+# Sent with `user_id` and the new `recipes` after recipes are
+# bulk_created for a user.
+recipes_bulk_changed = Signal()
@@ -1,3 +1,845 @@
-from django.test import TestCase
+import io
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from . import renderers
+from .models import Account, DataVersion, Ingredient, Recipe
+
+
+class ListQueryPlanTests(TestCase):
+    """
+    Run the list endpoints, EXPLAIN every query they issue against the core
+    tables, and fail if any of them scans a whole table or sorts rows
+    instead of walking one of the composite indexes.
+    """
+    tables = ('core_ingredient', 'core_recipe')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='pw')
+        other = User.objects.create_user(username='other', password='pw')
+        today = date.today()
+        categories = ['VEG', 'DAIRY', 'CHICKEN', 'FRUIT']
+        for owner in (cls.user, other):
+            Ingredient.objects.bulk_create([
+                Ingredient(
+                    user=owner, name=f'item {i}', category=categories[i % len(categories)],
+                    expiration_date=today + timedelta(days=i % 15 - 3), quantity=1, unit='pc',
+                )
+                for i in range(60)
+            ])
+            Recipe.objects.bulk_create([
+                Recipe(user=owner, title=f'recipe {i}', favorite=i % 3 == 0)
+                for i in range(30)
+            ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny, so make the planner prove an index
+            # path exists rather than picking a cheaper seq scan.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute('EXPLAIN ' + sql)
+            return [row[0] for row in cursor.fetchall()]
+
+    def problems(self, plan):
+        found = []
+        for line in plan:
+            if connection.vendor == 'sqlite':
+                if line.startswith('SCAN') and 'INDEX' not in line:
+                    found.append(line)
+                if 'TEMP B-TREE' in line:
+                    found.append(line)
+            elif 'Seq Scan' in line or line.strip().startswith(('Sort', '->  Sort')):
+                found.append(line)
+        return found
+
+    def assertIndexedPlans(self, path, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, 200)
+        checked = 0
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(table in sql for table in self.tables):
+                continue
+            plan = self.explain(sql)
+            self.assertEqual(self.problems(plan), [], f'{path} {params}: {sql}\n' + '\n'.join(plan))
+            checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_ingredient_list_plans(self):
+        cases = [
+            {},
+            {'page': 3},
+            {'category': 'DAIRY'},
+            {'condition': 'expired'},
+            {'condition': 'expiring_soon'},
+            {'condition': 'expiring_week'},
+            {'condition': 'good'},
+            {'category': 'VEG', 'condition': 'good'},
+            {'search': 'item'},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                self.assertIndexedPlans('/api/ingredients/', params)
+
+    def test_cursor_page_plans(self):
+        for path in ('/api/ingredients/', '/api/save-recipe/'):
+            first = self.client.get(path, {'cursor': ''}).json()
+            with self.subTest(path=path):
+                self.assertIndexedPlans(path, {'cursor': first['next']})
+
+    def test_recipe_list_plans(self):
+        for params in [{}, {'page': 2}, {'favorite': 'true'}, {'search': 'recipe'}]:
+            with self.subTest(params=params):
+                self.assertIndexedPlans('/api/save-recipe/', params)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='pager', password='pw')
+        today = date.today()
+        # Repeated expiration dates exercise the id tie-breaker
+        Ingredient.objects.bulk_create([
+            Ingredient(user=cls.user, name=f'item {i}', category='VEG',
+                       expiration_date=today + timedelta(days=i % 4), quantity=1, unit='pc')
+            for i in range(25)
+        ])
+        Recipe.objects.bulk_create([Recipe(user=cls.user, title=f'recipe {i}') for i in range(20)])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def walk(self, path, **params):
+        pages = []
+        response = self.client.get(path, {'cursor': '', **params}).json()
+        pages.append(response)
+        while response['next']:
+            response = self.client.get(path, {'cursor': response['next'], **params}).json()
+            pages.append(response)
+        return pages
+
+    def ids(self, page):
+        return [item['id'] for item in page['results']]
+
+    def test_cursor_walk_matches_page_numbers(self):
+        for path in ('/api/ingredients/', '/api/save-recipe/'):
+            with self.subTest(path=path):
+                pages = self.walk(path)
+                numbered = []
+                page = 1
+                while page:
+                    response = self.client.get(path, {'page': page}).json()
+                    numbered += self.ids(response)
+                    page = response['next_page']
+                self.assertEqual([i for p in pages for i in self.ids(p)], numbered)
+                self.assertIsNone(pages[0]['previous'])
+                self.assertIsNone(pages[0]['count'])
+
+    def test_previous_cursor_returns_prior_page(self):
+        pages = self.walk('/api/ingredients/')
+        for before, after in zip(pages, pages[1:]):
+            back = self.client.get('/api/ingredients/', {'cursor': after['previous']}).json()
+            self.assertEqual(self.ids(back), self.ids(before))
+
+    def test_approximate_total_and_bad_cursor(self):
+        response = self.client.get('/api/ingredients/', {'cursor': '', 'total': '1'}).json()
+        self.assertEqual(response['count'], 25)
+        self.assertFalse(response['count_is_estimate'])
+        response = self.client.get('/api/ingredients/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FridgeSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='summary', password='pw')
+        today = date.today()
+        rows = [
+            ('VEG', -2, 1, 'pc'), ('VEG', 0, 2, 'pc'), ('VEG', 3, 100, 'g'),
+            ('DAIRY', 4, 1, 'l'), ('DAIRY', 7, 0.5, 'l'), ('DAIRY', 8, 200, 'g'),
+            ('FRUIT', 30, 6, 'pc'),
+        ]
+        Ingredient.objects.bulk_create([
+            Ingredient(user=cls.user, name=f'{category} {days}', category=category,
+                       expiration_date=today + timedelta(days=days), quantity=quantity, unit=unit)
+            for category, days, quantity, unit in rows
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_summary_matches_condition_filters(self):
+        with CaptureQueriesContext(connection) as ctx:
+            summary = self.client.get('/api/ingredients/summary/').json()
+        ingredient_queries = [q for q in ctx.captured_queries if 'core_ingredient' in q['sql']]
+        self.assertEqual(len(ingredient_queries), 1)
+
+        self.assertEqual(summary['total'], 7)
+        for condition, bucket in summary['conditions'].items():
+            listed = self.client.get('/api/ingredients/', {'condition': condition}).json()
+            self.assertEqual(bucket['count'], listed['count'], condition)
+        self.assertEqual(summary['conditions']['expiring_soon']['quantities'], {'pc': 2, 'g': 100})
+        self.assertEqual(summary['categories']['DAIRY']['quantities'], {'l': 1.5, 'g': 200})
+        self.assertEqual(summary['categories']['DAIRY']['expiring_week'], 2)
+
+
+class IngredientBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bulk', password='pw')
+        cls.other = User.objects.create_user(username='bulk-other', password='pw')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def item(self, i, **overrides):
+        return {'name': f'item {i}', 'category': 'VEG', 'expiration_date': '2030-01-01',
+                'quantity': 1, 'unit': 'pc', **overrides}
+
+    def test_create_fifty_in_few_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/ingredients/bulk/', [self.item(i) for i in range(50)],
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 50)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 50)
+        writes = [q for q in ctx.captured_queries if 'core_ingredient' in q['sql']]
+        self.assertLessEqual(len(writes), 2)
+
+    def test_invalid_item_rejects_whole_batch(self):
+        items = [self.item(0), self.item(1, unit='furlong'), self.item(2, quantity='lots')]
+        response = self.client.post('/api/ingredients/bulk/', items, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [1, 2])
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_batch_cap(self):
+        with self.settings(INGREDIENT_BULK_MAX=3):
+            response = self.client.post('/api/ingredients/bulk/', [self.item(i) for i in range(4)],
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_and_delete_only_touch_own_rows(self):
+        mine = Ingredient.objects.create(user=self.user, **{**self.item(0), 'expiration_date': date(2030, 1, 1)})
+        theirs = Ingredient.objects.create(user=self.other, **{**self.item(1), 'expiration_date': date(2030, 1, 1)})
+
+        response = self.client.patch('/api/ingredients/bulk/', [{'id': theirs.id, 'quantity': 9}],
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch('/api/ingredients/bulk/', [{'id': mine.id, 'quantity': 9}],
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        mine.refresh_from_db()
+        self.assertEqual(mine.quantity, 9)
+
+        response = self.client.delete('/api/ingredients/bulk/', {'ids': [mine.id, theirs.id]},
+                                      content_type='application/json')
+        self.assertEqual(response.json(), {'deleted': [mine.id], 'missing': [theirs.id]})
+        self.assertTrue(Ingredient.objects.filter(pk=theirs.id).exists())
+
+    def test_update_rejects_duplicate_ids(self):
+        mine = Ingredient.objects.create(user=self.user, **{**self.item(0), 'expiration_date': date(2030, 1, 1)})
+        response = self.client.patch('/api/ingredients/bulk/', [{'id': mine.id, 'quantity': 9},
+                                                                {'id': mine.id, 'quantity': 3}],
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'errors': [{'index': 1, 'errors': {'id': ['Duplicate id.']}}]})
+        mine.refresh_from_db()
+        self.assertEqual(mine.quantity, self.item(0)['quantity'])
+
+
+class IngredientImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='importer', password='pw')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, name, content, **params):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        path = '/api/ingredients/import/'
+        if params:
+            path += '?' + '&'.join(f'{k}={v}' for k, v in params.items())
+        return self.client.post(path, {'file': SimpleUploadedFile(name, content.encode())})
+
+    def test_receipt_dry_run_writes_nothing(self):
+        response = self.upload('receipt.txt', '2 x Whole milk 1l  3.49\nChicken breast 500g $5.99\n\n', dry_run=1)
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report['would_create'], 2)
+        self.assertEqual(
+            [(r['name'], r['category'], r['quantity'], r['unit']) for r in report['preview']],
+            [('Whole milk', 'DAIRY', 2.0, 'l'), ('Chicken breast', 'CHICKEN', 500.0, 'g')],
+        )
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_csv_import_skips_bad_rows(self):
+        rows = ['name,quantity,unit,category,expiration_date', 'Carrots,1,kilograms,,2030-01-01',
+                'Rice,2,kg,GRAIN,', 'Mystery,1,furlong,,', 'Ghost,nan,g,,', 'Void,inf,g,,']
+        response = self.upload('items.csv', '\n'.join(rows) + '\n')
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['rows'], report['created'], report['skipped']), (5, 2, 3))
+        self.assertEqual([error['line'] for error in report['errors']], [4, 5, 6])
+        carrots = Ingredient.objects.get(name='Carrots')
+        self.assertEqual((carrots.category, carrots.unit, carrots.expiration_date), ('VEG', 'kg', date(2030, 1, 1)))
+        self.assertEqual(Ingredient.objects.get(name='Rice').expiration_date, date.today() + timedelta(days=365))
+
+    def test_ndjson_import(self):
+        lines = ['{"name": "Salmon", "quantity": 2, "unit": "pc"}', 'not json']
+        report = self.upload('items.ndjson', '\n'.join(lines)).json()
+        self.assertEqual((report['created'], report['skipped']), (1, 1))
+        self.assertEqual(Ingredient.objects.get().category, 'SEAFOOD')
+
+    def test_ndjson_values_must_have_the_right_types(self):
+        lines = [
+            '{"name": "Flour", "quantity": 1, "unit": 5}',
+            '{"name": "Sugar", "unit": ["g"]}',
+            '{"name": 42}',
+            '{"name": {"en": "Salt"}}',
+            '{"name": "Oil", "quantity": [1]}',
+            '{"name": "Honey", "quantity": true}',
+            '{"name": "Vinegar", "expiration_date": 20300101}',
+            '{"name": "Rice", "quantity": 2, "unit": "kg"}',
+        ]
+        response = self.upload('items.ndjson', '\n'.join(lines))
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['created'], report['skipped']), (1, 7))
+        self.assertEqual([e['line'] for e in report['errors']], [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(report['errors'][0]['error'], 'Invalid unit: expected text, got int')
+        self.assertEqual(Ingredient.objects.get().name, 'Rice')
+
+
+class CanonicalQuantityTests(TestCase):
+    def test_generated_columns_follow_writes(self):
+        user = User.objects.create_user(username='units', password='pw')
+        Ingredient.objects.bulk_create([
+            Ingredient(user=user, name='flour', category='GRAIN', expiration_date=date(2030, 1, 1),
+                       quantity=1.5, unit='kg'),
+            Ingredient(user=user, name='milk', category='DAIRY', expiration_date=date(2030, 1, 1),
+                       quantity=2, unit='cup'),
+            Ingredient(user=user, name='eggs', category='EGG', expiration_date=date(2030, 1, 1),
+                       quantity=6, unit='pc'),
+        ])
+        rows = {i.name: (i.mass_g, i.volume_ml, i.count) for i in Ingredient.objects.all()}
+        self.assertEqual(rows['flour'], (1500.0, None, None))
+        self.assertAlmostEqual(rows['milk'][1], 473.176473)
+        self.assertEqual(rows['eggs'], (None, None, 6.0))
+
+        Ingredient.objects.filter(name='flour').update(quantity=500, unit='g')
+        self.assertEqual(Ingredient.objects.get(name='flour').mass_g, 500.0)
+
+    def test_quantity_parser(self):
+        from .units import normalize_amount, parse_quantity
+
+        self.assertEqual(parse_quantity('1 1/2 cups')[:2], (1.5, 'cup'))
+        self.assertEqual(parse_quantity('½ tsp')[:2], (0.5, 'tsp'))
+        self.assertEqual(parse_quantity('2-3 cloves'), (2.0, None, 'cloves'))
+        self.assertEqual(parse_quantity('a pinch'), (None, None, ''))
+        self.assertEqual(normalize_amount('2 lbs')['mass_g'], 907.18474)
+        self.assertEqual(normalize_amount('3 cloves')['count'], 3.0)
+
+
+class CookNowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cook', password='pw')
+        today = date.today()
+        for name, days in [('Chicken thighs', 1), ('Garlic', 20), ('Tomatoes', 20), ('Old milk', -2)]:
+            Ingredient.objects.create(user=cls.user, name=name, category='OTHER', quantity=1, unit='pc',
+                                      expiration_date=today + timedelta(days=days))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def ranked_titles(self):
+        return [item['recipe']['title'] for item in self.client.get('/api/cook-now/').json()['results']]
+
+    def test_ranks_by_coverage_and_tracks_writes(self):
+        def make(title, *names):
+            return Recipe.objects.create(user=self.user, title=title, ingredients=[{'name': n} for n in names])
+
+        make('Garlic chicken', 'chicken', '2 cloves garlic')
+        make('Tomato soup', 'tomato', 'cream', 'basil')
+        milk = make('Milkshake', 'milk', 'ice cream')
+        self.assertEqual(self.ranked_titles(), ['Garlic chicken', 'Tomato soup'])
+
+        response = self.client.get('/api/cook-now/').json()['results'][1]
+        self.assertEqual((response['missing_count'], sorted(response['missing'])), (2, ['basil', 'cream']))
+
+        soup = Recipe.objects.get(title='Tomato soup')
+        soup.ingredients = [{'name': 'tomatoes'}, {'name': 'garlic'}]
+        soup.save()
+        milk.delete()
+        self.assertEqual(self.ranked_titles(), ['Garlic chicken', 'Tomato soup'])
+        make('Chicken tomato stew', 'chicken thigh', 'tomato', 'garlic')
+        # Ties on score and missing items go to the newer recipe
+        self.assertEqual(self.ranked_titles()[0], 'Chicken tomato stew')
+
+    def test_long_item_names_stay_cheap(self):
+        Recipe.objects.create(user=self.user, title='Herb rice', ingredients=[{'name': 'rice'}, {'name': 'thyme'}])
+        words = ' '.join(f"w{chr(97 + i // 26)}{chr(97 + i % 26)}" for i in range(40))
+        Ingredient.objects.create(user=self.user, name=f"rice {words}", category='GRAIN', quantity=1, unit='pc',
+                                  expiration_date=date.today() + timedelta(days=20))
+        started = time.perf_counter()
+        response = self.client.get('/api/cook-now/').json()['results']
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertEqual([(r['recipe']['title'], r['missing']) for r in response], [('Herb rice', ['thyme'])])
+
+    def test_index_follows_other_workers_and_local_commits(self):
+        from . import matching
+
+        soup = Recipe.objects.create(user=self.user, title='Tomato soup', ingredients=[{'name': 'tomato'}])
+        self.assertEqual(self.ranked_titles(), ['Tomato soup'])
+        # Written by another worker: only the row and the shared version move
+        Recipe.objects.filter(pk=soup.pk).update(ingredients=[{'name': 'leek'}])
+        DataVersion.objects.filter(pk=self.user.pk).update(recipes=F('recipes') + 1,
+                                                           recipe_ingredients=F('recipe_ingredients') + 1)
+        self.assertEqual(self.ranked_titles(), [])
+
+        index = matching.get_index(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(user=self.user, title='Garlic bread', ingredients=[{'name': 'garlic'}])
+        self.assertIs(matching.get_index(self.user.id), index)
+        self.assertEqual(self.ranked_titles(), ['Garlic bread'])
+
+
+class RecipeIngredientTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rows', password='pw', is_staff=True, is_superuser=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_rows_follow_recipe_json(self):
+        from .models import RecipeIngredient
+
+        recipe = Recipe.objects.create(user=self.user, title='Stew', ingredients=[
+            {'name': 'Chicken Thighs', 'quantity': '500 g'},
+            {'name': 'Diced tomatoes', 'quantity': '1 1/2 cups'},
+            {'name': 'Garlic', 'quantity': 3, 'unit': 'cloves'},
+        ])
+        rows = list(RecipeIngredient.objects.filter(recipe=recipe).values_list('normalized_name', 'amount', 'unit'))
+        self.assertEqual(rows[0], ('chicken thigh', 500.0, 'g'))
+        self.assertEqual((rows[1][0], round(rows[1][1], 1), rows[1][2]), ('tomato', 354.9, 'ml'))
+        self.assertEqual(rows[2], ('garlic', 3.0, 'pc'))
+
+        recipe.ingredients = [{'name': 'garlic', 'quantity': '1 clove'}]
+        recipe.save()
+        self.assertEqual(RecipeIngredient.objects.filter(recipe=recipe).count(), 1)
+
+        Recipe.objects.create(user=self.user, title='Salad', ingredients=[{'name': 'tomato'}])
+        response = self.client.get('/api/save-recipe/', {'ingredient': 'tomatoes'}).json()
+        self.assertEqual([r['title'] for r in response['results']], ['Salad'])
+
+        response = self.client.get('/admin/core/recipe/', {'q': 'garl'})
+        self.assertContains(response, 'Stew')
+        self.assertNotContains(response, 'Salad')
+
+    def test_saves_that_keep_the_ingredients_skip_the_resync(self):
+        from .models import RecipeIngredient
+        from .versions import RECIPE_INGREDIENTS, RECIPES, current
+
+        recipe = Recipe.objects.create(user=self.user, title='Stew', ingredients=[{'name': 'leek'}])
+        rows = list(RecipeIngredient.objects.filter(recipe=recipe).values_list('pk', flat=True))
+        recipes, index = current(self.user.id, RECIPES, RECIPE_INGREDIENTS)
+
+        response = self.client.patch(f'/api/recipes-detail/{recipe.pk}/', {'favorite': True},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.title = 'Leek stew'
+        recipe.save()
+        recipe.ingredients.append({'name': 'potato'})
+        recipe.save(update_fields=['title'])
+        self.assertEqual(list(RecipeIngredient.objects.filter(recipe=recipe).values_list('pk', flat=True)), rows)
+        # List ETags still move; the cook-now index doesn't need to
+        moved = current(self.user.id, RECIPES, RECIPE_INGREDIENTS)
+        self.assertGreater(moved[0], recipes)
+        self.assertEqual(moved[1], index)
+
+        # Changed in place and saved in full
+        recipe.save()
+        self.assertEqual(list(RecipeIngredient.objects.filter(recipe=recipe).values_list('name', flat=True)),
+                         ['leek', 'potato'])
+        self.assertGreater(current(self.user.id, RECIPE_INGREDIENTS)[0], index)
+
+
+class ExpiryDigestTests(TestCase):
+    def test_sweep_then_lookup_and_invalidation(self):
+        from .expiry import sweep
+        from .models import ExpiryDigest
+
+        user = User.objects.create_user(username='sweeper', password='pw')
+        today = date.today()
+        for days in (-1, 0, 2, 5, 30):
+            Ingredient.objects.create(user=user, name=f'in {days}', category='OTHER', quantity=1, unit='pc',
+                                      expiration_date=today + timedelta(days=days))
+        self.assertEqual(sweep(today, chunk_size=2), (1, 4))
+        digest = ExpiryDigest.objects.get(user=user)
+        self.assertEqual((digest.expired, digest.expiring_soon, digest.expiring_week), (1, 2, 1))
+        self.assertEqual([item['days_left'] for item in digest.items], [0, 2, 5])
+
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/ingredients/expiring/').json()
+        self.assertEqual(response['expiring_soon'], 2)
+        self.assertFalse(any('core_ingredient' in q['sql'] for q in ctx.captured_queries))
+
+        Ingredient.objects.create(user=user, name='new', category='OTHER', quantity=1, unit='pc',
+                                  expiration_date=today + timedelta(days=1))
+        self.assertEqual(self.client.get('/api/ingredients/expiring/').json()['expiring_soon'], 3)
+
+    def test_sweep_keeps_a_stale_mark_made_while_it_ran(self):
+        from . import expiry
+        from .models import ExpiryDigest
+
+        user = User.objects.create_user(username='racer', password='pw')
+        today = date.today()
+        Ingredient.objects.create(user=user, name='milk', category='DAIRY', quantity=1, unit='l',
+                                  expiration_date=today + timedelta(days=1))
+        expiry.sweep(today)
+        add = expiry._add
+
+        def add_then_write(digest, *row):
+            add(digest, *row)
+            if not written:
+                # Another worker writes once the sweep has read the rows
+                written.append(Ingredient.objects.create(user=user, name='eggs', category='EGG', quantity=6,
+                                                         unit='pc', expiration_date=today + timedelta(days=2)))
+
+        written = []
+        with mock.patch.object(expiry, '_add', add_then_write):
+            expiry.sweep(today)
+        self.assertFalse(ExpiryDigest.objects.filter(user=user, date=today).exists())
+        self.assertEqual(expiry.get_digest(user, today).expiring_soon, 2)
+
+        # A row left stale by an earlier write is overwritten as usual
+        expiry.mark_stale(user.id)
+        self.assertEqual(expiry.sweep(today), (1, 2))
+        self.assertEqual(ExpiryDigest.objects.get(user=user).date, today)
+
+
+class ListRepresentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='fields', password='pw', email='f@example.com')
+        Ingredient.objects.create(user=cls.user, name='Milk', icon_name=None, category='DAIRY',
+                                  expiration_date=date(2030, 1, 2), quantity=1.5, unit='l')
+        Recipe.objects.create(user=cls.user, title='Pancakes', ingredients=[{'name': 'milk', 'quantity': '1 cup'}],
+                              steps=['Mix', 'Fry'], favorite=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_fast_path_matches_serializers(self):
+        from .serializers import IngredientSerializer, RecipeSerializer
+
+        ingredients = self.client.get('/api/ingredients/').json()['results']
+        self.assertEqual(ingredients, IngredientSerializer(Ingredient.objects.all(), many=True).data)
+        recipes = self.client.get('/api/save-recipe/').json()['results']
+        self.assertEqual(recipes, RecipeSerializer(Recipe.objects.all(), many=True).data)
+
+    def test_compact_fields_and_expand(self):
+        compact = self.client.get('/api/save-recipe/', {'view': 'compact'}).json()['results'][0]
+        self.assertEqual(set(compact), {'id', 'title', 'ingredients', 'favorite', 'created_at'})
+
+        compact = self.client.get('/api/ingredients/', {'view': 'compact'}).json()['results'][0]
+        self.assertNotIn('user', compact)
+        row = self.client.get('/api/ingredients/', {'fields': 'name,user'}).json()['results'][0]
+        self.assertEqual(row, {'name': 'Milk', 'user': self.user.id})
+        row = self.client.get('/api/ingredients/', {'fields': 'name', 'expand': 'user'}).json()['results'][0]
+        self.assertEqual(row['user']['username'], 'fields')
+
+        page = self.client.get('/api/save-recipe/', {'cursor': '', 'fields': 'title'}).json()
+        self.assertEqual(page['results'], [{'title': 'Pancakes'}])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='etag', password='pw')
+        self.client.force_login(self.user)
+        Ingredient.objects.create(user=self.user, name='Milk', category='DAIRY',
+                                  expiration_date=date(2030, 1, 1), quantity=1, unit='l')
+
+    def revalidate(self, url, tag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=tag)
+
+    def test_not_modified_skips_list_queries(self):
+        first = self.client.get('/api/ingredients/')
+        tag = first['ETag']
+        self.assertTrue(tag.startswith('"'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.revalidate('/api/ingredients/', tag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], tag)
+        self.assertFalse([q for q in ctx.captured_queries if 'core_ingredient' in q['sql']])
+        # Different parameters are a different representation
+        self.assertEqual(self.revalidate('/api/ingredients/', tag, page=2).status_code, 200)
+
+    def test_writes_change_the_tag(self):
+        tag = self.client.get('/api/ingredients/')['ETag']
+        self.client.post('/api/ingredients/bulk/', [{
+            'name': 'Eggs', 'category': 'DAIRY', 'expiration_date': '2030-01-02', 'quantity': 6, 'unit': 'pc',
+        }], content_type='application/json')
+        response = self.revalidate('/api/ingredients/', tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+
+        recipes_tag = self.client.get('/api/save-recipe/')['ETag']
+        self.assertEqual(self.revalidate('/api/save-recipe/', recipes_tag).status_code, 304)
+        Recipe.objects.create(user=self.user, title='Omelette', ingredients=['eggs'], steps=[])
+        self.assertEqual(self.revalidate('/api/save-recipe/', recipes_tag).status_code, 200)
+
+    def test_account_actions_change_the_tag(self):
+        account = self.user.account
+        user_tag = self.client.get('/api/auth/user/')['ETag']
+        account_tag = self.client.get(f'/api/accounts/{account.pk}/')['ETag']
+        self.assertEqual(self.revalidate('/api/auth/user/', user_tag).status_code, 304)
+        self.assertEqual(self.revalidate(f'/api/accounts/{account.pk}/', account_tag).status_code, 304)
+
+        self.client.post(f'/api/accounts/{account.pk}/update_allergies/', {'allergies': ['peanuts']},
+                         content_type='application/json')
+        response = self.revalidate('/api/auth/user/', user_tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['account']['allergies'], ['peanuts'])
+        self.assertEqual(self.revalidate(f'/api/accounts/{account.pk}/', account_tag).status_code, 200)
+
+    def test_versions_are_shared_between_workers(self):
+        tag = self.client.get('/api/ingredients/')['ETag']
+        # A worker's local cache knows nothing about versions
+        cache.clear()
+        self.assertEqual(self.revalidate('/api/ingredients/', tag).status_code, 304)
+        # A write committed by another worker only touches the database row
+        DataVersion.objects.filter(pk=self.user.pk).update(ingredients=F('ingredients') + 1)
+        self.assertEqual(self.revalidate('/api/ingredients/', tag).status_code, 200)
+
+    def test_ingredient_tags_change_at_midnight(self):
+        tag = self.client.get('/api/ingredients/', {'condition': 'expired'})['ETag']
+        recipes_tag = self.client.get('/api/save-recipe/')['ETag']
+        with mock.patch('django.utils.timezone.localdate', return_value=date.today() + timedelta(days=1)):
+            self.assertEqual(self.revalidate('/api/ingredients/', tag, condition='expired').status_code, 200)
+            self.assertEqual(self.revalidate('/api/save-recipe/', recipes_tag).status_code, 304)
+
+
+class ListCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cached', password='pw')
+        self.client.force_login(self.user)
+        self.milk = Ingredient.objects.create(user=self.user, name='Milk', category='DAIRY',
+                                              expiration_date=date(2030, 1, 1), quantity=1, unit='l')
+        self.recipe = Recipe.objects.create(user=self.user, title='Soup', ingredients=['leek'], steps=[])
+
+    def names(self, response):
+        return [item['name'] for item in response.json()['results']]
+
+    def test_repeat_reads_hit_the_cache(self):
+        first = self.client.get('/api/ingredients/', {'search': 'mil', 'page': 1})
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/ingredients/?page=1&search=mil')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertFalse([q for q in ctx.captured_queries if 'core_ingredient' in q['sql']])
+
+        other = User.objects.create_user(username='other', password='pw')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get('/api/ingredients/?page=1&search=mil').json()['results'], [])
+
+    def test_writes_are_never_served_stale(self):
+        self.client.get('/api/ingredients/')
+        self.client.patch(f'/api/ingredients/{self.milk.pk}/', {'name': 'Oat milk'}, content_type='application/json')
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self.names(response), ['Oat milk'])
+
+        self.client.post('/api/ingredients/bulk/', [{
+            'name': 'Eggs', 'category': 'DAIRY', 'expiration_date': '2030-01-02', 'quantity': 6, 'unit': 'pc',
+        }], content_type='application/json')
+        self.assertEqual(self.names(self.client.get('/api/ingredients/')), ['Oat milk', 'Eggs'])
+
+        self.client.delete(f'/api/ingredients/{self.milk.pk}/')
+        self.assertEqual(self.names(self.client.get('/api/ingredients/')), ['Eggs'])
+
+        self.assertFalse(self.client.get('/api/save-recipe/').json()['results'][0]['favorite'])
+        self.client.patch(f'/api/recipes-detail/{self.recipe.pk}/', {'favorite': True},
+                          content_type='application/json')
+        self.assertTrue(self.client.get('/api/save-recipe/').json()['results'][0]['favorite'])
+        self.client.delete(f'/api/recipes-detail/{self.recipe.pk}/')
+        self.assertEqual(self.client.get('/api/save-recipe/').json()['results'], [])
+
+    def test_write_from_another_worker_retires_pages(self):
+        self.client.get('/api/ingredients/')
+        self.assertEqual(self.client.get('/api/ingredients/')['X-Cache'], 'HIT')
+        # Another worker renames the item; this worker's caches never see the write
+        Ingredient.objects.filter(pk=self.milk.pk).update(name='Oat milk')
+        DataVersion.objects.filter(pk=self.user.pk).update(ingredients=F('ingredients') + 1)
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self.names(response), ['Oat milk'])
+
+    def test_stats(self):
+        from .response_cache import get_list_cache
+
+        before = get_list_cache().stats()
+        self.client.get('/api/save-recipe/')
+        self.client.get('/api/save-recipe/')
+        after = get_list_cache().stats()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertIsNotNone(after['hit_ratio'])
+        self.assertEqual(self.client.get('/api/lists/cache-status/').status_code, 403)
+
+
+class ORJSONRendererTests(TestCase):
+    payload = {
+        'created_at': datetime(2030, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+        'date': date(2030, 1, 2),
+        'price': Decimal('1.50'),
+        'steps': ['Stir gently', 'jalapeño — 2–3 min'],
+        1: None,
+        'nested': [{'quantity': 1.5, 'favorite': True}],
+    }
+
+    @skipUnless(renderers.orjson, "orjson is not installed")
+    def test_matches_stdlib_renderer(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(renderers.ORJSONRenderer().render(self.payload), expected)
+        self.assertEqual(
+            renderers.ORJSONRenderer().render(self.payload, 'application/json; indent=2'),
+            JSONRenderer().render(self.payload, 'application/json; indent=2'),
+        )
+        self.assertEqual(renderers.ORJSONParser().parse(io.BytesIO(expected)),
+                         JSONParser().parse(io.BytesIO(expected)))
+        with self.assertRaises(ParseError):
+            renderers.ORJSONParser().parse(io.BytesIO(b'{"name": '))
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+            self.assertEqual(renderers.ORJSONParser().parse(io.BytesIO(b'{"a": [1]}')), {'a': [1]})
+
+
+class BootstrapTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='boot', password='pw')
+        Ingredient.objects.create(user=self.user, name='Milk', category='DAIRY',
+                                  expiration_date=date.today() + timedelta(days=1), quantity=1, unit='l')
+        for i in range(12):
+            Recipe.objects.create(user=self.user, title=f'Recipe {i}', ingredients=['milk'], steps=['Stir'])
+
+    def test_anonymous(self):
+        data = self.client.get('/api/auth/bootstrap/').json()
+        self.assertTrue(data['csrfToken'])
+        self.assertIsNone(data['user'])
+        self.assertIn('csrftoken', self.client.cookies)
+
+    def test_fixed_query_count(self):
+        self.client.force_login(self.user)
+        with self.assertNumQueries(5):
+            data = self.client.get('/api/auth/bootstrap/').json()
+        self.assertEqual(data['user']['username'], 'boot')
+        self.assertEqual(data['account']['user']['id'], self.user.id)
+        self.assertEqual(data['summary']['conditions']['expiring_soon']['count'], 1)
+        self.assertEqual(data['recipes']['count'], 12)
+        self.assertEqual([r['title'] for r in data['recipes']['results']],
+                         [f'Recipe {i}' for i in range(11, 2, -1)])
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/auth/bootstrap/', {'cursor': '', 'view': 'compact'}).json()
+        self.assertNotIn('steps', data['recipes']['results'][0])
+        self.assertTrue(data['recipes']['next'])
+        with self.assertNumQueries(3):
+            self.client.get('/api/auth/user/', HTTP_ACCEPT='application/json')
+
+    def test_login_does_not_resave_account(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/login/', {'username': 'boot', 'password': 'pw'},
+                                        content_type='application/json')
+        self.assertEqual(response.json()['account']['user']['username'], 'boot')
+        self.assertFalse([q for q in ctx.captured_queries if 'core_account' in q['sql'] and 'UPDATE' in q['sql']])
+        self.assertEqual(sum('core_account' in q['sql'] for q in ctx.captured_queries), 1)
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='token', password='pw')
+        self.client = Client(enforce_csrf_checks=True)
+        response = self.client.post('/api/auth/token/', {'username': 'token', 'password': 'pw'},
+                                    content_type='application/json')
+        self.auth = {'HTTP_AUTHORIZATION': f"Token {response.json()['token']}"}
+
+    def test_token_requests_skip_session_and_csrf(self):
+        response = self.client.post('/api/ingredients/', {
+            'name': 'Milk', 'category': 'DAIRY', 'expiration_date': '2030-01-01', 'quantity': 1, 'unit': 'l',
+        }, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/auth/user/', **self.auth)
+        self.assertEqual(response.json()['account']['user']['username'], 'token')
+        self.assertFalse([q for q in ctx.captured_queries if 'django_session' in q['sql']])
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_invalid_and_revoked_tokens(self):
+        self.assertEqual(self.client.get('/api/auth/user/', HTTP_AUTHORIZATION='Token nope').status_code, 403)
+        self.user.set_password('new')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/user/', **self.auth).status_code, 403)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+    def test_cached_user_sees_account_changes(self):
+        self.client.get('/api/auth/user/', **self.auth)
+        # Only the account version lookups: one for the user cache key, one for the ETag
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/auth/user/', HTTP_ACCEPT='application/json',
+                                             **self.auth).status_code, 200)
+        account = Account.objects.get(user=self.user)
+        response = self.client.post(f'/api/accounts/{account.pk}/update_allergies/', {'allergies': ['soy']},
+                                    content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/user/', **self.auth).json()['account']['allergies'], ['soy'])
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+    def test_cached_user_revoked_by_another_worker(self):
+        self.assertEqual(self.client.get('/api/auth/user/', **self.auth).status_code, 200)
+        # Password changed elsewhere: this worker's cached user still has the old hash
+        User.objects.filter(pk=self.user.pk).update(password=make_password('new'))
+        DataVersion.objects.filter(pk=self.user.pk).update(account=F('account') + 1)
+        self.assertEqual(self.client.get('/api/auth/user/', **self.auth).status_code, 403)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        client = Client()
+        client.post('/api/auth/login/', {'username': 'token', 'password': 'pw'}, content_type='application/json')
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/auth/user/')
+        self.assertEqual(response.json()['user']['username'], 'token')
+        self.assertFalse([q for q in ctx.captured_queries if 'django_session' in q['sql']])
@@ -0,0 +1,210 @@
+import math
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import Throttled
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+
+class MemoryStore:
+    """
+    Per-process state behind a single lock. Every check is a dict lookup
+    and a little arithmetic, so it stays in the microsecond range.
+    """
+    sweep_every = 10000
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+        self.updates = 0
+
+    def update(self, key, fn, ttl):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.data.get(key)
+            current = entry[0] if entry and entry[1] > now else None
+            value, result = fn(current)
+            if value is None:
+                self.data.pop(key, None)
+            else:
+                self.data[key] = (value, now + ttl)
+            self.updates += 1
+            if self.updates % self.sweep_every == 0:
+                self.data = {k: v for k, v in self.data.items() if v[1] > now}
+            return result
+
+
+class CacheStore:
+    """
+    State in a Django cache shared by every worker. Read-modify-write is not
+    atomic across processes, so limits are approximate under heavy
+    contention for the same key.
+    """
+
+    prefix = "throttle:"
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def update(self, key, fn, ttl):
+        value, result = fn(self.cache.get(self.prefix + key))
+        if value is None:
+            self.cache.delete(self.prefix + key)
+        else:
+            self.cache.set(self.prefix + key, value, ttl)
+        return result
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    backend = settings.RATE_LIMIT_BACKEND
+    if backend not in _stores:
+        with _stores_lock:
+            if backend == "memory":
+                _stores.setdefault(backend, MemoryStore())
+            elif backend == "cache":
+                _stores.setdefault(backend, CacheStore(settings.RATE_LIMIT_CACHE_ALIAS))
+            else:
+                raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    return _stores[backend]
+
+
+def client_ident(request, user=None):
+    user = user if user is not None else request.user
+    if user and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{BaseThrottle().get_ident(request)}"
+
+
+def take_token(scope, ident):
+    """
+    Take one token from the `scope` bucket for `ident`. Returns 0 when
+    allowed, otherwise the seconds until a token is available.
+    """
+    config = settings.RATE_LIMITS[scope]
+    capacity = config["capacity"]
+    refill = config["refill_per_second"]
+    now = time.time()
+
+    def take(state):
+        tokens, last = state or (capacity, now)
+        tokens = min(capacity, tokens + (now - last) * refill)
+        if tokens >= 1:
+            return (tokens - 1, now), 0
+        return (tokens, now), (1 - tokens) / refill
+
+    return get_store().update(f"bucket:{scope}:{ident}", take, math.ceil(capacity / refill) + 1)
+
+
+def spend_budget(ident, cost):
+    """
+    Charge `cost` tokens against today's budget for `ident`. Returns 0 when
+    allowed, otherwise the seconds until the budget resets (midnight UTC).
+    """
+    if cost <= 0:
+        raise ValueError(f"Budget cost must be positive, got {cost!r}")
+    budget = settings.LLM_DAILY_TOKEN_BUDGET
+    now = timezone.now()
+
+    def spend(used):
+        used = used or 0
+        if used + cost > budget:
+            return used, False
+        return used + cost, True
+
+    if get_store().update(f"budget:{now.date().isoformat()}:{ident}", spend, 60 * 60 * 24):
+        return 0
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per user (or per IP when anonymous). `scope` selects
+    capacity and refill rate from settings.RATE_LIMITS.
+    """
+    scope = None
+
+    def allow_request(self, request, view):
+        self.wait_time = take_token(self.scope, client_ident(request))
+        return self.wait_time == 0
+
+    def wait(self):
+        return self.wait_time
+
+
+class LLMRateThrottle(TokenBucketThrottle):
+    scope = 'llm'
+
+
+class AuthRateThrottle(TokenBucketThrottle):
+    scope = 'auth'
+
+
+def charge_budget(request, cost):
+    """
+    Charge `cost` tokens against the daily budget of the request's user (or
+    IP), raising Throttled when it doesn't fit. The generation views call
+    it only when a request is about to go upstream itself, so cache hits and
+    coalesced requests are not charged.
+    """
+    wait = spend_budget(client_ident(request), cost)
+    if wait:
+        raise Throttled(wait)
+
+
+def acquire_slot(ident, limit):
+    def enter(active):
+        active = active or 0
+        if active >= limit:
+            return active, False
+        return active + 1, True
+
+    return get_store().update(f"concurrency:{ident}", enter, 60 * 10)
+
+
+def slot_available(ident, limit):
+    """
+    Whether acquire_slot() would succeed right now, without taking a slot.
+    """
+    return get_store().update(f"concurrency:{ident}", lambda active: (active, (active or 0) < limit), 60 * 10)
+
+
+def release_slot(ident):
+    def leave(active):
+        active = (active or 1) - 1
+        return (active or None), None
+
+    get_store().update(f"concurrency:{ident}", leave, 60 * 10)
+
+
+def limit_concurrency(view_func):
+    """
+    Cap the number of requests a user (or IP) may have running in this view
+    at once (settings.LLM_MAX_CONCURRENT_PER_USER). Apply below @api_view.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        ident = client_ident(request)
+        if not acquire_slot(ident, settings.LLM_MAX_CONCURRENT_PER_USER):
+            return Response(
+                {'detail': 'Too many concurrent generations. Wait for one to finish.'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': '1'},
+            )
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            release_slot(ident)
+
+    return wrapper
@@ -0,0 +1,132 @@
+"""
+Unit normalization: a fixed conversion table from Ingredient.UNITS to
+canonical mass (g), volume (ml) and count, plus a parser for the
+free-text quantity strings in recipe JSON ("1 1/2 cups", "200g", "½ tsp").
+"""
+import re
+from fractions import Fraction
+from functools import lru_cache
+
+MASS, VOLUME, COUNT = 'mass_g', 'volume_ml', 'count'
+DIMENSIONS = (MASS, VOLUME, COUNT)
+
+# unit -> (dimension, factor to the canonical unit of that dimension)
+CONVERSIONS = {
+    'g': (MASS, 1.0),
+    'kg': (MASS, 1000.0),
+    'oz': (MASS, 28.349523125),
+    'lb': (MASS, 453.59237),
+    'ml': (VOLUME, 1.0),
+    'l': (VOLUME, 1000.0),
+    'tsp': (VOLUME, 4.92892159375),
+    'tbsp': (VOLUME, 14.78676478125),
+    'cup': (VOLUME, 236.5882365),
+    'pc': (COUNT, 1.0),
+    'bunch': (COUNT, 1.0),
+    'slice': (COUNT, 1.0),
+    'pack': (COUNT, 1.0),
+    'bottle': (COUNT, 1.0),
+    'can': (COUNT, 1.0),
+}
+
+UNIT_ALIASES = {
+    'g': 'g', 'gr': 'g', 'gram': 'g', 'grams': 'g',
+    'kg': 'kg', 'kgs': 'kg', 'kilo': 'kg', 'kilos': 'kg', 'kilogram': 'kg', 'kilograms': 'kg',
+    'oz': 'oz', 'ounce': 'oz', 'ounces': 'oz',
+    'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'ml': 'ml', 'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml',
+    'l': 'l', 'lt': 'l', 'ltr': 'l', 'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l',
+    'tsp': 'tsp', 'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'tbsp': 'tbsp', 'tbs': 'tbsp', 'tablespoon': 'tbsp', 'tablespoons': 'tbsp',
+    'cup': 'cup', 'cups': 'cup',
+    'pc': 'pc', 'pcs': 'pc', 'piece': 'pc', 'pieces': 'pc', 'ea': 'pc', 'each': 'pc',
+    'bunch': 'bunch', 'bunches': 'bunch',
+    'slice': 'slice', 'slices': 'slice',
+    'pack': 'pack', 'packs': 'pack', 'pk': 'pack', 'packet': 'pack', 'packets': 'pack',
+    'bottle': 'bottle', 'bottles': 'bottle', 'btl': 'bottle',
+    'can': 'can', 'cans': 'can', 'tin': 'can', 'tins': 'can',
+}
+
+VULGAR_FRACTIONS = {'½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4', '⅛': '1/8'}
+VULGAR_RE = re.compile('(\\d?)\\s*([' + ''.join(VULGAR_FRACTIONS) + '])')
+# "1 1/2", "1/2", "1.5", "1,5", "2-3" (the low end of a range is used)
+QUANTITY_RE = re.compile(
+    r'^\s*(?:(?P<whole>\d+)\s+(?P<num>\d+)/(?P<den>\d+)'
+    r'|(?P<fnum>\d+)/(?P<fden>\d+)'
+    r'|(?P<dec>\d+(?:[.,]\d+)?)(?:\s*(?:-|to)\s*\d+(?:[.,]\d+)?)?)'
+    r'\s*(?P<unit>[a-zA-Z]+\.?)?'
+)
+
+
+def normalize_unit(unit):
+    return UNIT_ALIASES.get((unit or '').strip().lower().rstrip('.'))
+
+
+def to_canonical(quantity, unit):
+    """
+    (dimension, amount in that dimension's canonical unit), or None when
+    the unit isn't convertible.
+    """
+    conversion = CONVERSIONS.get(unit)
+    if conversion is None or quantity is None:
+        return None
+    dimension, factor = conversion
+    return dimension, quantity * factor
+
+
+def _vulgar(match):
+    whole, fraction = match.groups()
+    return f"{whole} {VULGAR_FRACTIONS[fraction]}" if whole else VULGAR_FRACTIONS[fraction]
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity(text):
+    """
+    Parse a free-text quantity into (value, unit, raw_unit). `unit` is the
+    Ingredient.UNITS code when recognised, otherwise None with the word
+    kept in `raw_unit` ("3 cloves" -> (3.0, None, 'cloves')). Returns
+    (None, None, '') when no leading number is found ("a pinch").
+
+    Recipe JSON repeats the same handful of strings, so results are cached.
+    """
+    if text is None:
+        return None, None, ''
+    text = VULGAR_RE.sub(_vulgar, str(text))
+    match = QUANTITY_RE.match(text)
+    if not match:
+        return None, None, ''
+    if match.group('whole') or match.group('fnum'):
+        whole = int(match.group('whole') or 0)
+        num = int(match.group('num') or match.group('fnum'))
+        den = int(match.group('den') or match.group('fden'))
+        value = whole + Fraction(num, den) if den else None
+    else:
+        value = float(match.group('dec').replace(',', '.'))
+    raw_unit = (match.group('unit') or '').rstrip('.')
+    return (float(value) if value is not None else None), normalize_unit(raw_unit), raw_unit.lower()
+
+
+def normalize_amount(quantity, unit=None):
+    """
+    Canonical {'mass_g', 'volume_ml', 'count'} for a recipe ingredient whose
+    quantity is a number plus unit or a free-text string. Amounts with an
+    unknown unit word are counted ("3 cloves" -> count 3).
+    """
+    amounts = dict.fromkeys(DIMENSIONS)
+    if isinstance(quantity, (int, float)) and not isinstance(quantity, bool):
+        value, unit = float(quantity), normalize_unit(unit) or 'pc'
+    else:
+        value, parsed_unit, _ = parse_quantity(quantity)
+        unit = parsed_unit or normalize_unit(unit) or ('pc' if value is not None else None)
+    canonical = to_canonical(value, unit)
+    if canonical:
+        amounts[canonical[0]] = canonical[1]
+    return amounts
+
+
+def normalize_many(items):
+    """
+    Canonical amounts for a list of recipe ingredient dicts
+    ({'name', 'quantity', 'unit'?}), in order.
+    """
+    return [normalize_amount(item.get('quantity'), item.get('unit')) for item in items]
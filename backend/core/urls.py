@@ -13,10 +13,18 @@ urlpatterns = [
     path('auth/register/', views.register, name='register'),
     path('auth/login/', views.login_view, name='login'),
     path('auth/logout/', views.logout_view, name='logout'),
+    path('auth/token/', views.token_view, name='token'),
     path('auth/user/', views.user_view, name='user'),
     path('auth/csrf/', views.csrf_token, name='csrf-token'),
+    path('auth/bootstrap/', views.bootstrap, name='bootstrap'),
     path('ingredients/', views.ingredient_list, name='ingredient-list'),
+    path('ingredients/bulk/', views.ingredient_bulk, name='ingredient-bulk'),
+    path('ingredients/import/', views.ingredient_import, name='ingredient-import'),
+    path('ingredients/expiring/', views.ingredient_expiring, name='ingredient-expiring'),
+    path('ingredients/summary/', views.ingredient_summary, name='ingredient-summary'),
     path('ingredients/<int:pk>/', views.ingredient_detail, name='ingredient-detail'),
+    path('lists/cache-status/', views.list_cache_status, name='list-cache-status'),
     path('save-recipe/', views.recipe, name='save-recipe'),
+    path('cook-now/', views.cook_now, name='cook-now'),
     path('recipes-detail/<int:pk>/', views.recipe_detail, name='recipe-detail'),
 ] 
\ No newline at end of file
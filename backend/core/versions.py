@@ -0,0 +1,116 @@
+"""
+Per-user data versions for conditional GETs.
+
+Each user has a counter per scope (ingredients, recipes, account) on their
+core.DataVersion row, bumped by the receivers in core/models.py on every
+write, including the bulk paths. A fourth, recipe ingredients, only moves
+when a recipe's ingredients do; it tags the "cook now" index. The row lives in the database rather than
+a cache so that every worker sees a bump once the write commits. Read
+views hash the versions they depend on into a strong ETag, so a matching
+If-None-Match is answered with 304 after one indexed lookup, before any
+list query or serializer runs.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+INGREDIENTS, RECIPES, RECIPE_INGREDIENTS, ACCOUNT = 'ingredients', 'recipes', 'recipe_ingredients', 'account'
+SCOPES = (INGREDIENTS, RECIPES, RECIPE_INGREDIENTS, ACCOUNT)
+
+
+def current(user_id, *scopes):
+    """
+    The user's versions for `scopes`, in order; 0 before the first write.
+    """
+    from .models import DataVersion
+
+    row = next(iter(DataVersion.objects.filter(pk=user_id).values_list(*scopes)), None)
+    return tuple(row) if row is not None else (0,) * len(scopes)
+
+
+def bump(user_id, *scopes):
+    """
+    Invalidate the user's ETags for `scopes`; returns (previous, new) for
+    each scope. New versions come from the clock and only move forward, so
+    a bump that was rolled back is never handed out again. The row is
+    updated in the caller's transaction, so other workers only see the new
+    version together with the rows it covers.
+    """
+    from .models import DataVersion
+
+    with transaction.atomic():
+        rows = DataVersion.objects.select_for_update().filter(pk=user_id)
+        previous = next(iter(rows.values_list(*scopes)), None)
+        if previous is None:
+            try:
+                with transaction.atomic():
+                    DataVersion.objects.create(user_id=user_id)
+            except IntegrityError:
+                pass  # Another request created the row first
+            previous = next(iter(rows.values_list(*scopes)))
+        now = time.time_ns()
+        new = {scope: max(version + 1, now) for scope, version in zip(scopes, previous)}
+        rows.update(**new)
+        return tuple(zip(previous, new.values()))
+
+
+def normalized_query(request):
+    """
+    The query string with parameters sorted, so ?page=2&search=x and
+    ?search=x&page=2 name the same representation.
+    """
+    return urlencode(sorted(
+        (name, value) for name, values in request.GET.lists() for value in values
+    ))
+
+
+def etag(request, *scopes):
+    """
+    Strong ETag for this user's view of the request path and query: the
+    scope versions plus everything else the response body depends on.
+    """
+    user_id = request.user.id
+    # date_joined tells apart users that reuse a deleted user's id (SQLite)
+    joined = getattr(request.user, 'date_joined', None)
+    parts = [f"{user_id}@{joined}", request.path, normalized_query(request), request.META.get('HTTP_ACCEPT', '')]
+    parts += [f"{scope}={version}" for scope, version in zip(scopes, current(user_id, *scopes))]
+    if INGREDIENTS in scopes:
+        # Expiry conditions and the expired/expiring split move at midnight
+        parts.append(str(timezone.localdate()))
+    return '"%s"' % hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def not_modified(request, tag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison
+    tags = [t[2:] if t.startswith('W/') else t for t in parse_etags(header)]
+    return '*' in tags or tag in tags
+
+
+def conditional(request, *scopes):
+    """
+    (response, tag): a 304 response when the client's copy is current,
+    otherwise None and the ETag to put on the full response with
+    tagged().
+    """
+    tag = etag(request, *scopes)
+    if not_modified(request, tag):
+        return tagged(Response(status=status.HTTP_304_NOT_MODIFIED), tag), tag
+    return None, tag
+
+
+def tagged(response, tag):
+    if response.status_code in (200, 304):
+        response['ETag'] = tag
+        # Revalidate on every use; never stored by shared caches
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
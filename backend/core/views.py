@@ -1,22 +1,59 @@
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render
 from rest_framework import viewsets, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from .models import Account, Ingredient, Recipe
-from .serializers import UserSerializer, AccountSerializer, IngredientSerializer, RecipeSerializer
+from .authentication import issue_token
+from .backends import ACCOUNT_BACKEND
+from .expiry import get_digest
+from .importer import decode_lines, detect_format, import_ingredients
+from .matching import cook_now as rank_recipes, normalize_name
+from .models import Account, Ingredient, Recipe, RecipeIngredient
+from .pagination import InvalidCursor, KeysetPaginator
+from .response_cache import cached_page, get_list_cache, store_page
+from .signals import ingredients_bulk_changed
+from .units import DIMENSIONS
+from .versions import ACCOUNT, INGREDIENTS, RECIPES, conditional, tagged
+from .serializers import (
+    UserSerializer, AccountSerializer, IngredientSerializer, RecipeSerializer, ValuesRenderer,
+    representation_options,
+)
+from .throttling import AuthRateThrottle
 from django.contrib.auth import login, logout
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.core.paginator import Paginator
 from rest_framework.pagination import PageNumberPagination
+from django.db.models import Case, CharField, Count, Q, Sum, Value, When
 from django.utils import timezone
 from datetime import timedelta
 from django.middleware.csrf import get_token
 
 # Create your views here.
 
-class UserViewSet(viewsets.ModelViewSet):
+class ConditionalGetMixin:
+    """
+    Strong ETags on list and retrieve from the user's `etag_scopes` data
+    versions; a matching If-None-Match gets a 304 without touching the
+    queryset.
+    """
+    etag_scopes = (ACCOUNT,)
+
+    def list(self, request, *args, **kwargs):
+        response, tag = conditional(request, *self.etag_scopes)
+        if response is not None:
+            return response
+        return tagged(super().list(request, *args, **kwargs), tag)
+
+    def retrieve(self, request, *args, **kwargs):
+        response, tag = conditional(request, *self.etag_scopes)
+        if response is not None:
+            return response
+        return tagged(super().retrieve(request, *args, **kwargs), tag)
+
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -27,7 +64,7 @@ class UserViewSet(viewsets.ModelViewSet):
     def get_object(self):
         return self.request.user
 
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Account.objects.all()
     serializer_class = AccountSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -72,6 +109,7 @@ class AccountViewSet(viewsets.ModelViewSet):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthRateThrottle])
 def register(request):
     firstname = request.data.get('firstname') 
     lastname = request.data.get('lastname') 
@@ -98,7 +136,7 @@ def register(request):
         )
 
     user = User.objects.create_user(first_name=firstname, last_name=lastname,username=username, email=email, password=password)
-    login(request, user)
+    login(request, user, backend=ACCOUNT_BACKEND)
 
     return Response({
         'user': UserSerializer(user).data,
@@ -107,36 +145,68 @@ def register(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthRateThrottle])
 def login_view(request):
+    user, error = authenticate_credentials(request)
+    if error is not None:
+        return error
+
+    login(request, user, backend=ACCOUNT_BACKEND)
+
+    return Response({
+        'user': UserSerializer(user).data,
+        'account': AccountSerializer(user.account).data
+    })
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([AuthRateThrottle])
+def token_view(request):
+    """
+    A signed API token for username/password, for clients that send
+    "Authorization: Token <token>" instead of a session cookie and CSRF
+    token. Valid for API_TOKEN_MAX_AGE seconds or until the password
+    changes.
+    """
+    user, error = authenticate_credentials(request)
+    if error is not None:
+        return error
+
+    return Response({
+        'token': issue_token(user),
+        'expires_in': settings.API_TOKEN_MAX_AGE,
+        'user': UserSerializer(user).data,
+        'account': AccountSerializer(user.account).data
+    })
+
+def authenticate_credentials(request):
+    """
+    (user, None) for a valid username/password in the request body,
+    otherwise (None, error response).
+    """
     username = request.data.get('username')
     password = request.data.get('password')
 
     if not all([username, password]):
-        return Response(
+        return None, Response(
             {'error': 'Please provide both username and password'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     try:
-        user = User.objects.get(username=username)
+        user = User.objects.select_related('account').get(username=username)
     except User.DoesNotExist:
-        return Response(
+        return None, Response(
             {'error': 'Invalid credentials'},
             status=status.HTTP_401_UNAUTHORIZED
         )
 
     if not user.check_password(password):
-        return Response(
+        return None, Response(
             {'error': 'Invalid credentials'},
             status=status.HTTP_401_UNAUTHORIZED
         )
-
-    login(request, user)
-
-    return Response({
-        'user': UserSerializer(user).data,
-        'account': AccountSerializer(user.account).data
-    })
+    return user, None
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -144,18 +214,125 @@ def logout_view(request):
     logout(request)
     return Response({'message': 'Successfully logged out'})
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def bootstrap(request):
+    """
+    Everything the app needs on load in one round trip: the CSRF token and,
+    when signed in, the user and account, the fridge summary and the first
+    page of saved recipes (which honours the recipe list's ?cursor=,
+    ?view=compact, ?fields= and ?expand=). Takes five queries: session,
+    user with account, summary, recipe count and recipe page; ?cursor=
+    drops the count.
+    """
+    data = {'csrfToken': get_token(request), 'user': None, 'account': None, 'summary': None, 'recipes': None}
+    if not request.user.is_authenticated:
+        return Response(data)
+    user = request.user
+    recipes = Recipe.objects.filter(user=user).order_by(*RECIPE_ORDERING)
+    try:
+        page = paginate(request, recipes, RECIPE_ORDERING, RECIPES_PER_PAGE, RecipeSerializer)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    data.update(
+        user=UserSerializer(user).data,
+        account=AccountSerializer(user.account).data,
+        summary=fridge_summary(user),
+        recipes=page,
+    )
+    return Response(data)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_view(request):
-    return Response({
+    response, tag = conditional(request, ACCOUNT)
+    if response is not None:
+        return response
+    return tagged(Response({
         'user': UserSerializer(request.user).data,
         'account': AccountSerializer(request.user.account).data
-    })
+    }), tag)
+
+# Expiry buckets, in the order they are checked. Each maps to the
+# (exclusive lower, inclusive upper) day offsets from today.
+CONDITIONS = {
+    'expired': (None, -1),
+    'expiring_soon': (-1, 3),
+    'expiring_week': (3, 7),
+    'good': (7, None),
+}
+
+
+def condition_q(condition, today):
+    lower, upper = CONDITIONS[condition]
+    q = Q()
+    if lower is not None:
+        q &= Q(expiration_date__gt=today + timedelta(days=lower))
+    if upper is not None:
+        q &= Q(expiration_date__lte=today + timedelta(days=upper))
+    return q
+
+
+def paginate(request, queryset, ordering, per_page, serializer_class):
+    """
+    Page-number pagination by default. Passing ?cursor= (empty for the
+    first page) switches to keyset pagination over `ordering`, which skips
+    the COUNT and OFFSET; ?total=1 adds an approximate count. Both modes
+    return the same keys. Raises InvalidCursor for a malformed cursor.
+
+    Rows are read with values() and rendered by ValuesRenderer, honouring
+    ?view=compact, ?fields= and ?expand=.
+    """
+    fields, expand = representation_options(request, serializer_class)
+    renderer = ValuesRenderer(serializer_class, fields=fields, expand=expand)
+    keys = [name.lstrip('-') for name in ordering]
+    rows = queryset.values(*dict.fromkeys(renderer.lookups + keys))
+
+    if 'cursor' not in request.GET:
+        paginator = Paginator(rows, per_page)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        return {
+            'count': paginator.count,
+            'num_pages': paginator.num_pages,
+            'current_page': page_obj.number,
+            'next_page': page_obj.next_page_number() if page_obj.has_next() else None,
+            'previous_page': page_obj.previous_page_number() if page_obj.has_previous() else None,
+            'next': None,
+            'previous': None,
+            'results': renderer.render(page_obj),
+        }
+
+    paginator = KeysetPaginator(rows, ordering, per_page)
+    items, next_cursor, previous_cursor = paginator.page(request.GET.get('cursor'))
+    count, estimated = None, False
+    if request.GET.get('total') in ('1', 'true'):
+        count, estimated = paginator.approximate_count()
+    return {
+        'count': count,
+        'count_is_estimate': estimated,
+        'num_pages': None,
+        'current_page': None,
+        'next_page': None,
+        'previous_page': None,
+        'next': next_cursor,
+        'previous': previous_cursor,
+        'results': renderer.render(items),
+    }
+
+
+def paginated_response(request, queryset, ordering, per_page, serializer_class):
+    try:
+        return Response(paginate(request, queryset, ordering, per_page, serializer_class))
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def ingredient_list(request):
     if request.method == 'GET':
+        response, tag = cached_page(request, INGREDIENTS)
+        if response is not None:
+            return response
         ingredients = Ingredient.objects.filter(user=request.user)
         
         # Apply search filter
@@ -170,47 +347,15 @@ def ingredient_list(request):
         
         # Apply condition filter
         condition = request.GET.get('condition')
-        print(f"Received condition parameter: {condition}")  # Debug log
-        if condition:
-            today = timezone.now().date()
-            print(f"Today's date: {today}")  # Debug log
-            
-            if condition == 'expired':
-                ingredients = ingredients.filter(expiration_date__lt=today)
-                print(f"Filtering expired items: {ingredients.count()}")  # Debug log
-            elif condition == 'expiring_soon':
-                ingredients = ingredients.filter(
-                    expiration_date__gte=today,
-                    expiration_date__lte=today + timedelta(days=3)
-                )
-                print(f"Filtering expiring soon items: {ingredients.count()}")  # Debug log
-            elif condition == 'expiring_week':
-                ingredients = ingredients.filter(
-                    expiration_date__gt=today + timedelta(days=3),
-                    expiration_date__lte=today + timedelta(days=7)
-                )
-                print(f"Filtering expiring this week items: {ingredients.count()}")  # Debug log
-            elif condition == 'good':
-                ingredients = ingredients.filter(expiration_date__gt=today + timedelta(days=7))
-                print(f"Filtering good items: {ingredients.count()}")  # Debug log
-        
-        # Order by expiration date
-        ingredients = ingredients.order_by('expiration_date')
-        
-        paginator = Paginator(ingredients, 10)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        if condition in CONDITIONS:
+            ingredients = ingredients.filter(condition_q(condition, timezone.localdate()))
 
-        serializer = IngredientSerializer(page_obj, many=True)
-        
-        return Response({
-            'count': paginator.count,
-            'num_pages': paginator.num_pages,
-            'current_page': page_obj.number,
-            'next_page': page_obj.next_page_number() if page_obj.has_next() else None,
-            'previous_page': page_obj.previous_page_number() if page_obj.has_previous() else None,
-            'results': serializer.data,
-        })
+        # Order by expiration date (id breaks ties so pages are stable)
+        ingredients = ingredients.order_by('expiration_date', 'id')
+
+        return store_page(
+            tag, paginated_response(request, ingredients, ('expiration_date', 'id'), 10, IngredientSerializer),
+        )
 
     elif request.method == 'POST':
         serializer = IngredientSerializer(data=request.data)
@@ -219,6 +364,161 @@ def ingredient_list(request):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def _bulk_items(request, kind):
+    items = request.data.get(kind) if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return None, Response({'error': f'Provide a non-empty list of {kind}'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.INGREDIENT_BULK_MAX:
+        return None, Response(
+            {'error': f'At most {settings.INGREDIENT_BULK_MAX} items per request'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return items, None
+
+@api_view(['POST', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def ingredient_bulk(request):
+    """
+    POST a list of new ingredients, PATCH a list of partial updates (each
+    with its id), or DELETE a list of ids. Every item is validated first and
+    nothing is written unless all of them pass; errors are reported per
+    item index. Writes run in one transaction.
+    """
+    if request.method == 'DELETE':
+        ids, error = _bulk_items(request, 'ids')
+        if error:
+            return error
+        if not all(isinstance(pk, int) for pk in ids):
+            return Response({'error': 'ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            found = set(Ingredient.objects.filter(user=request.user, pk__in=ids).values_list('pk', flat=True))
+            Ingredient.objects.filter(user=request.user, pk__in=found).delete()
+        return Response({'deleted': sorted(found), 'missing': [pk for pk in ids if pk not in found]})
+
+    if request.method == 'POST':
+        items, error = _bulk_items(request, 'ingredients')
+        if error:
+            return error
+        serializers = [IngredientSerializer(data=item) for item in items]
+        errors = [
+            {'index': i, 'errors': serializer.errors}
+            for i, serializer in enumerate(serializers) if not serializer.is_valid()
+        ]
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            created = Ingredient.objects.bulk_create([
+                Ingredient(user=request.user, **serializer.validated_data) for serializer in serializers
+            ])
+        ingredients_bulk_changed.send(sender=Ingredient, user_id=request.user.id)
+        return Response(IngredientSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+    items, error = _bulk_items(request, 'ingredients')
+    if error:
+        return error
+    ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+    existing = Ingredient.objects.filter(user=request.user, pk__in=[pk for pk in ids if isinstance(pk, int)]).in_bulk()
+    errors, updated, fields, seen = [], [], set(), set()
+    for i, (pk, item) in enumerate(zip(ids, items)):
+        ingredient = existing.get(pk)
+        if ingredient is None:
+            errors.append({'index': i, 'errors': {'id': ['Not found.']}})
+            continue
+        # Two updates to one row would silently keep only the last
+        if pk in seen:
+            errors.append({'index': i, 'errors': {'id': ['Duplicate id.']}})
+            continue
+        seen.add(pk)
+        serializer = IngredientSerializer(ingredient, data=item, partial=True)
+        if not serializer.is_valid():
+            errors.append({'index': i, 'errors': serializer.errors})
+            continue
+        for field, value in serializer.validated_data.items():
+            setattr(ingredient, field, value)
+        fields.update(serializer.validated_data)
+        updated.append(ingredient)
+    if errors:
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+    if fields:
+        with transaction.atomic():
+            Ingredient.objects.bulk_update(updated, sorted(fields))
+        ingredients_bulk_changed.send(sender=Ingredient, user_id=request.user.id)
+    return Response(IngredientSerializer(updated, many=True).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def ingredient_import(request):
+    """
+    Import a CSV, NDJSON or plain-text receipt upload (multipart field
+    `file`) as ingredients. ?dry_run=1 parses and validates without
+    writing.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload a file in the "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = request.data.get('format') or detect_format(upload.name, upload.content_type or '')
+    if fmt not in ('csv', 'ndjson', 'text'):
+        return Response({'error': 'format must be csv, ndjson or text'}, status=status.HTTP_400_BAD_REQUEST)
+    dry_run = str(request.GET.get('dry_run', request.data.get('dry_run', ''))).lower() in ('1', 'true')
+    report = import_ingredients(request.user, decode_lines(upload), fmt, dry_run=dry_run)
+    return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ingredient_summary(request):
+    """
+    Counts and quantities per expiry condition and per category.
+    """
+    return Response(fridge_summary(request.user))
+
+def fridge_summary(user):
+    """
+    Counts and quantities per expiry condition and per category, from a
+    single GROUP BY over (category, unit, condition). Quantities are summed
+    per unit as entered, and in canonical g/ml/count from the generated
+    columns.
+    """
+    today = timezone.localdate()
+    bucket = Case(
+        *[When(condition_q(name, today), then=Value(name)) for name in CONDITIONS],
+        output_field=CharField(),
+    )
+    rows = (
+        Ingredient.objects.filter(user=user)
+        .annotate(condition=bucket)
+        .values('category', 'unit', 'condition')
+        .annotate(
+            items=Count('id'), quantity=Sum('quantity'),
+            **{f'total_{dimension}': Sum(dimension) for dimension in DIMENSIONS},
+        )
+        .order_by()
+    )
+
+    def bucket_entry(**extra):
+        return {'count': 0, 'quantities': {}, 'canonical': dict.fromkeys(DIMENSIONS, 0), **extra}
+
+    conditions = {name: bucket_entry() for name in CONDITIONS}
+    categories = {}
+    total = 0
+    for row in rows:
+        total += row['items']
+        for entry in (
+            conditions[row['condition']],
+            categories.setdefault(row['category'], bucket_entry(**{name: 0 for name in CONDITIONS})),
+        ):
+            entry['count'] += row['items']
+            entry['quantities'][row['unit']] = entry['quantities'].get(row['unit'], 0) + row['quantity']
+            for dimension in DIMENSIONS:
+                entry['canonical'][dimension] += row[f'total_{dimension}'] or 0
+        categories[row['category']][row['condition']] += row['items']
+
+    return {
+        'date': today,
+        'total': total,
+        'conditions': conditions,
+        'categories': categories,
+    }
+
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def ingredient_detail(request, pk):
@@ -243,10 +543,17 @@ def ingredient_detail(request, pk):
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 
+# Saved recipes list: newest first, id breaks ties so pages are stable
+RECIPE_ORDERING = ('-created_at', '-id')
+RECIPES_PER_PAGE = 9
+
 @api_view(['GET','POST'])
 @permission_classes([IsAuthenticated])
 def recipe(request):
     if request.method == 'GET':
+        response, tag = cached_page(request, RECIPES)
+        if response is not None:
+            return response
         # Filter recipes by current user
         recipes = Recipe.objects.filter(user=request.user)
         # Apply search filter
@@ -258,20 +565,19 @@ def recipe(request):
         favorite = request.GET.get('favorite')
         if favorite:
             recipes = recipes.filter(favorite=True)
-        
-        paginator = Paginator(recipes, 9)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
 
-        serializer = RecipeSerializer(page_obj, many=True)
-        return Response({
-            'count': paginator.count,
-            'num_pages': paginator.num_pages,
-            'current_page': page_obj.number,
-            'next_page': page_obj.next_page_number() if page_obj.has_next() else None,
-            'previous_page': page_obj.previous_page_number() if page_obj.has_previous() else None,
-            'results': serializer.data,
-        })
+        # Apply ingredient filter (any of a comma-separated list)
+        ingredient = request.GET.get('ingredient')
+        if ingredient:
+            names = [normalize_name(name) for name in ingredient.split(',')]
+            recipes = recipes.filter(pk__in=RecipeIngredient.objects.filter(
+                user=request.user, normalized_name__in=[name for name in names if name],
+            ).values('recipe_id'))
+        recipes = recipes.order_by(*RECIPE_ORDERING)
+        
+        return store_page(
+            tag, paginated_response(request, recipes, RECIPE_ORDERING, RECIPES_PER_PAGE, RecipeSerializer),
+        )
 
     elif request.method == 'POST':
         serializer = RecipeSerializer(data=request.data)
@@ -303,6 +609,51 @@ def recipe_detail(request, pk):
         recipe.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ingredient_expiring(request):
+    """
+    Today's expiry digest: counts per bucket and the soonest-expiring
+    items. Precomputed by manage.py sweep_expiry, so normally one lookup.
+    """
+    digest = get_digest(request.user)
+    return Response({
+        'date': digest.date,
+        'expired': digest.expired,
+        'expiring_soon': digest.expiring_soon,
+        'expiring_week': digest.expiring_week,
+        'items': digest.items,
+        'computed_at': digest.computed_at,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cook_now(request):
+    """
+    Saved recipes ranked by how much of each the non-expired fridge covers,
+    with a bonus for using items that expire within three days.
+    ?limit= sets how many are returned (default 10, at most 50).
+    """
+    try:
+        limit = max(1, min(50, int(request.GET.get('limit', 10))))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    ranked, stats = rank_recipes(request.user, limit)
+    recipes = Recipe.objects.filter(user=request.user).in_bulk([item['recipe_id'] for item in ranked])
+    results = [
+        {**item, 'recipe': RecipeSerializer(recipes[item['recipe_id']]).data}
+        for item in ranked if item['recipe_id'] in recipes
+    ]
+    return Response({'results': results, **stats})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def list_cache_status(request):
+    """
+    Hit/miss counters of this process's list page cache.
+    """
+    return Response(get_list_cache().stats())
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def csrf_token(request):
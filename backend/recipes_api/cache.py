@@ -0,0 +1,215 @@
+# recipes_api/cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+
+def cache_key(model, prompt, max_tokens, temperature, top_p, structured=False):
+    """
+    Content address of a generation request. The prompt is whitespace
+    normalised so re-indented or re-wrapped prompts share an entry.
+    Structured (post-processed) results are keyed separately from raw text.
+    """
+    normalized = {
+        "model": model.strip().lower(),
+        "prompt": " ".join(prompt.split()),
+        "max_tokens": int(max_tokens),
+        "temperature": round(float(temperature), 3),
+        "top_p": round(float(top_p), 3),
+    }
+    if structured:
+        normalized["structured"] = True
+    encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """
+    In-process LRU with per-entry expiry. Each worker process keeps its own copy.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def size(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Delegates to a configured Django cache (e.g. memcached/redis), which owns
+    eviction; shared by every worker pointed at it. Entries are stored under
+    a shared generation number, which clear() bumps instead of deleting keys
+    it can't enumerate (or flushing the rest of the cache).
+    """
+
+    prefix = "recipe-gen:"
+    generation_key = "recipe-gen-generation"
+
+    def __init__(self, ttl, alias):
+        self.ttl = ttl
+        self.cache = caches[alias]
+        self.evictions = 0
+
+    def _generation(self):
+        # Starts from the clock, so a counter lost to eviction never brings
+        # back entries from an earlier generation
+        return self.cache.get_or_set(self.generation_key, time.time_ns, None)
+
+    def get(self, key):
+        return self.cache.get(self.prefix + key, version=self._generation())
+
+    def set(self, key, value):
+        self.cache.set(self.prefix + key, value, self.ttl, version=self._generation())
+
+    def size(self):
+        return None
+
+    def clear(self):
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            self.cache.set(self.generation_key, time.time_ns(), None)
+
+
+class DatabaseBackend:
+    """
+    Stores entries in recipes_api.CachedCompletion. Expired rows are purged
+    and least recently used rows trimmed whenever a new entry is written.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+
+    def get(self, key):
+        from .models import CachedCompletion
+
+        now = timezone.now()
+        entry = CachedCompletion.objects.filter(key=key, expires_at__gt=now).values_list("value", flat=True).first()
+        if entry is not None:
+            CachedCompletion.objects.filter(key=key).update(last_used_at=now)
+        return entry
+
+    def set(self, key, value):
+        from .models import CachedCompletion
+
+        now = timezone.now()
+        CachedCompletion.objects.update_or_create(
+            key=key,
+            defaults={"value": value, "last_used_at": now, "expires_at": now + timedelta(seconds=self.ttl)},
+        )
+        evicted, _ = CachedCompletion.objects.filter(expires_at__lte=now).delete()
+        overflow = CachedCompletion.objects.count() - self.max_entries
+        if overflow > 0:
+            stale = CachedCompletion.objects.order_by("last_used_at").values_list("key", flat=True)[:overflow]
+            deleted, _ = CachedCompletion.objects.filter(key__in=list(stale)).delete()
+            evicted += deleted
+        self.evictions += evicted
+
+    def size(self):
+        from .models import CachedCompletion
+
+        return CachedCompletion.objects.count()
+
+    def clear(self):
+        from .models import CachedCompletion
+
+        CachedCompletion.objects.all().delete()
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "bypasses": 0, "sets": 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def get(self, key, bypass=False):
+        if bypass:
+            self._count("bypasses")
+            return None
+        value = self.backend.get(key)
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+        self._count("sets")
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "evictions": self.backend.evictions,
+            "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else None,
+            **counters,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def build_backend(name):
+    if name == "memory":
+        return MemoryBackend(settings.RECIPE_CACHE_TTL, settings.RECIPE_CACHE_MAX_ENTRIES)
+    if name == "django":
+        return DjangoCacheBackend(settings.RECIPE_CACHE_TTL, settings.RECIPE_CACHE_ALIAS)
+    if name == "db":
+        return DatabaseBackend(settings.RECIPE_CACHE_TTL, settings.RECIPE_CACHE_MAX_ENTRIES)
+    raise ValueError(f"Unknown RECIPE_CACHE_BACKEND: {name}")
+
+
+def get_cache():
+    """
+    Process-wide ResponseCache using the RECIPE_CACHE_BACKEND setting.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(build_backend(settings.RECIPE_CACHE_BACKEND))
+    return _cache
@@ -0,0 +1,207 @@
+# recipes_api/fakegroq.py
+"""
+Offline stand-in for the Groq OpenAI-compatible chat-completions API, for
+benchmarks and local development. Run it with `manage.py fake_groq` and
+point GROQ_API_URL at it.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_RECIPES = [
+    {
+        "title": "Garlic Butter Chicken",
+        "description": "Pan-seared chicken finished in garlic butter.",
+        "ingredients": [
+            {"name": "chicken breast", "quantity": "2 pc"},
+            {"name": "butter", "quantity": "2 tbsp"},
+            {"name": "garlic", "quantity": "3 cloves"}
+        ],
+        "steps": ["Season the chicken.", "Sear for 6 minutes a side.", "Baste with garlic butter and rest."]
+    },
+    {
+        "title": "Tomato Basil Pasta",
+        "description": "A quick weeknight pasta with fresh tomatoes.",
+        "ingredients": [
+            {"name": "pasta", "quantity": "200 g"},
+            {"name": "tomato", "quantity": "3 pc"},
+            {"name": "basil", "quantity": "1 bunch"}
+        ],
+        "steps": ["Boil the pasta.", "Simmer chopped tomatoes.", "Toss together with torn basil."]
+    },
+    {
+        "title": "Vegetable Fried Rice",
+        "description": "Leftover rice fried with whatever vegetables are on hand.",
+        "ingredients": [
+            {"name": "rice", "quantity": "2 cup"},
+            {"name": "egg", "quantity": "2 pc"},
+            {"name": "carrot", "quantity": "1 pc"}
+        ],
+        "steps": ["Scramble the eggs.", "Fry the rice and carrot.", "Fold the eggs back in."]
+    },
+]
+
+
+class FakeGroqConfig:
+    def __init__(self, latency_ms=800.0, jitter_ms=200.0, distribution="normal", error_rate=0.0,
+                 error_status=503, malformed_rate=0.0, token_delay_ms=20.0, chunk_chars=16, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.malformed_rate = malformed_rate
+        self.token_delay_ms = token_delay_ms
+        self.chunk_chars = chunk_chars
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample_latency(self):
+        with self.lock:
+            if self.distribution == "fixed":
+                ms = self.latency_ms
+            elif self.distribution == "uniform":
+                ms = self.random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+            elif self.distribution == "lognormal":
+                # Long right tail, median at latency_ms
+                sigma = self.jitter_ms / self.latency_ms if self.latency_ms else 0
+                ms = self.latency_ms * self.random.lognormvariate(0, sigma)
+            else:
+                ms = self.random.gauss(self.latency_ms, self.jitter_ms)
+        return max(0.0, ms) / 1000
+
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+
+def canned_content(malformed=False):
+    text = json.dumps(CANNED_RECIPES, indent=2)
+    if malformed:
+        # What the repair stage has to cope with: fences and a trailing comma
+        text = "```json\n" + text[:-1].rstrip() + ",\n]\n```"
+    return text
+
+
+def make_handler(config, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _chunk(self, data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"message": "Invalid JSON"}})
+                return
+
+            stats.record("requests")
+            time.sleep(config.sample_latency())
+            if config.roll(config.error_rate):
+                stats.record("errors")
+                self._send_json(config.error_status, {"error": {"message": "Injected failure"}},
+                                headers={"Retry-After": "1"})
+                return
+
+            content = canned_content(malformed=config.roll(config.malformed_rate))
+            prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+            usage = {
+                "prompt_tokens": len(prompt) // 4 + 1,
+                "completion_tokens": len(content) // 4 + 1,
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            model = payload.get("model", "fake-model")
+
+            if not payload.get("stream"):
+                self._send_json(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(content), config.chunk_chars):
+                delta = {"choices": [{"index": 0, "delta": {"content": content[i:i + config.chunk_chars]}}]}
+                self._chunk(f"data: {json.dumps(delta)}\n\n".encode("utf-8"))
+                time.sleep(config.token_delay_ms / 1000)
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                final = {"choices": [], "usage": usage}
+                self._chunk(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+            self._chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+class FakeGroqStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0}
+
+    def record(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+class FakeGroqServer:
+    """
+    Threaded HTTP server; start() runs it in a background thread, which is
+    how the load-test harness embeds it.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        self.config = config or FakeGroqConfig()
+        self.stats = FakeGroqStats()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.config, self.stats))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/openai/v1/chat/completions"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
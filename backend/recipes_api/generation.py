@@ -0,0 +1,57 @@
+# recipes_api/generation.py
+import json
+
+from rest_framework.exceptions import Throttled
+
+from . import metrics
+from .cache import cache_key, get_cache
+from .postprocess import generate_structured
+from .singleflight import get_singleflight
+from .upstream import build_payload, get_client
+
+
+def run_generation(validated, structured=False, charge=None):
+    """
+    Run a validated generation request through the response cache, request
+    coalescing and the upstream client. Returns (result, x_cache) where
+    result holds the reply "text" and, when structured, the validated
+    "recipes". `charge` is called right before this request goes upstream
+    itself (not on cache hits or coalesced calls); the views use it for the
+    daily token budget.
+    """
+    key = cache_key(validated["model"], validated["prompt"], validated["max_tokens"],
+                    validated["temperature"], validated["top_p"], structured=structured)
+    response_cache = get_cache()
+    cached = response_cache.get(key, bypass=validated["bypass_cache"])
+    if cached is not None:
+        metrics.note(cache="HIT")
+        return cached, "HIT"
+
+    def ask(prompt):
+        data = get_client().complete(build_payload({**validated, "prompt": prompt}))
+        return data["choices"][0]["message"]["content"]
+
+    def fetch():
+        if charge is not None:
+            charge()
+        text = ask(validated["prompt"])
+        if structured:
+            recipes = generate_structured(validated["prompt"], text, ask)
+            result = {"text": json.dumps(recipes), "recipes": recipes}
+        else:
+            result = {"text": text}
+        response_cache.set(key, result)
+        return result
+
+    # Identical requests already in flight (double clicks, client retries)
+    # wait for that call instead of going upstream again.
+    lookup = None if validated["bypass_cache"] else (lambda: response_cache.backend.get(key))
+    # A leader over its own budget says nothing about its followers', who
+    # then go upstream (and are charged) themselves.
+    result, shared = get_singleflight().do(key, fetch, lookup=lookup, retry_on=(Throttled,))
+    if shared:
+        x_cache = "COALESCED"
+    else:
+        x_cache = "BYPASS" if validated["bypass_cache"] else "MISS"
+    metrics.note(cache=x_cache)
+    return result, x_cache
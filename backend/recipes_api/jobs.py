@@ -0,0 +1,106 @@
+# recipes_api/jobs.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Recipe
+from core.signals import recipes_bulk_changed
+from . import metrics
+from .generation import run_generation
+from .models import GenerationBatch, GenerationJob
+from .prompts import build_prompt
+
+
+def submit_batch(user, jobs):
+    """
+    Create a batch with one queued job per validated option set.
+    """
+    with transaction.atomic():
+        batch = GenerationBatch.objects.create(user=user, total=len(jobs))
+        GenerationJob.objects.bulk_create([
+            GenerationJob(batch=batch, position=i, params=params)
+            for i, params in enumerate(jobs)
+        ])
+    return batch
+
+
+def requeue_stale_jobs():
+    """
+    Put jobs whose worker died mid-run back in the queue.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.RECIPE_JOB_LEASE)
+    return GenerationJob.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None
+    )
+
+
+def claim_jobs(worker_id, limit):
+    """
+    Atomically take up to `limit` queued jobs. Each claim is a conditional
+    UPDATE, so concurrent workers never run the same job and no
+    database-specific row locking is needed.
+    """
+    claimed = []
+    candidates = (
+        GenerationJob.objects.filter(status='queued')
+        .order_by('created_at', 'position')
+        .values_list('pk', flat=True)[:limit * 2]
+    )
+    for pk in candidates:
+        now = timezone.now()
+        won = GenerationJob.objects.filter(pk=pk, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1
+        )
+        if won:
+            claimed.append(pk)
+            GenerationBatch.objects.filter(jobs__pk=pk, status='queued').update(status='running')
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def _finish(job, **fields):
+    GenerationJob.objects.filter(pk=job.pk).update(locked_by='', locked_at=None, **fields)
+    counter = 'completed' if fields['status'] == 'done' else 'failed'
+    GenerationBatch.objects.filter(pk=job.batch_id).update(**{counter: F(counter) + 1})
+    GenerationBatch.objects.filter(
+        pk=job.batch_id, completed__gte=F('total') - F('failed'), finished_at__isnull=True
+    ).update(status='done', finished_at=timezone.now())
+
+
+def run_job(pk):
+    """
+    Generate and save the recipes for one claimed job. Safe to call from a
+    worker thread.
+    """
+    try:
+        job = GenerationJob.objects.select_related('batch__user').get(pk=pk)
+        user = job.batch.user
+        prompt = build_prompt(user, job.params)
+        if prompt is None:
+            _finish(job, status='failed', error="No non-expired ingredients in the fridge")
+            return
+        try:
+            with metrics.track("batch", user, job.params["model"]):
+                result, _ = run_generation({**job.params, "prompt": prompt}, structured=True)
+        except Exception as e:
+            if job.attempts < settings.RECIPE_JOB_MAX_ATTEMPTS:
+                GenerationJob.objects.filter(pk=pk).update(
+                    status='queued', locked_by='', locked_at=None, error=str(e)
+                )
+            else:
+                _finish(job, status='failed', error=str(e))
+            return
+
+        with transaction.atomic():
+            saved = Recipe.objects.bulk_create([
+                Recipe(user=user, title=r["title"], ingredients=r["ingredients"], steps=r["steps"])
+                for r in result["recipes"]
+            ])
+            _finish(job, status='done', error='', recipe_ids=[recipe.pk for recipe in saved])
+        recipes_bulk_changed.send(sender=Recipe, user_id=user.id, recipes=saved)
+    finally:
+        close_old_connections()
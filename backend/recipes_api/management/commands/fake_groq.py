@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from recipes_api.fakegroq import FakeGroqConfig, FakeGroqServer
+
+
+class Command(BaseCommand):
+    help = "Serve an offline, OpenAI-compatible stand-in for the Groq API"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=800.0, help="Mean (or median) response latency")
+        parser.add_argument('--jitter-ms', type=float, default=200.0, help="Spread of the latency distribution")
+        parser.add_argument(
+            '--distribution', choices=['fixed', 'normal', 'uniform', 'lognormal'], default='normal',
+        )
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail")
+        parser.add_argument('--error-status', type=int, default=503)
+        parser.add_argument(
+            '--malformed-rate', type=float, default=0.0,
+            help="Fraction of replies wrapped in markdown fences with a trailing comma",
+        )
+        parser.add_argument('--token-delay-ms', type=float, default=20.0, help="Delay between streamed chunks")
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        config = FakeGroqConfig(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            distribution=options['distribution'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            malformed_rate=options['malformed_rate'],
+            token_delay_ms=options['token_delay_ms'],
+            seed=options['seed'],
+        )
+        server = FakeGroqServer(options['host'], options['port'], config)
+        self.stdout.write(f"Fake Groq API listening; set GROQ_API_URL={server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.stdout.write(f"Served {server.stats.snapshot()}")
@@ -0,0 +1,59 @@
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes_api.jobs import claim_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued batch recipe generation jobs with bounded parallelism"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.RECIPE_WORKER_CONCURRENCY,
+            help="Maximum number of jobs generating at once",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help="Seconds to sleep when the queue is empty",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once the queue is drained instead of polling forever",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Generation worker {worker_id} started (concurrency={concurrency})")
+
+        running = set()
+        processed = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+                free = concurrency - len(running)
+                if free > 0:
+                    for pk in claim_jobs(worker_id, free):
+                        running.add(pool.submit(run_job, pk))
+
+                if running:
+                    done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        processed += 1
+                        if future.exception():
+                            self.stderr.write(f"Job crashed: {future.exception()}")
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)"))
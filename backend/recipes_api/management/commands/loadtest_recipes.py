@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import Client, override_settings
+
+from recipes_api.fakegroq import FakeGroqConfig, FakeGroqServer
+from recipes_api.upstream import get_client, reset_client
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class WorkerPool:
+    """
+    Stand-in for a fixed set of sync gunicorn workers: requests queue for a
+    free worker, and a sampler records how often every worker is busy.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.busy = 0
+        self.lock = threading.Lock()
+        self.samples = []
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self.stopped.wait(0.01):
+            self.samples.append(self.busy)
+
+    def _run(self, fn, submitted):
+        started = time.perf_counter()
+        with self.lock:
+            self.busy += 1
+        try:
+            return fn(), started - submitted
+        finally:
+            with self.lock:
+                self.busy -= 1
+            close_old_connections()
+
+    def call(self, fn):
+        return self.executor.submit(self._run, fn, time.perf_counter()).result()
+
+    def start(self):
+        self.sampler.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.executor.shutdown()
+
+    def saturation(self):
+        if not self.samples:
+            return {}
+        return {
+            "workers": self.workers,
+            "mean_utilisation": round(sum(self.samples) / (len(self.samples) * self.workers), 3),
+            "all_busy_fraction": round(sum(1 for s in self.samples if s >= self.workers) / len(self.samples), 3),
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the recipe generation endpoint at a fixed concurrency and report throughput, "
+        "latency percentiles and worker saturation. Runs fully offline against the fake Groq "
+        "server unless --url is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Total requests to send")
+        parser.add_argument('--concurrency', type=int, default=20, help="Concurrent clients")
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help="Simulated sync workers serving the endpoint (in-process mode only)",
+        )
+        parser.add_argument('--url', help="Load a running server at this URL instead of running in-process")
+        parser.add_argument('--path', default='/api/recipes/', help="Endpoint path in in-process mode")
+        parser.add_argument('--max-tokens', type=int, default=600)
+        parser.add_argument('--structured', action='store_true', help="Request validated recipe JSON")
+        parser.add_argument(
+            '--cache', action='store_true',
+            help="Send one repeated prompt so the response cache can serve hits (default: unique prompts)",
+        )
+        parser.add_argument('--latency-ms', type=float, default=800.0)
+        parser.add_argument('--jitter-ms', type=float, default=200.0)
+        parser.add_argument(
+            '--distribution', choices=['fixed', 'normal', 'uniform', 'lognormal'], default='normal',
+        )
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--malformed-rate', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def payload(self, i, options):
+        return {
+            "prompt": "loadtest" if options['cache'] else f"loadtest request {i}",
+            "max_tokens": options['max_tokens'],
+            "structured": options['structured'],
+        }
+
+    def handle(self, *args, **options):
+        if options['url']:
+            report = self.run_http(options)
+        else:
+            report = self.run_in_process(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for key, value in report.items():
+            self.stdout.write(f"{key:>22}: {value}")
+
+    def run_http(self, options):
+        local = threading.local()
+
+        def send(i):
+            session = getattr(local, "session", None)
+            if session is None:
+                session = local.session = requests.Session()
+            response = session.post(options['url'], json=self.payload(i, options), timeout=120)
+            return response.status_code, 0.0
+
+        return self.drive(send, options)
+
+    def run_in_process(self, options):
+        config = FakeGroqConfig(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            distribution=options['distribution'],
+            error_rate=options['error_rate'],
+            malformed_rate=options['malformed_rate'],
+            seed=options['seed'],
+        )
+        server = FakeGroqServer(config=config).start()
+        pool = WorkerPool(options['workers'])
+        overrides = {
+            "GROQ_API_URL": server.url,
+            "ALLOWED_HOSTS": ["*"],
+            # The harness measures the proxy path, not the per-user limits
+            "RATE_LIMITS": {scope: {"capacity": 10 ** 9, "refill_per_second": 10 ** 9} for scope in ("llm", "auth")},
+            "LLM_DAILY_TOKEN_BUDGET": 10 ** 12,
+            "LLM_MAX_CONCURRENT_PER_USER": 10 ** 6,
+        }
+        local = threading.local()
+
+        def send(i):
+            def call():
+                client = getattr(local, "client", None)
+                if client is None:
+                    client = local.client = Client()
+                return client.post(options['path'], self.payload(i, options), content_type="application/json")
+            response, queued = pool.call(call)
+            return response.status_code, queued
+
+        with override_settings(**overrides):
+            reset_client()
+            pool.start()
+            try:
+                report = self.drive(send, options)
+            finally:
+                pool.stop()
+                upstream = get_client().stats()
+                reset_client()
+                server.stop()
+
+        report["saturation"] = pool.saturation()
+        report["upstream_calls"] = server.stats.snapshot()
+        report["upstream_client"] = upstream["counters"]
+        return report
+
+    def drive(self, send, options):
+        latencies = []
+        queue_waits = []
+        statuses = {}
+        lock = threading.Lock()
+        counter = iter(range(options['requests']))
+
+        def client_loop():
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    code, queued = send(i)
+                except requests.RequestException:
+                    code, queued = "error", 0.0
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    queue_waits.append(queued)
+                    statuses[str(code)] = statuses.get(str(code), 0) + 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client_loop) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        latencies.sort()
+        ms = lambda seconds: round(seconds * 1000, 1) if seconds is not None else None
+        return {
+            "requests": len(latencies),
+            "concurrency": options['concurrency'],
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p95_ms": ms(percentile(latencies, 95)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "max_ms": ms(latencies[-1] if latencies else None),
+            "mean_queue_wait_ms": ms(sum(queue_waits) / len(queue_waits)) if queue_waits else None,
+            "status_codes": statuses,
+        }
@@ -0,0 +1,268 @@
+# recipes_api/metrics.py
+"""
+Per-request accounting for LLM generations: upstream latency, limiter
+queue wait, prompt/completion tokens, cache result and outcome.
+
+Recording on the request path only appends to an in-memory buffer and bumps
+a few in-process counters; a background thread writes the buffer to
+recipes_api.UpstreamCall in batches.
+"""
+import atexit
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Avg, Count, Sum
+from django.db.models.functions import TruncHour
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+_current = contextvars.ContextVar("upstream_call_record", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.n += 1
+
+
+class Recorder:
+    def __init__(self, flush_interval=2.0, batch_size=500, max_buffer=10000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.buffer = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        # Prometheus series, keyed by label tuples
+        self.requests = {}
+        self.tokens = {}
+        self.latency = {}
+        self.queue_wait = {}
+
+    def record(self, row):
+        with self.lock:
+            key = (row["endpoint"], row["model"], row["cache"], row["outcome"])
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for kind in ("prompt", "completion"):
+                if row[f"{kind}_tokens"]:
+                    tkey = (row["model"], kind)
+                    self.tokens[tkey] = self.tokens.get(tkey, 0) + row[f"{kind}_tokens"]
+            if row["upstream_calls"]:
+                self.latency.setdefault(row["model"], Histogram(LATENCY_BUCKETS)).observe(row["upstream_ms"] / 1000)
+                self.queue_wait.setdefault(row["model"], Histogram(LATENCY_BUCKETS)).observe(row["queue_ms"] / 1000)
+
+            if len(self.buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.batch_size
+        self._ensure_thread()
+        if full:
+            self.wakeup.set()
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self._run, name="upstream-metrics", daemon=True)
+                    self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write upstream call metrics")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        from .models import UpstreamCall
+
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+        if rows:
+            try:
+                UpstreamCall.objects.bulk_create([UpstreamCall(**row) for row in rows], batch_size=self.batch_size)
+            except Exception:
+                with self.lock:
+                    self.dropped += len(rows)
+                raise
+        return len(rows)
+
+
+recorder = Recorder()
+atexit.register(lambda: recorder.buffer and recorder.flush())
+
+
+def _new_row(endpoint, user, model):
+    return {
+        "endpoint": endpoint,
+        "user_id": user.pk if user is not None and user.is_authenticated else None,
+        "model": model,
+        "cache": "",
+        "outcome": "ok",
+        "upstream_calls": 0,
+        "upstream_ms": 0.0,
+        "queue_ms": 0.0,
+        "total_ms": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+    }
+
+
+@contextmanager
+def track(endpoint, user, model):
+    """
+    Account everything that happens inside the block to one generation
+    request. Exceptions set the outcome to the exception's class name.
+    """
+    if not settings.UPSTREAM_METRICS_ENABLED:
+        yield None
+        return
+    row = _new_row(endpoint, user, model)
+    token = _current.set(row)
+    started = time.perf_counter()
+    try:
+        yield row
+    except Exception as e:
+        row["outcome"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        row["total_ms"] = (time.perf_counter() - started) * 1000
+        recorder.record(row)
+
+
+def note(**fields):
+    row = _current.get()
+    if row is not None:
+        row.update(fields)
+
+
+def note_upstream(latency, queue_wait, usage=None):
+    """
+    Called by the upstream client after each call (successful or not).
+    """
+    row = _current.get()
+    if row is None:
+        return
+    row["upstream_calls"] += 1
+    row["upstream_ms"] += latency * 1000
+    row["queue_ms"] += queue_wait * 1000
+    if usage:
+        row["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        row["completion_tokens"] += usage.get("completion_tokens") or 0
+
+
+def record_stream(user, model, latency, outcome, usage=None):
+    """
+    Account a streamed generation, which runs outside track().
+    """
+    if not settings.UPSTREAM_METRICS_ENABLED:
+        return
+    row = _new_row("stream", user, model)
+    row.update(
+        cache="MISS", outcome=outcome, upstream_calls=1, upstream_ms=latency * 1000, total_ms=latency * 1000,
+        prompt_tokens=(usage or {}).get("prompt_tokens") or 0,
+        completion_tokens=(usage or {}).get("completion_tokens") or 0,
+    )
+    recorder.record(row)
+
+
+GROUPS = {
+    "user": ("user__username",),
+    "model": ("model",),
+    "hour": ("hour",),
+}
+
+
+def rollup(group, since):
+    """
+    Aggregate recorded requests since `since` by user, model or hour.
+    """
+    from .models import UpstreamCall
+
+    queryset = UpstreamCall.objects.filter(created_at__gte=since)
+    if group == "hour":
+        queryset = queryset.annotate(hour=TruncHour("created_at"))
+    return list(
+        queryset.values(*GROUPS[group])
+        .annotate(
+            requests=Count("id"),
+            upstream_calls=Sum("upstream_calls"),
+            prompt_tokens=Sum("prompt_tokens"),
+            completion_tokens=Sum("completion_tokens"),
+            avg_upstream_ms=Avg("upstream_ms"),
+            avg_queue_ms=Avg("queue_ms"),
+        )
+        .order_by(*GROUPS[group])
+    )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(name, series):
+    lines = [f"# TYPE {name} histogram"]
+    for model, hist in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(model=model, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(model=model, le='+Inf')} {hist.n}")
+        lines.append(f"{name}_sum{_labels(model=model)} {hist.total:.6f}")
+        lines.append(f"{name}_count{_labels(model=model)} {hist.n}")
+    return lines
+
+
+def prometheus_text():
+    """
+    This process's counters in the Prometheus text exposition format.
+    """
+    with recorder.lock:
+        requests = dict(recorder.requests)
+        tokens = dict(recorder.tokens)
+        latency = dict(recorder.latency)
+        queue_wait = dict(recorder.queue_wait)
+        buffered = len(recorder.buffer)
+        dropped = recorder.dropped
+
+    lines = ["# TYPE yeschef_generation_requests_total counter"]
+    for (endpoint, model, cache, outcome), count in sorted(requests.items()):
+        labels = _labels(endpoint=endpoint, model=model, cache=cache, outcome=outcome)
+        lines.append(f"yeschef_generation_requests_total{labels} {count}")
+    lines.append("# TYPE yeschef_upstream_tokens_total counter")
+    for (model, kind), count in sorted(tokens.items()):
+        lines.append(f"yeschef_upstream_tokens_total{_labels(model=model, kind=kind)} {count}")
+    lines += _histogram_lines("yeschef_upstream_latency_seconds", latency)
+    lines += _histogram_lines("yeschef_upstream_queue_wait_seconds", queue_wait)
+    lines.append("# TYPE yeschef_metrics_buffered_rows gauge")
+    lines.append(f"yeschef_metrics_buffered_rows {buffered}")
+    lines.append("# TYPE yeschef_metrics_dropped_rows_total counter")
+    lines.append(f"yeschef_metrics_dropped_rows_total {dropped}")
+    return "\n".join(lines) + "\n"
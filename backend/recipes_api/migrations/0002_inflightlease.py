@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InFlightLease',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes_api', '0003_generation_batches'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpstreamCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=30)),
+                ('model', models.CharField(max_length=100)),
+                ('cache', models.CharField(blank=True, default='', max_length=20)),
+                ('outcome', models.CharField(default='ok', max_length=50)),
+                ('upstream_calls', models.PositiveSmallIntegerField(default=0)),
+                ('upstream_ms', models.FloatField(default=0)),
+                ('queue_ms', models.FloatField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upstream_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='recipes_api_user_id_d320ca_idx'), models.Index(fields=['model', 'created_at'], name='recipes_api_model_4836d5_idx')],
+            },
+        ),
+    ]
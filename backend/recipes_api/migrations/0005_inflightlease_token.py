@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes_api', '0004_upstreamcall'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inflightlease',
+            name='token',
+            field=models.CharField(default='', max_length=32),
+        ),
+    ]
@@ -1,3 +1,117 @@
+from django.contrib.auth.models import User
 from django.db import models
 
 # Create your models here.
+
+class CachedCompletion(models.Model):
+    """
+    Database backend for the generated-recipe response cache
+    (see recipes_api/cache.py).
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    value = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class InFlightLease(models.Model):
+    """
+    Lease row held by the worker currently generating a given request
+    (see recipes_api/singleflight.py).
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    token = models.CharField(max_length=32, default='')
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.key
+
+
+
+class GenerationBatch(models.Model):
+    """
+    A group of generation jobs submitted together (e.g. a week of meals)
+    and run by the generation_worker management command.
+    """
+    STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generation_batches')
+    status = models.CharField(max_length=20, choices=STATUS, default='queued')
+    total = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Batch {self.pk} ({self.completed + self.failed}/{self.total})"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class GenerationJob(models.Model):
+    STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    batch = models.ForeignKey(GenerationBatch, on_delete=models.CASCADE, related_name='jobs')
+    position = models.PositiveIntegerField(default=0)
+    params = models.JSONField(help_text="Validated RecipeGenerateSerializer data")
+    status = models.CharField(max_length=20, choices=STATUS, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    recipe_ids = models.JSONField(default=list)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Job {self.pk} of batch {self.batch_id} ({self.status})"
+
+    class Meta:
+        ordering = ['batch', 'position']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class UpstreamCall(models.Model):
+    """
+    One generation request as seen by recipes_api/metrics.py: time spent
+    upstream and queued behind the concurrency limiter, tokens used, cache
+    result and outcome.
+    """
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='upstream_calls')
+    endpoint = models.CharField(max_length=30)
+    model = models.CharField(max_length=100)
+    cache = models.CharField(max_length=20, blank=True, default='')
+    outcome = models.CharField(max_length=50, default='ok')
+    upstream_calls = models.PositiveSmallIntegerField(default=0)
+    upstream_ms = models.FloatField(default=0)
+    queue_ms = models.FloatField(default=0)
+    total_ms = models.FloatField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.endpoint} {self.model} ({self.outcome})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['model', 'created_at']),
+        ]
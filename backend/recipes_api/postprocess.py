@@ -0,0 +1,223 @@
+# recipes_api/postprocess.py
+import json
+import re
+import threading
+
+from .serializers import GeneratedRecipeSerializer
+
+RECIPES_PER_GENERATION = 3
+
+FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.S)
+
+REASK_TEMPLATE = """{prompt}
+
+You already suggested: {titles}.
+Now produce exactly {count} more distinct recipe object(s), different from those,
+as a JSON array of {count} item(s) in exactly the same format. JSON only.""".strip()
+
+
+class RecipeParseError(ValueError):
+    pass
+
+
+def strip_fences(text):
+    match = FENCE_RE.search(text)
+    if match:
+        return match.group(1)
+    # An unterminated fence (reply cut off by max_tokens)
+    return re.sub(r"```(?:json|JSON)?", "", text)
+
+
+def remove_trailing_commas(text):
+    """
+    Drop commas that directly precede a closing bracket, ignoring string
+    contents.
+    """
+    out = []
+    in_string = escaped = False
+    length = len(text)
+    for i, ch in enumerate(text):
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == ",":
+            j = i + 1
+            while j < length and text[j].isspace():
+                j += 1
+            if j < length and text[j] in "]}":
+                continue
+        out.append(ch)
+    return "".join(out)
+
+
+def truncate_partial(text):
+    """
+    Cut a truncated top-level array back to its last complete element and
+    close it, e.g. '[{...}, {...}, {"title": "Pa' -> '[{...}, {...}]'.
+    """
+    stack = []
+    in_string = escaped = False
+    last_complete = None
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "[{":
+            stack.append(ch)
+        elif ch in "]}":
+            if not stack:
+                break
+            stack.pop()
+            if len(stack) == 1 and stack[0] == "[":
+                last_complete = i
+            elif not stack:
+                return text[:i + 1]
+    if last_complete is None:
+        raise RecipeParseError("No complete recipe object in model output")
+    return text[:last_complete + 1] + "]"
+
+
+def extract_json(text):
+    """
+    Pull the JSON payload out of a model reply. Returns (value, repaired)
+    where `repaired` says whether anything beyond whitespace had to change.
+    """
+    body = strip_fences(text).strip()
+    starts = [i for i in (body.find("["), body.find("{")) if i != -1]
+    if not starts:
+        raise RecipeParseError("No JSON found in model output")
+    body = body[min(starts):]
+
+    try:
+        return json.loads(body), body != text.strip()
+    except ValueError:
+        pass
+
+    decoder = json.JSONDecoder()
+    cleaned = remove_trailing_commas(body)
+    try:
+        # raw_decode tolerates commentary after the closing bracket
+        return decoder.raw_decode(cleaned)[0], True
+    except ValueError:
+        pass
+    try:
+        return json.loads(truncate_partial(cleaned)), True
+    except ValueError as e:
+        raise RecipeParseError(f"Could not repair model output: {e}") from e
+
+
+def as_recipe_list(value):
+    if isinstance(value, dict):
+        if isinstance(value.get("recipes"), list):
+            return value["recipes"]
+        return [value]
+    if isinstance(value, list):
+        return value
+    return []
+
+
+def validate_recipes(items):
+    """
+    Split raw items into (valid, invalid_count); valid recipes are cleaned
+    dicts ready for core.models.Recipe.
+    """
+    valid = []
+    invalid = 0
+    for item in items:
+        serializer = GeneratedRecipeSerializer(data=item)
+        if serializer.is_valid():
+            valid.append(serializer.validated_data)
+        else:
+            invalid += 1
+    return [dict(recipe, ingredients=[dict(i) for i in recipe["ingredients"]]) for recipe in valid], invalid
+
+
+class PostProcessStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            "generations": 0,
+            "successes": 0,
+            "upstream_calls": 0,
+            "repaired": 0,
+            "reasks": 0,
+            "invalid_items": 0,
+        }
+
+    def add(self, **deltas):
+        with self.lock:
+            for key, delta in deltas.items():
+                self.counters[key] += delta
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+        successes = counters["successes"]
+        counters["upstream_calls_per_success"] = (
+            round(counters["upstream_calls"] / successes, 3) if successes else None
+        )
+        return counters
+
+
+stats = PostProcessStats()
+
+
+def parse_recipes(text):
+    """
+    (recipes, invalid_count, repaired) for one model reply; unparseable
+    output counts as zero recipes.
+    """
+    try:
+        value, repaired = extract_json(text)
+    except RecipeParseError:
+        return [], 0, False
+    recipes, invalid = validate_recipes(as_recipe_list(value))
+    return recipes, invalid, repaired
+
+
+def generate_structured(prompt, first_reply, ask, count=RECIPES_PER_GENERATION, max_reasks=1):
+    """
+    Turn the first model reply into `count` validated recipes, re-asking
+    `ask(prompt)` only for the missing ones when some are unusable.
+    """
+    recipes, invalid, repaired = parse_recipes(first_reply)
+    upstream_calls = 1
+    reasks = 0
+    while len(recipes) < count and reasks < max_reasks:
+        reasks += 1
+        missing = count - len(recipes)
+        titles = ", ".join(f'"{r["title"]}"' for r in recipes) or "nothing yet"
+        reply = ask(REASK_TEMPLATE.format(prompt=prompt, titles=titles, count=missing))
+        upstream_calls += 1
+        more, more_invalid, more_repaired = parse_recipes(reply)
+        recipes.extend(more[:missing])
+        invalid += more_invalid
+        repaired = repaired or more_repaired
+
+    recipes = recipes[:count]
+    stats.add(
+        generations=1,
+        successes=1 if recipes else 0,
+        upstream_calls=upstream_calls,
+        repaired=1 if repaired else 0,
+        reasks=reasks,
+        invalid_items=invalid,
+    )
+    if not recipes:
+        raise RecipeParseError("The model did not return any usable recipes")
+    return recipes
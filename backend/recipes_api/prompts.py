@@ -0,0 +1,134 @@
+# recipes_api/prompts.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.models import Account, Ingredient
+from core.versions import INGREDIENTS, current
+
+PROMPT_TEMPLATE = """
+You are an AI chef. Given:
+  • Available Ingredients: {ingredients}
+  • Recipe Type: {type}
+  • Cuisine: {cuisine}
+  • Time: {time}
+  • Nutritional Style: {style}
+  • Dietary Restrictions: {diets}
+  • Allergies: {allergies}
+  • Other Preferences: {notes}
+
+IMPORTANT RULES:
+1. ONLY use ingredients from the "Available Ingredients" list
+2. DO NOT make up or invent new ingredients
+3. If you need an ingredient not in the list, skip that recipe and create a different one
+4. Each ingredient name must be a real, valid food item
+5. STRICTLY AVOID any ingredients that the user is allergic to
+6. Ensure recipes comply with all dietary restrictions specified
+7. Prefer ingredients marked "(use soon)"; they expire within {soon_days} days
+
+Produce exactly three distinct recipe objects.
+**Output must be valid JSON ONLY**—an array of three items.
+Each item must have exactly these keys:
+  • "title"  : string
+  • "description" : string (a brief one sentence summary)
+  • "ingredients": an array of objects, each with:
+    – "name": string (must be a real ingredient from the Available Ingredients)
+    – "quantity": string (amount in cups, grams, etc.; approximate is fine as long as it does not exceed what you have)
+  • "steps"  : an array of strings
+
+Do NOT include any extra words, numbering, markdown, or commentary.
+Return exactly:
+[
+  {{
+    "title": "Example Recipe",
+    "description": "A short appetizing summary of the dish.",
+    "ingredients": [
+      {{ "name": "Ingredient A", "quantity": "2 cups" }},
+      {{ "name": "Ingredient B", "quantity": "1 tbsp" }}
+    ],
+    "steps": [
+      "Do X",
+      "Do Y",
+      "Do Z"
+    ]
+  }}
+]
+""".strip()
+
+SOON_DAYS = 3
+
+
+def estimate_tokens(text):
+    # Llama-family tokenizers average roughly four characters per token
+    # on English ingredient lists; close enough for budgeting.
+    return len(text) // 4 + 1
+
+
+def fridge_cache_key(user_id, version, today, budget):
+    return f"fridge-prompt:{user_id}:{version}:{today.isoformat()}:{budget}"
+
+
+def render_fridge_section(user, budget=None):
+    """
+    Comma-separated list of the user's non-expired ingredients, soonest to
+    expire first, cut off once `budget` tokens are used. Cached under the
+    user's ingredients data version (core/versions.py) and the date, so an
+    ingredient write in any worker or the day rolling over moves it to a
+    fresh key.
+    """
+    budget = budget or settings.RECIPE_FRIDGE_TOKEN_BUDGET
+    today = timezone.localdate()
+    key = fridge_cache_key(user.id, *current(user.id, INGREDIENTS), today, budget)
+    text = cache.get(key)
+    if text is not None:
+        return text
+
+    soon = today + timedelta(days=SOON_DAYS)
+    rows = (
+        Ingredient.objects.filter(user=user, expiration_date__gte=today)
+        .order_by('expiration_date', 'id')
+        .values_list('name', 'quantity', 'unit', 'expiration_date')
+    )
+    items = []
+    used = 0
+    for name, quantity, unit, expiration_date in rows.iterator():
+        item = f"{name} {quantity:g} {unit}"
+        if expiration_date <= soon:
+            item += " (use soon)"
+        cost = estimate_tokens(item) + 1
+        if used + cost > budget:
+            break
+        items.append(item)
+        used += cost
+
+    text = ", ".join(items)
+    cache.set(key, text, 60 * 60 * 24)
+    return text
+
+
+def build_prompt(user, options):
+    """
+    Render the full generation prompt from form options and the user's
+    fridge and account. Returns None when the fridge has nothing usable.
+    """
+    ingredients = render_fridge_section(user)
+    if not ingredients:
+        return None
+
+    account = Account.objects.filter(user=user).values('dietary_preferences', 'allergies').first() or {}
+    diets = list(dict.fromkeys([*(account.get('dietary_preferences') or []), *options["diets"]]))
+    allergies = account.get('allergies') or []
+
+    return PROMPT_TEMPLATE.format(
+        ingredients=ingredients,
+        type=options["type"],
+        cuisine=options["cuisine"],
+        time=options["time"],
+        style=options["style"],
+        diets=", ".join(diets) or "none",
+        allergies=", ".join(allergies) or "none",
+        notes=options["notes"] or "none",
+        soon_days=SOON_DAYS,
+    )
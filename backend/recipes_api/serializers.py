@@ -1,9 +1,88 @@
 # recipes_api/serializers.py
+from django.conf import settings
 from rest_framework import serializers
+from .models import GenerationBatch, GenerationJob
 
 class RecipeRequestSerializer(serializers.Serializer):
-    model = serializers.CharField(default="meta-llama/llama-4-scout-17b-16e-instruct")
+    model = serializers.CharField(max_length=100, default="meta-llama/llama-4-scout-17b-16e-instruct")
     prompt = serializers.CharField()
-    max_tokens = serializers.IntegerField(default=500)
+    max_tokens = serializers.IntegerField(default=500, min_value=1, max_value=settings.LLM_MAX_TOKENS)
     temperature = serializers.FloatField(default=0.7)
     top_p = serializers.FloatField(default=0.9)
+    bypass_cache = serializers.BooleanField(default=False)
+    structured = serializers.BooleanField(default=False)
+
+
+class RecipeGenerateSerializer(serializers.Serializer):
+    type = serializers.CharField(max_length=50)
+    cuisine = serializers.CharField(max_length=50)
+    time = serializers.CharField(max_length=50)
+    style = serializers.CharField(max_length=50)
+    diets = serializers.ListField(child=serializers.CharField(max_length=50), default=list, max_length=20)
+    notes = serializers.CharField(max_length=500, allow_blank=True, default="")
+    model = serializers.CharField(max_length=100, default="meta-llama/llama-4-maverick-17b-128e-instruct")
+    max_tokens = serializers.IntegerField(default=600, min_value=1, max_value=settings.LLM_MAX_TOKENS)
+    temperature = serializers.FloatField(default=0.7)
+    top_p = serializers.FloatField(default=0.9)
+    bypass_cache = serializers.BooleanField(default=False)
+    save = serializers.BooleanField(default=False)
+
+
+class GeneratedIngredientSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    quantity = serializers.CharField(allow_blank=True, default="")
+
+
+class GeneratedRecipeSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(allow_blank=True, default="")
+    ingredients = GeneratedIngredientSerializer(many=True, allow_empty=False)
+    steps = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+
+
+class GenerationBatchRequestSerializer(serializers.Serializer):
+    """
+    Either an explicit list of `jobs`, or a meal-week plan: one job per
+    (day, meal) built from `template` with its type set to the meal.
+    """
+    jobs = RecipeGenerateSerializer(many=True, required=False)
+    days = serializers.IntegerField(min_value=1, max_value=7, required=False)
+    meals = serializers.ListField(
+        child=serializers.CharField(max_length=50), required=False, default=["Breakfast", "Lunch", "Dinner"]
+    )
+    template = RecipeGenerateSerializer(required=False)
+
+    def validate(self, data):
+        jobs = list(data.get('jobs') or [])
+        if data.get('days'):
+            if 'template' not in data:
+                raise serializers.ValidationError({'template': "Required when planning by days."})
+            template = data['template']
+            for day in range(1, data['days'] + 1):
+                # The day number keeps each day's prompt (and cache entry) distinct
+                notes = " ".join(filter(None, [template['notes'], f"Day {day} of {data['days']}."]))
+                for meal in data['meals']:
+                    jobs.append({**template, 'type': meal, 'notes': notes})
+        if not jobs:
+            raise serializers.ValidationError("Provide jobs or days with a template.")
+        if len(jobs) > settings.RECIPE_BATCH_MAX_JOBS:
+            raise serializers.ValidationError(f"A batch can hold at most {settings.RECIPE_BATCH_MAX_JOBS} jobs.")
+        return {'jobs': jobs}
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GenerationJob
+        fields = ('id', 'position', 'params', 'status', 'attempts', 'error', 'recipe_ids', 'updated_at')
+
+
+class GenerationBatchSerializer(serializers.ModelSerializer):
+    jobs = GenerationJobSerializer(many=True, read_only=True)
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GenerationBatch
+        fields = ('id', 'status', 'total', 'completed', 'failed', 'progress', 'created_at', 'finished_at', 'jobs')
+
+    def get_progress(self, obj):
+        return round((obj.completed + obj.failed) / obj.total, 3) if obj.total else 1.0
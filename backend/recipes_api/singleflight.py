@@ -0,0 +1,196 @@
+# recipes_api/singleflight.py
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished = False
+        self.followers = 0
+
+
+class FileLock:
+    """
+    Cross-process lock using flock() on one file per key. Only coordinates
+    workers on the same host (e.g. gunicorn workers sharing /tmp).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def hold(self, key, timeout):
+        import fcntl
+
+        path = os.path.join(self.directory, f"{key}.lock")
+        with open(path, "a") as handle:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        yield False
+                        return
+                    time.sleep(0.05)
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class DatabaseLock:
+    """
+    Cross-process lock using a lease row in recipes_api.InFlightLease.
+    Works across hosts; a lease left by a crashed worker expires after
+    `timeout` seconds. Each holder tags its lease with a token so it only
+    ever releases its own, not one taken over after it expired.
+    """
+
+    @contextmanager
+    def hold(self, key, timeout):
+        from .models import InFlightLease
+
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while True:
+            now = timezone.now()
+            InFlightLease.objects.filter(key=key, expires_at__lte=now).delete()
+            try:
+                with transaction.atomic():
+                    InFlightLease.objects.create(key=key, token=token, expires_at=now + timedelta(seconds=timeout))
+                break
+            except IntegrityError:
+                if time.monotonic() >= deadline:
+                    yield False
+                    return
+                time.sleep(0.05)
+        try:
+            yield True
+        finally:
+            InFlightLease.objects.filter(key=key, token=token).delete()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key so only one of them runs
+    `fn`. Threads in this process wait on the leader directly; with a
+    cross-process lock, leaders in other workers serialise on the key and
+    pick up the finished result through `lookup` (normally the shared
+    response cache) instead of calling upstream again.
+    """
+
+    def __init__(self, process_lock=None, timeout=90.0):
+        self.process_lock = process_lock
+        self.timeout = timeout
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.counters = {"leaders": 0, "followers": 0, "cross_process_hits": 0}
+
+    def do(self, key, fn, lookup=None, retry_on=()):
+        """
+        Return (result, shared); `shared` is True when the result came from
+        another request's upstream call. Followers of a leader that failed
+        with one of `retry_on` (errors about the leader itself rather than
+        the call), or that never finished (cancelled, interrupted), run `fn`
+        again instead of sharing the outcome.
+        """
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                if call is not None:
+                    call.followers += 1
+                    self.counters["followers"] += 1
+                    leader = False
+                else:
+                    call = self.calls[key] = _Call()
+                    self.counters["leaders"] += 1
+                    leader = True
+            if leader:
+                break
+
+            if not call.done.wait(self.timeout):
+                raise TimeoutError("Timed out waiting for an identical in-flight request")
+            if call.error is not None and not isinstance(call.error, retry_on):
+                raise call.error
+            if call.finished:
+                return call.result, True
+
+        shared = False
+        try:
+            call.result, shared = self._lead(key, fn, lookup)
+            call.finished = True
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, shared
+
+    def _lead(self, key, fn, lookup):
+        if self.process_lock is None:
+            return fn(), False
+        lock_key = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        with self.process_lock.hold(lock_key, self.timeout) as acquired:
+            if acquired and lookup is not None:
+                result = lookup()
+                if result is not None:
+                    with self.lock:
+                        self.counters["cross_process_hits"] += 1
+                    return result, True
+            # Either we hold the key or we gave up waiting; call upstream.
+            return fn(), False
+
+    def stats(self):
+        with self.lock:
+            return {
+                "mode": type(self.process_lock).__name__ if self.process_lock else "thread",
+                "in_flight": len(self.calls),
+                **self.counters,
+            }
+
+
+_singleflight = None
+_singleflight_lock = threading.Lock()
+
+
+def build_process_lock(mode):
+    if mode == "thread":
+        return None
+    if mode == "file":
+        return FileLock(settings.RECIPE_SINGLEFLIGHT_LOCK_DIR or os.path.join(tempfile.gettempdir(), "yes-chef-singleflight"))
+    if mode == "db":
+        return DatabaseLock()
+    raise ValueError(f"Unknown RECIPE_SINGLEFLIGHT mode: {mode}")
+
+
+def get_singleflight():
+    """
+    Process-wide SingleFlight using the RECIPE_SINGLEFLIGHT setting.
+    """
+    global _singleflight
+    if _singleflight is None:
+        with _singleflight_lock:
+            if _singleflight is None:
+                _singleflight = SingleFlight(
+                    build_process_lock(settings.RECIPE_SINGLEFLIGHT),
+                    timeout=settings.RECIPE_SINGLEFLIGHT_TIMEOUT,
+                )
+    return _singleflight
@@ -1,3 +1,788 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import tempfile
+import threading
+from concurrent.futures import Executor, Future
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import F
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
+
+from core import throttling
+from core.models import DataVersion, Ingredient, Recipe
+
+from . import metrics
+from .cache import (
+    DatabaseBackend, DjangoCacheBackend, MemoryBackend, ResponseCache, cache_key, get_cache,
+)
+from .fakegroq import CANNED_RECIPES, FakeGroqConfig, FakeGroqServer, canned_content
+from .jobs import claim_jobs, run_job
+from .models import GenerationJob, InFlightLease, UpstreamCall
+from .postprocess import RecipeParseError, extract_json, generate_structured
+from .prompts import render_fridge_section
+from .singleflight import DatabaseLock, FileLock, SingleFlight
+from .upstream import (
+    CircuitBreaker, CircuitOpenError, ConcurrencyLimitError, UpstreamClient, UpstreamError, build_payload,
+    get_client, reset_client, stream_completion,
+)
+from .views import generate_recipes_stream
+
+
+class FridgePromptTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='prompt', password='pw')
+        self.milk = Ingredient.objects.create(user=self.user, name='Milk', category='DAIRY',
+                                              expiration_date=date.today() + timedelta(days=1), quantity=1, unit='l')
+
+    def test_section_follows_writes_from_any_worker(self):
+        self.assertEqual(render_fridge_section(self.user), "Milk 1 l (use soon)")
+        with self.assertNumQueries(1):
+            render_fridge_section(self.user)
+        # Written by another worker: no signal reaches this process's cache
+        Ingredient.objects.filter(pk=self.milk.pk).update(name='Oat milk')
+        DataVersion.objects.filter(pk=self.user.pk).update(ingredients=F('ingredients') + 1)
+        self.assertEqual(render_fridge_section(self.user), "Oat milk 1 l (use soon)")
+
+
+class FakeGroqMixin:
+    """
+    Runs a local fake Groq server (recipes_api/fakegroq.py) for the test.
+    """
+    fake_config = {}
+
+    def setUp(self):
+        super().setUp()
+        config = FakeGroqConfig(latency_ms=0, jitter_ms=0, distribution="fixed", token_delay_ms=0,
+                                seed=1, **self.fake_config)
+        self.server = FakeGroqServer(config=config).start()
+        self.addCleanup(self.server.stop)
+
+    def upstream(self, **kwargs):
+        kwargs.setdefault("backoff_base", 0)
+        kwargs.setdefault("backoff_max", 0)
+        client = UpstreamClient(self.server.url, "test", **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+
+class CircuitBreakerTests(FakeGroqMixin, SimpleTestCase):
+    def test_limiter_timeout_does_not_leak_the_half_open_trial(self):
+        client = self.upstream(max_concurrency=1, acquire_timeout=0.01, breaker=CircuitBreaker(1, 0))
+        client.breaker.record_failure()
+        client.limiter.acquire()
+        with self.assertRaises(ConcurrencyLimitError):
+            client.complete({"messages": []})
+        client.limiter.release()
+        self.assertFalse(client.breaker.trial_in_flight)
+        self.assertIn("choices", client.complete({"messages": []}))
+        self.assertEqual(client.breaker.snapshot()["state"], CircuitBreaker.CLOSED)
+
+    def test_open_breaker_releases_the_limiter(self):
+        client = self.upstream(max_concurrency=1, breaker=CircuitBreaker(1, 60))
+        client.breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            client.complete({"messages": []})
+        self.assertEqual(client.stats()["counters"]["rejected"], 1)
+        self.assertTrue(client.limiter.acquire(blocking=False))
+
+
+class StreamBreakerTests(FakeGroqMixin, SimpleTestCase):
+    def stream(self, status):
+        self.server.config.error_rate = 1.0
+        self.server.config.error_status = status
+
+        async def consume():
+            async for _ in stream_completion({"messages": [], "stream": True}):
+                pass
+
+        with override_settings(GROQ_API_URL=self.server.url):
+            reset_client()
+            self.addCleanup(reset_client)
+            with self.assertRaises(httpx.HTTPStatusError):
+                asyncio.run(consume())
+            return get_client().breaker.snapshot()["consecutive_failures"]
+
+    def test_client_errors_are_not_breaker_failures(self):
+        self.assertEqual(self.stream(400), 0)
+
+    def test_server_errors_are_breaker_failures(self):
+        self.assertEqual(self.stream(503), 1)
+
+
+class StreamUsageTests(FakeGroqMixin, SimpleTestCase):
+    def test_usage_comes_from_the_final_chunk(self):
+        payload = build_payload({"model": "m", "prompt": "soup", "max_tokens": 50, "temperature": 0.7,
+                                 "top_p": 0.9}, stream=True)
+        usage = {}
+
+        async def consume():
+            return "".join([text async for text in stream_completion(payload, usage)])
+
+        with override_settings(GROQ_API_URL=self.server.url):
+            reset_client()
+            self.addCleanup(reset_client)
+            text = asyncio.run(consume())
+        self.assertIn("Garlic Butter Chicken", text)
+        self.assertEqual(usage["completion_tokens"], len(text) // 4 + 1)
+        self.assertGreater(usage["prompt_tokens"], 0)
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='ops', password='pw', is_staff=True)
+        self.user = User.objects.create_user(username='cook', password='pw')
+
+    def test_usage_rollup(self):
+        UpstreamCall.objects.bulk_create([
+            UpstreamCall(user=self.user, endpoint="generate_recipes", model="a", upstream_calls=1, upstream_ms=100,
+                         prompt_tokens=10, completion_tokens=20),
+            UpstreamCall(user=self.user, endpoint="generate_recipes", model="a", upstream_calls=2, upstream_ms=300,
+                         prompt_tokens=30, completion_tokens=40),
+            UpstreamCall(user=self.staff, endpoint="stream", model="b", upstream_calls=1, upstream_ms=50),
+        ])
+        old = UpstreamCall.objects.create(user=self.user, endpoint="batch", model="a", upstream_calls=1)
+        UpstreamCall.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(hours=30))
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/recipes/usage/').status_code, 403)
+
+        self.client.force_login(self.staff)
+        rows = self.client.get('/api/recipes/usage/', {'group': 'model'}).json()
+        self.assertEqual([(r['model'], r['requests'], r['upstream_calls'], r['prompt_tokens'], r['completion_tokens'],
+                           r['avg_upstream_ms']) for r in rows],
+                         [("a", 2, 3, 40, 60, 200.0), ("b", 1, 1, 0, 0, 50.0)])
+        rows = self.client.get('/api/recipes/usage/', {'group': 'user', 'hours': 48}).json()
+        self.assertEqual([(r['user__username'], r['requests']) for r in rows], [("cook", 3), ("ops", 1)])
+        self.assertEqual(len(self.client.get('/api/recipes/usage/', {'group': 'hour'}).json()), 1)
+
+        self.assertEqual(self.client.get('/api/recipes/usage/', {'group': 'endpoint'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/recipes/usage/', {'hours': 'all'}).status_code, 400)
+
+    @override_settings(METRICS_TOKEN="scrape")
+    def test_prometheus_metrics(self):
+        recorder = metrics.Recorder()
+        row = {**metrics._new_row("generate_recipes", self.user, "m"),
+               "cache": "MISS", "upstream_calls": 1, "upstream_ms": 300.0, "prompt_tokens": 12}
+        with mock.patch.object(recorder, "_ensure_thread"):
+            recorder.record(row)
+
+        with mock.patch.object(metrics, "recorder", recorder):
+            self.assertEqual(self.client.get('/api/recipes/metrics/').status_code, 403)
+            self.assertEqual(self.client.get('/api/recipes/metrics/', HTTP_AUTHORIZATION="Bearer nope").status_code,
+                             403)
+            self.client.force_login(self.user)
+            self.assertEqual(self.client.get('/api/recipes/metrics/').status_code, 403)
+
+            response = self.client.get('/api/recipes/metrics/', HTTP_AUTHORIZATION="Bearer scrape")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response["Content-Type"].startswith("text/plain"))
+            text = response.content.decode()
+            self.assertIn('yeschef_generation_requests_total{endpoint="generate_recipes",model="m",cache="MISS",'
+                          'outcome="ok"} 1\n', text)
+            self.assertIn('yeschef_upstream_tokens_total{model="m",kind="prompt"} 12\n', text)
+            self.assertIn("yeschef_metrics_buffered_rows 1\n", text)
+
+            self.client.force_login(self.staff)
+            self.assertEqual(self.client.get('/api/recipes/metrics/').content.decode(), text)
+
+
+class RecorderTests(TestCase):
+    def test_failed_flush_counts_dropped_rows(self):
+        recorder = metrics.Recorder()
+        row = metrics._new_row("generate_recipes", None, "m")
+        with mock.patch.object(recorder, "_ensure_thread"):
+            recorder.record(row)
+            recorder.record(dict(row))
+        with mock.patch("recipes_api.models.UpstreamCall.objects.bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                recorder.flush()
+        self.assertEqual(recorder.dropped, 2)
+        self.assertEqual(recorder.buffer, [])
+
+
+@override_settings(RATE_LIMIT_BACKEND="memory", LLM_DAILY_TOKEN_BUDGET=1000, LLM_MAX_CONCURRENT_PER_USER=1,
+                   RATE_LIMITS={"llm": {"capacity": 2, "refill_per_second": 0.001}},
+                   UPSTREAM_METRICS_ENABLED=False)
+class GenerationLimitTests(FakeGroqMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        throttling._stores.clear()
+        self.addCleanup(throttling._stores.clear)
+        self.user = User.objects.create_user(username='limits', password='pw')
+        self.client.force_login(self.user)
+        self.ident = f"user:{self.user.pk}"
+
+    def budget_used(self):
+        key = f"budget:{timezone.now().date().isoformat()}:{self.ident}"
+        return throttling.get_store().update(key, lambda used: (used, used or 0), 60)
+
+    def generate(self, **data):
+        return self.client.post('/api/recipes/', {"max_tokens": 300, **data}, content_type='application/json')
+
+    def test_only_upstream_work_is_charged(self):
+        self.assertEqual(self.generate().status_code, 400)
+        self.assertEqual(self.budget_used(), 0)
+
+        key = cache_key("meta-llama/llama-4-scout-17b-16e-instruct", "soup", 300, 0.7, 0.9)
+        get_cache().set(key, {"text": "cached soup"})
+        self.addCleanup(get_cache().backend.clear)
+        response = self.generate(prompt="soup")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(self.budget_used(), 0)
+
+        # The bucket's two tokens are spent; the rejected request costs nothing
+        self.assertEqual(self.generate(prompt="soup").status_code, 429)
+        self.assertEqual(self.budget_used(), 0)
+
+    def test_max_tokens_is_bounded(self):
+        # A negative cost would credit the budget
+        self.assertEqual(self.generate(prompt="soup", max_tokens=-5000).status_code, 400)
+        self.assertEqual(self.generate(prompt="soup", max_tokens=10 ** 9).status_code, 400)
+        self.assertEqual(self.budget_used(), 0)
+
+    def test_model_fits_the_metrics_column(self):
+        self.assertEqual(self.generate(prompt="soup", model="m" * 101).status_code, 400)
+        self.assertEqual(self.budget_used(), 0)
+
+    def test_cache_miss_is_charged(self):
+        with override_settings(GROQ_API_URL=self.server.url):
+            reset_client()
+            self.addCleanup(reset_client)
+            self.assertEqual(self.generate(prompt="stew")["X-Cache"], "MISS")
+            self.assertEqual(self.budget_used(), 300)
+            response = self.generate(prompt="curry", max_tokens=800)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(self.budget_used(), 300)
+
+    def test_stream_slot_is_taken_when_the_body_is_sent(self):
+        request = AsyncRequestFactory().post('/api/recipes/stream/', {"prompt": "soup"},
+                                             content_type='application/json')
+
+        async def auser():
+            return self.user
+        request.auser = auser
+
+        response = asyncio.run(generate_recipes_stream(request))
+        self.assertEqual(response.status_code, 200)
+        # Never iterated (the client went away): no slot taken, nothing charged
+        self.assertTrue(throttling.slot_available(self.ident, 1))
+        self.assertEqual(self.budget_used(), 0)
+
+        async def consume(response):
+            return [event async for event in response.streaming_content]
+
+        with override_settings(GROQ_API_URL=self.server.url):
+            reset_client()
+            self.addCleanup(reset_client)
+            response = asyncio.run(generate_recipes_stream(request))
+            events = asyncio.run(consume(response))
+        self.assertFalse(any(event.startswith(b"event: error") for event in events))
+        self.assertTrue(throttling.slot_available(self.ident, 1))
+        self.assertEqual(self.budget_used(), 500)
+
+
+@override_settings(RATE_LIMIT_BACKEND="memory", RECIPE_FRIDGE_TOKEN_BUDGET=16, UPSTREAM_METRICS_ENABLED=False)
+class FridgeGenerationTests(FakeGroqMixin, TestCase):
+    options = {"type": "Dinner", "cuisine": "Any", "time": "30 min", "style": "Balanced"}
+
+    def setUp(self):
+        super().setUp()
+        throttling._stores.clear()
+        self.addCleanup(throttling._stores.clear)
+        self.addCleanup(get_cache().backend.clear)
+        self.user = User.objects.create_user(username='fridge', password='pw')
+        self.client.force_login(self.user)
+        today = date.today()
+        for name, days in [('Rice', 30), ('Spinach', 2), ('Yogurt', -1), ('Eggs', 1)]:
+            Ingredient.objects.create(user=self.user, name=name, category='OTHER', quantity=1, unit='pc',
+                                      expiration_date=today + timedelta(days=days))
+        override = override_settings(GROQ_API_URL=self.server.url)
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_client()
+        self.addCleanup(reset_client)
+
+    def generate(self, **data):
+        with mock.patch("recipes_api.generation.build_payload", wraps=build_payload) as payloads:
+            response = self.client.post('/api/recipes/generate/', {**self.options, **data},
+                                        content_type='application/json')
+        self.prompts = [call.args[0]["prompt"] for call in payloads.call_args_list]
+        return response
+
+    def test_expiring_ingredients_are_generated_and_saved(self):
+        response = self.generate(save=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        # The budget fits two items: the two expiring soonest, never the expired one
+        self.assertEqual(len(self.prompts), 1)
+        self.assertIn("Available Ingredients: Eggs 1 pc (use soon), Spinach 1 pc (use soon)\n", self.prompts[0])
+
+        body = response.json()
+        self.assertEqual(body["recipes"], CANNED_RECIPES)
+        saved = Recipe.objects.filter(pk__in=body["saved_ids"], user=self.user).order_by('pk')
+        self.assertEqual([(r.title, r.ingredients, r.steps) for r in saved],
+                         [(r["title"], r["ingredients"], r["steps"]) for r in CANNED_RECIPES])
+
+    def test_empty_fridge_is_rejected_before_going_upstream(self):
+        Ingredient.objects.filter(user=self.user, expiration_date__gte=date.today()).delete()
+        response = self.generate(save=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("non-expired ingredients", response.json()["error"])
+        self.assertEqual(self.prompts, [])
+        self.assertEqual(self.server.stats.snapshot()["requests"], 0)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_malformed_replies_are_never_saved(self):
+        good, second, third = CANNED_RECIPES
+        broken = [
+            {"title": "No steps", "ingredients": [{"name": "eggs", "quantity": "2"}]},
+            {"title": "Loose ingredients", "ingredients": "eggs, spinach", "steps": ["Cook."]},
+        ]
+        replies = [json.dumps([good, *broken]), "```json\n" + json.dumps([second, third]) + "\n```"]
+        with mock.patch("recipes_api.fakegroq.canned_content", side_effect=replies):
+            response = self.generate(save=True)
+        # Repaired: the broken items are dropped and re-asked for
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.prompts), 2)
+        self.assertEqual(response.json()["recipes"], CANNED_RECIPES)
+        self.assertEqual(sorted(Recipe.objects.filter(user=self.user).values_list('title', flat=True)),
+                         sorted(r["title"] for r in CANNED_RECIPES))
+
+        with mock.patch("recipes_api.fakegroq.canned_content", return_value=json.dumps(broken)):
+            response = self.generate(save=True, notes="again")
+        # Rejected: nothing usable after the re-ask
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("usable recipes", response.json()["error"])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+
+class InlineExecutor(Executor):
+    def __init__(self, max_workers=None):
+        pass
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@override_settings(RATE_LIMIT_BACKEND="memory", RECIPE_JOB_MAX_ATTEMPTS=2, UPSTREAM_METRICS_ENABLED=False)
+class GenerationBatchTests(FakeGroqMixin, TransactionTestCase):
+    plan = {
+        "days": 1, "meals": ["Lunch", "Dinner"],
+        "template": {"type": "Dinner", "cuisine": "Italian", "time": "30 min", "style": "Quick"},
+    }
+
+    def setUp(self):
+        super().setUp()
+        throttling._stores.clear()
+        self.addCleanup(throttling._stores.clear)
+        self.addCleanup(get_cache().backend.clear)
+        self.user = User.objects.create_user(username='batches', password='pw')
+        Ingredient.objects.create(user=self.user, name='Tomatoes', category='PRODUCE', quantity=4, unit='pc',
+                                  expiration_date=date.today() + timedelta(days=3))
+        self.client.force_login(self.user)
+
+    def submit(self):
+        response = self.client.post('/api/recipes/batches/', self.plan, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def test_plan_is_queued_and_run_by_the_worker(self):
+        batch = self.submit()
+        self.assertEqual((batch["status"], batch["total"], batch["progress"]), ("queued", 2, 0.0))
+        self.assertEqual([(job["params"]["type"], job["status"]) for job in batch["jobs"]],
+                         [("Lunch", "queued"), ("Dinner", "queued")])
+
+        # Jobs run inline: the in-memory test database can't take writes
+        # from several threads at once
+        with override_settings(GROQ_API_URL=self.server.url), \
+                mock.patch("recipes_api.management.commands.generation_worker.ThreadPoolExecutor", InlineExecutor):
+            reset_client()
+            self.addCleanup(reset_client)
+            stdout = io.StringIO()
+            call_command('generation_worker', '--once', '--concurrency', '2', '--poll-interval', '0.01',
+                         stdout=stdout, stderr=stdout)
+        self.assertIn("Processed 2 job(s)", stdout.getvalue())
+
+        batch = self.client.get(f'/api/recipes/batches/{batch["id"]}/').json()
+        self.assertEqual((batch["status"], batch["completed"], batch["failed"], batch["progress"]), ("done", 2, 0, 1.0))
+        recipe_ids = [pk for job in batch["jobs"] for pk in job["recipe_ids"]]
+        self.assertEqual(set(Recipe.objects.filter(user=self.user).values_list('pk', flat=True)), set(recipe_ids))
+        self.assertTrue(recipe_ids)
+
+        other = User.objects.create_user(username='other', password='pw')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f'/api/recipes/batches/{batch["id"]}/').status_code, 404)
+
+    def test_each_job_is_claimed_once(self):
+        for _ in range(3):
+            self.submit()
+        # Another worker claims four jobs after "a" has read its candidates
+        # but before it updates any of them
+        rival = []
+        now = timezone.now
+
+        def rival_claims_first():
+            if not rival:
+                rival.append(None)
+                rival.extend(claim_jobs("b", 4))
+            return now()
+
+        with mock.patch("django.utils.timezone.now", side_effect=rival_claims_first):
+            claimed = claim_jobs("a", 3)
+        rival = rival[1:]
+        self.assertEqual((len(rival), len(claimed)), (4, 2))
+        self.assertEqual(sorted(rival + claimed), sorted(GenerationJob.objects.values_list('pk', flat=True)))
+        for worker, pks in (("a", claimed), ("b", rival)):
+            self.assertEqual(set(GenerationJob.objects.filter(locked_by=worker).values_list('pk', flat=True)), set(pks))
+        self.assertEqual(set(GenerationJob.objects.values_list('attempts', flat=True)), {1})
+        self.assertEqual(claim_jobs("late", 6), [])
+
+    def test_failed_jobs_are_retried_then_marked_failed(self):
+        self.plan = {**self.plan, "meals": ["Lunch"]}
+        batch = self.submit()
+        job = GenerationJob.objects.get(batch_id=batch["id"])
+        with mock.patch("recipes_api.jobs.run_generation", side_effect=UpstreamError("upstream down")):
+            self.assertEqual(claim_jobs("w", 5), [job.pk])
+            run_job(job.pk)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.error, job.locked_by), ("queued", 1, "upstream down", ""))
+
+            self.assertEqual(claim_jobs("w", 5), [job.pk])
+            run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertEqual(claim_jobs("w", 5), [])
+
+        batch = self.client.get(f'/api/recipes/batches/{batch["id"]}/').json()
+        self.assertEqual((batch["status"], batch["completed"], batch["failed"], batch["progress"]), ("done", 0, 1, 1.0))
+        self.assertEqual(batch["jobs"][0]["error"], "upstream down")
+
+
+class ResponseCacheTests(TestCase):
+    def test_key_normalizes_the_request(self):
+        key = cache_key("Model", "Tomato  soup\n", 100, 0.7, 0.9)
+        self.assertEqual(key, cache_key(" model", "Tomato soup", "100", 0.7000001, 0.9))
+        self.assertNotEqual(key, cache_key("model", "Tomato soup", 100, 0.7, 0.9, structured=True))
+
+    def test_memory_backend_is_an_lru_with_expiry(self):
+        backend = MemoryBackend(ttl=60, max_entries=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        self.assertEqual(backend.get("a"), 1)
+        backend.set("c", 3)
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual((backend.get("a"), backend.get("c"), backend.evictions), (1, 3, 1))
+
+        expired = MemoryBackend(ttl=0, max_entries=2)
+        expired.set("a", 1)
+        self.assertIsNone(expired.get("a"))
+        self.assertEqual(expired.size(), 0)
+
+    def test_database_backend_trims_least_recently_used(self):
+        backend = DatabaseBackend(ttl=60, max_entries=2)
+        backend.set("a", {"text": "a"})
+        backend.set("b", {"text": "b"})
+        self.assertEqual(backend.get("a"), {"text": "a"})
+        backend.set("c", {"text": "c"})
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual((backend.size(), backend.evictions), (2, 1))
+
+        DatabaseBackend(ttl=0, max_entries=2).set("d", {"text": "d"})
+        self.assertIsNone(backend.get("d"))
+
+    def test_django_backend_and_stats(self):
+        response_cache = ResponseCache(DjangoCacheBackend(60, "default"))
+        self.addCleanup(response_cache.backend.cache.clear)
+        self.assertIsNone(response_cache.get("k"))
+        response_cache.set("k", {"text": "soup"})
+        self.assertEqual(response_cache.get("k"), {"text": "soup"})
+        self.assertIsNone(response_cache.get("k", bypass=True))
+        stats = response_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["bypasses"], stats["sets"]), (1, 1, 1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_django_backend_clear_reaches_every_worker(self):
+        backend, other_worker = DjangoCacheBackend(60, "default"), DjangoCacheBackend(60, "default")
+        self.addCleanup(backend.cache.clear)
+        backend.cache.set("unrelated", 1)
+        backend.set("k", {"text": "soup"})
+        self.assertEqual(other_worker.get("k"), {"text": "soup"})
+        other_worker.clear()
+        self.assertIsNone(backend.get("k"))
+        self.assertEqual(backend.cache.get("unrelated"), 1)
+        backend.set("k", {"text": "stew"})
+        self.assertEqual(other_worker.get("k"), {"text": "stew"})
+
+        # The generation counter itself was evicted
+        backend.cache.delete(backend.generation_key)
+        self.assertIsNone(backend.get("k"))
+        backend.clear()
+        self.assertIsNone(other_worker.get("k"))
+
+
+class SingleFlightTests(TestCase):
+    def lock_dir(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return directory.name
+
+    def test_concurrent_calls_share_one_leader(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return {"text": "soup"}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", fn))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while flight.stats()["followers"] < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True])
+        self.assertEqual({result["text"] for result, _ in results}, {"soup"})
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_followers_see_the_leaders_error(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise UpstreamError("boom")
+
+        errors = []
+
+        def call(fn):
+            try:
+                flight.do("k", fn)
+            except UpstreamError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call, args=(fail,))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=call, args=(lambda: None,))
+        follower.start()
+        while flight.stats()["followers"] < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+
+    def test_followers_rerun_after_a_leader_specific_error(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def over_budget():
+            started.set()
+            release.wait(5)
+            raise Throttled(60)
+
+        outcomes = []
+
+        def call(fn):
+            try:
+                outcomes.append(flight.do("k", fn, retry_on=(Throttled,)))
+            except Throttled as e:
+                outcomes.append(e)
+
+        leader = threading.Thread(target=call, args=(over_budget,))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=call, args=(lambda: {"text": "soup"},))
+        follower.start()
+        while flight.stats()["followers"] < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertIsInstance(outcomes[0], Throttled)
+        self.assertEqual(outcomes[1], ({"text": "soup"}, False))
+
+    def test_followers_rerun_after_an_interrupted_leader(self):
+        class Cancelled(BaseException):
+            pass
+
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def interrupted():
+            started.set()
+            release.wait(5)
+            raise Cancelled()
+
+        outcomes = []
+
+        def call(fn):
+            try:
+                outcomes.append(flight.do("k", fn))
+            except Cancelled as e:
+                outcomes.append(e)
+
+        leader = threading.Thread(target=call, args=(interrupted,))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=call, args=(lambda: {"text": "soup"},))
+        follower.start()
+        while flight.stats()["followers"] < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertIsInstance(outcomes[0], Cancelled)
+        self.assertEqual(outcomes[1], ({"text": "soup"}, False))
+
+    def test_cross_process_leader_picks_up_the_cached_result(self):
+        flight = SingleFlight(FileLock(self.lock_dir()))
+        result = flight.do("k", lambda: self.fail("should use the lookup"), lookup=lambda: {"text": "soup"})
+        self.assertEqual(result, ({"text": "soup"}, True))
+        self.assertEqual(flight.stats()["cross_process_hits"], 1)
+
+    def test_file_lock(self):
+        lock = FileLock(self.lock_dir())
+        with lock.hold("k", 1) as held:
+            self.assertTrue(held)
+            # flock() locks belong to the open file, so a second open conflicts
+            with lock.hold("k", 0.1) as again:
+                self.assertFalse(again)
+            with lock.hold("other", 0.1) as other:
+                self.assertTrue(other)
+        with lock.hold("k", 0.1) as held:
+            self.assertTrue(held)
+
+    def test_database_lock(self):
+        lock = DatabaseLock()
+        with lock.hold("k", 30) as held:
+            self.assertTrue(held)
+            with lock.hold("k", 0.1) as again:
+                self.assertFalse(again)
+        self.assertFalse(InFlightLease.objects.exists())
+
+        # A lease left behind by a crashed worker expires
+        InFlightLease.objects.create(key="k", expires_at=timezone.now() - timedelta(seconds=1))
+        with lock.hold("k", 0.1) as held:
+            self.assertTrue(held)
+
+        # A holder that overran its lease leaves the next holder's alone
+        with lock.hold("k", 30) as held:
+            self.assertTrue(held)
+            InFlightLease.objects.filter(key="k").update(token="next-holder")
+        self.assertEqual(list(InFlightLease.objects.values_list("token", flat=True)), ["next-holder"])
+
+
+class PostProcessTests(SimpleTestCase):
+    def test_repairs_fences_and_trailing_commas(self):
+        value, repaired = extract_json(canned_content(malformed=True))
+        self.assertEqual(value, CANNED_RECIPES)
+        self.assertTrue(repaired)
+        self.assertEqual(extract_json(canned_content()), (CANNED_RECIPES, False))
+
+    def test_keeps_the_complete_part_of_a_truncated_reply(self):
+        text = json.dumps(CANNED_RECIPES)
+        value, repaired = extract_json(text[:text.index("Vegetable Fried Rice") + 5])
+        self.assertEqual([r["title"] for r in value], ["Garlic Butter Chicken", "Tomato Basil Pasta"])
+        with self.assertRaises(RecipeParseError):
+            extract_json('[{"title": "Pa')
+
+    def test_reasks_only_for_missing_recipes(self):
+        prompts = []
+
+        def ask(prompt):
+            prompts.append(prompt)
+            return json.dumps(CANNED_RECIPES[2:])
+
+        first = json.dumps(CANNED_RECIPES[:1] + [{"title": "No steps"}] + CANNED_RECIPES[1:2])
+        recipes = generate_structured("Cook", first, ask)
+        self.assertEqual([r["title"] for r in recipes], [r["title"] for r in CANNED_RECIPES])
+        self.assertEqual(len(prompts), 1)
+        self.assertIn('"Garlic Butter Chicken", "Tomato Basil Pasta"', prompts[0])
+        self.assertIn("exactly 1 more", prompts[0])
+
+        with self.assertRaises(RecipeParseError):
+            generate_structured("Cook", "Sorry, I can't help with that.", lambda prompt: "Still no.")
+
+
+class RetryTests(FakeGroqMixin, SimpleTestCase):
+    fake_config = {"error_rate": 1.0}
+
+    def test_transient_errors_are_retried_then_counted(self):
+        client = self.upstream(max_retries=2, breaker=CircuitBreaker(2, 60))
+        with self.assertRaises(UpstreamError) as ctx:
+            client.complete({"messages": []})
+        self.assertEqual(ctx.exception.upstream_status, 503)
+        self.assertEqual(self.server.stats.snapshot()["requests"], 3)
+        self.assertEqual(client.stats()["counters"]["retries"], 2)
+        self.assertEqual(client.breaker.snapshot()["consecutive_failures"], 1)
+
+        # The second failure opens the circuit; later calls never reach the server
+        with self.assertRaises(UpstreamError):
+            client.complete({"messages": []})
+        self.assertEqual(client.breaker.snapshot()["state"], CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            client.complete({"messages": []})
+        self.assertEqual(self.server.stats.snapshot()["requests"], 6)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.config.error_status = 400
+        client = self.upstream(max_retries=2)
+        with self.assertRaises(UpstreamError):
+            client.complete({"messages": []})
+        self.assertEqual(self.server.stats.snapshot()["requests"], 1)
+        self.assertEqual(client.breaker.snapshot()["consecutive_failures"], 0)
+
+
+@override_settings(RATE_LIMITS={"llm": {"capacity": 2, "refill_per_second": 0.001}}, LLM_DAILY_TOKEN_BUDGET=100)
+class ThrottlingTests(SimpleTestCase):
+    def setUp(self):
+        throttling._stores.clear()
+        self.addCleanup(throttling._stores.clear)
+
+    def check_limits(self):
+        self.assertEqual([throttling.take_token("llm", "a") for _ in range(2)], [0, 0])
+        self.assertGreater(throttling.take_token("llm", "a"), 0)
+        self.assertEqual(throttling.take_token("llm", "b"), 0)
+
+        self.assertEqual(throttling.spend_budget("a", 60), 0)
+        self.assertGreater(throttling.spend_budget("a", 50), 0)
+        self.assertEqual(throttling.spend_budget("a", 40), 0)
+        with self.assertRaises(ValueError):
+            throttling.spend_budget("a", -100)
+
+        self.assertTrue(throttling.acquire_slot("a", 1))
+        self.assertFalse(throttling.slot_available("a", 1))
+        self.assertFalse(throttling.acquire_slot("a", 1))
+        throttling.release_slot("a")
+        self.assertTrue(throttling.slot_available("a", 1))
+
+    @override_settings(RATE_LIMIT_BACKEND="memory")
+    def test_memory_store(self):
+        self.check_limits()
+
+    @override_settings(RATE_LIMIT_BACKEND="cache", RATE_LIMIT_CACHE_ALIAS="default")
+    def test_cache_store(self):
+        self.addCleanup(throttling.get_store().cache.clear)
+        self.check_limits()
@@ -0,0 +1,420 @@
+# recipes_api/upstream.py
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_transient(status):
+    # Timeouts, connection errors (no status), 429 and 5xx count against the
+    # breaker; a 4xx caused by our own payload does not.
+    return status is None or status in RETRY_STATUSES
+
+
+class UpstreamError(Exception):
+    status_code = 502
+
+    def __init__(self, message, retry_after=None, upstream_status=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.upstream_status = upstream_status
+
+    @property
+    def is_transient(self):
+        return is_transient(self.upstream_status)
+
+
+class CircuitOpenError(UpstreamError):
+    status_code = 503
+
+
+class ConcurrencyLimitError(UpstreamError):
+    status_code = 503
+
+
+def build_headers():
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {settings.GROQ_API_KEY}"
+    }
+
+
+def build_payload(validated, stream=False):
+    payload = {
+        "model": validated["model"],
+        "messages": [
+            { "role": "user", "content": validated["prompt"] }
+        ],
+        "max_tokens": validated["max_tokens"],
+        "temperature": validated["temperature"],
+        "top_p": validated["top_p"]
+    }
+    if stream:
+        payload["stream"] = True
+        # Ask for a final chunk carrying the token counts
+        payload["stream_options"] = {"include_usage": True}
+    return payload
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds, then lets a single trial call through
+    (half-open) to decide whether to close again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.retry_after() > 0:
+                return False
+            if self.trial_in_flight:
+                return False
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        # The trial call ended without telling us anything (e.g. the client
+        # went away); let the next caller try instead.
+        with self.lock:
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "retry_after": round(self.retry_after(), 2) if self.state != self.CLOSED else 0,
+            }
+
+
+class UpstreamClient:
+    """
+    Shared client for the Groq chat-completions API: a keep-alive
+    connection pool, connect/read timeouts, bounded retries with jittered
+    exponential backoff on 429/5xx, a circuit breaker and a cap on
+    concurrent upstream calls per process.
+    """
+
+    def __init__(self, url, api_key, pool_size=10, connect_timeout=3.05, read_timeout=60.0,
+                 max_retries=2, backoff_base=0.5, backoff_max=8.0, max_concurrency=16,
+                 acquire_timeout=5.0, breaker=None):
+        self.url = url
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = threading.BoundedSemaphore(max_concurrency)
+
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        })
+
+        self.stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.counters = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    def _count(self, key, delta=1):
+        with self.stats_lock:
+            self.counters[key] += delta
+
+    def backoff(self, attempt, retry_after=None):
+        # Full jitter, but never shorter than an explicit Retry-After
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def complete(self, payload):
+        """
+        POST a chat-completion payload and return the decoded JSON body.
+        """
+        queued_at = time.perf_counter()
+        if not self.limiter.acquire(timeout=self.acquire_timeout):
+            self._count("rejected")
+            raise ConcurrencyLimitError("Too many concurrent upstream requests", retry_after=1)
+        # Only ask the breaker once we hold a slot: a half-open trial taken
+        # by a call that then gave up waiting would never be finished.
+        if not self.breaker.allow():
+            self.limiter.release()
+            self._count("rejected")
+            raise CircuitOpenError("Upstream circuit is open", retry_after=self.breaker.retry_after())
+        started = time.perf_counter()
+
+        with self.stats_lock:
+            self.in_flight += 1
+        data = None
+        try:
+            data = self._post_with_retries(payload)
+        except UpstreamError as e:
+            if e.is_transient:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._count("failures")
+            raise
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+        finally:
+            with self.stats_lock:
+                self.in_flight -= 1
+            self.limiter.release()
+            metrics.note_upstream(time.perf_counter() - started, started - queued_at,
+                                  data.get("usage") if isinstance(data, dict) else None)
+        self.breaker.record_success()
+        return data
+
+    def _post_with_retries(self, payload):
+        attempt = 0
+        while True:
+            self._count("requests")
+            retry_after = None
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = UpstreamError(f"Upstream request failed: {e}")
+            else:
+                if response.status_code < 400:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise UpstreamError("Upstream returned invalid JSON", upstream_status=response.status_code)
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                error = UpstreamError(
+                    f"Upstream returned HTTP {response.status_code}",
+                    retry_after=retry_after,
+                    upstream_status=response.status_code,
+                )
+                if not error.is_transient:
+                    raise error
+
+            if attempt >= self.max_retries:
+                raise error
+            time.sleep(self.backoff(attempt, retry_after))
+            attempt += 1
+            self._count("retries")
+
+    def pool_stats(self):
+        pools = []
+        for key in list(self.adapter.poolmanager.pools.keys()):
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                "connections_opened": pool.num_connections,
+                "requests_sent": pool.num_requests,
+                # urllib3 pre-fills the queue with None placeholders
+                "idle_connections": sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0,
+                "max_size": self.pool_size,
+            })
+        return pools
+
+    def stats(self):
+        with self.stats_lock:
+            counters = dict(self.counters)
+            in_flight = self.in_flight
+        return {
+            "url": self.url,
+            "pool": self.pool_stats(),
+            "breaker": self.breaker.snapshot(),
+            "limiter": {"in_flight": in_flight, "max_concurrency": self.max_concurrency},
+            "counters": counters,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def _parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide UpstreamClient built from the GROQ_* settings.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient(
+                    settings.GROQ_API_URL,
+                    settings.GROQ_API_KEY,
+                    pool_size=settings.GROQ_POOL_SIZE,
+                    connect_timeout=settings.GROQ_CONNECT_TIMEOUT,
+                    read_timeout=settings.GROQ_READ_TIMEOUT,
+                    max_retries=settings.GROQ_MAX_RETRIES,
+                    max_concurrency=settings.GROQ_MAX_CONCURRENCY,
+                    breaker=CircuitBreaker(settings.GROQ_BREAKER_THRESHOLD, settings.GROQ_BREAKER_RESET),
+                )
+    return _client
+
+
+def reset_client():
+    """
+    Drop the process-wide client so the next get_client() re-reads settings
+    (used when pointing the app at the local fake server).
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+# One AsyncClient per event loop: httpx pools are bound to the loop that
+# created them, and under uvicorn there is a single loop per worker process.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.GROQ_CONNECT_TIMEOUT, read=settings.GROQ_READ_TIMEOUT),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=100),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def stream_completion(payload, usage=None):
+    """
+    Relay an OpenAI-compatible streaming completion as text deltas. The
+    token counts from the final chunk are copied into `usage` when given.
+    """
+    breaker = get_client().breaker
+    if not breaker.allow():
+        raise CircuitOpenError("Upstream circuit is open", retry_after=breaker.retry_after())
+    try:
+        async for text in _relay(payload, usage):
+            yield text
+    except httpx.HTTPError as e:
+        # Classified like UpstreamClient.complete(): only transient errors
+        # count as failures
+        status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+        if is_transient(status):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except BaseException:
+        breaker.release_trial()
+        raise
+    breaker.record_success()
+
+
+async def _relay(payload, usage=None):
+    client = get_async_client()
+    async with client.stream("POST", settings.GROQ_API_URL, headers=build_headers(), json=payload) as response:
+        if response.status_code >= 400:
+            await response.aread()
+            response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            # OpenAI puts it on the last chunk, Groq also under x_groq
+            counts = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+            if counts and usage is not None:
+                usage.update(counts)
+            choices = chunk.get("choices") or [{}]
+            text = (choices[0].get("delta") or {}).get("content")
+            if text:
+                yield text
+
+
+def sse_event(data, event=None):
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+async def stream_sse(payload, usage=None):
+    """
+    Wrap stream_completion() as Server-Sent Events. An initial comment is
+    flushed straight away so the client sees its first byte before the
+    upstream has produced a token.
+    """
+    yield ": stream opened\n\n"
+    try:
+        async for text in stream_completion(payload, usage):
+            yield sse_event({"text": text})
+    except (httpx.HTTPError, UpstreamError) as e:
+        yield sse_event({"error": str(e)}, event="error")
+        return
+    yield sse_event({}, event="done")
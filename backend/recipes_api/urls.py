@@ -1,7 +1,18 @@
 # recipes_api/urls.py
 from django.urls import path
-from .views import generate_recipes
+from .views import (
+    generate_recipes, generate_recipes_stream, generate_from_fridge, generation_batches, generation_batch_detail,
+    upstream_status, cache_status, usage_rollup, metrics_view,
+)
 
 urlpatterns = [
     path("recipes/", generate_recipes, name="generate_recipes"),
+    path("recipes/stream/", generate_recipes_stream, name="generate_recipes_stream"),
+    path("recipes/generate/", generate_from_fridge, name="generate_from_fridge"),
+    path("recipes/batches/", generation_batches, name="generation_batches"),
+    path("recipes/batches/<int:pk>/", generation_batch_detail, name="generation_batch_detail"),
+    path("recipes/upstream-status/", upstream_status, name="upstream_status"),
+    path("recipes/cache-status/", cache_status, name="cache_status"),
+    path("recipes/usage/", usage_rollup, name="usage_rollup"),
+    path("recipes/metrics/", metrics_view, name="metrics"),
 ]
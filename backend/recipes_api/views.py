@@ -1,21 +1,65 @@
 from django.shortcuts import render
 
 # recipes_api/views.py
-import os
-import requests
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+import json
+import math
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import Throttled
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import RecipeRequestSerializer
+from core.models import Recipe
+from core.signals import recipes_bulk_changed
+from core.throttling import (
+    LLMRateThrottle, acquire_slot, charge_budget, client_ident, limit_concurrency, release_slot, slot_available,
+    spend_budget, take_token,
+)
+from . import metrics
+from .cache import get_cache
+from .generation import run_generation
+from .jobs import submit_batch
+from .models import GenerationBatch
+from .postprocess import RecipeParseError, stats as postprocess_stats
+from .prompts import build_prompt
+from .serializers import (
+    GenerationBatchRequestSerializer, GenerationBatchSerializer, RecipeGenerateSerializer, RecipeRequestSerializer
+)
+from .singleflight import get_singleflight
+from .upstream import UpstreamError, build_payload, get_client, sse_event, stream_sse
 
 #Groq key to be fetched on render
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-if not GROQ_API_KEY:
+if not settings.GROQ_API_KEY:
     raise ImproperlyConfigured("Missing GROQ_API_KEY environment variable")
 
+def generation_response(result, x_cache, **extra):
+    body = {"choices": [{"text": result["text"]}]}
+    if "recipes" in result:
+        body["recipes"] = result["recipes"]
+    body.update(extra)
+    return Response(body, status=status.HTTP_200_OK, headers={"X-Cache": x_cache})
+
+
+def generation_error_response(e):
+    if isinstance(e, UpstreamError):
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+        return Response({"error": str(e)}, status=e.status_code, headers=headers)
+    if isinstance(e, RecipeParseError):
+        return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+    return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([LLMRateThrottle])
+@limit_concurrency
 def generate_recipes(request):
     serializer = RecipeRequestSerializer(data=request.data)
     if not serializer.is_valid():
@@ -23,27 +67,204 @@ def generate_recipes(request):
 
     validated = serializer.validated_data
     try:
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {GROQ_API_KEY}"
-        }
-        payload = {
-            "model": validated["model"],
-            "messages": [
-                { "role": "user", "content": validated["prompt"] }
-            ],
-            "max_tokens": validated["max_tokens"],
-            "temperature": validated["temperature"],
-            "top_p": validated["top_p"]
-        }
-
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-
-        data = response.json()
-        ai_text = data["choices"][0]["message"]["content"]
-        return Response({"choices": [{"text": ai_text}]}, status=status.HTTP_200_OK)
+        with metrics.track("generate_recipes", request.user, validated["model"]):
+            result, x_cache = run_generation(validated, structured=validated["structured"],
+                                             charge=lambda: charge_budget(request, validated["max_tokens"]))
+    except Throttled:
+        raise
+    except Exception as e:
+        return generation_error_response(e)
+    return generation_response(result, x_cache)
+
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle_classes([LLMRateThrottle])
+@limit_concurrency
+def generate_from_fridge(request):
+    """
+    Generate recipes from form options only; the prompt is built on the
+    server from the user's fridge, allergies and dietary preferences.
+    Replies are repaired and validated, and can be saved to the cookbook
+    straight away with "save": true.
+    """
+    serializer = RecipeGenerateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    validated = serializer.validated_data
+    prompt = build_prompt(request.user, validated)
+    if prompt is None:
+        return Response(
+            {"error": "You don't have any non-expired ingredients. Please add some fresh ingredients to your fridge first."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        with metrics.track("generate_from_fridge", request.user, validated["model"]):
+            result, x_cache = run_generation({**validated, "prompt": prompt}, structured=True,
+                                             charge=lambda: charge_budget(request, validated["max_tokens"]))
+    except Throttled:
+        raise
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return generation_error_response(e)
+
+    extra = {}
+    if validated["save"]:
+        saved = Recipe.objects.bulk_create([
+            Recipe(user=request.user, title=r["title"], ingredients=r["ingredients"], steps=r["steps"])
+            for r in result["recipes"]
+        ])
+        extra["saved_ids"] = [recipe.pk for recipe in saved]
+        recipes_bulk_changed.send(sender=Recipe, user_id=request.user.id, recipes=saved)
+    return generation_response(result, x_cache, **extra)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle_classes([LLMRateThrottle])
+def generation_batches(request):
+    """
+    Queue a batch of generations (or a meal-week plan) for the
+    generation_worker and return immediately; poll the batch for progress.
+    """
+    serializer = GenerationBatchRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    jobs = serializer.validated_data['jobs']
+    charge_budget(request, sum(job['max_tokens'] for job in jobs))
+    batch = submit_batch(request.user, jobs)
+    return Response(GenerationBatchSerializer(batch).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def generation_batch_detail(request, pk):
+    try:
+        batch = GenerationBatch.objects.prefetch_related('jobs').get(pk=pk, user=request.user)
+    except GenerationBatch.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    return Response(GenerationBatchSerializer(batch).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def upstream_status(request):
+    """
+    Connection pool, circuit breaker, limiter, request-coalescing and
+    post-processing state of this process's upstream client, for operators.
+    """
+    return Response({
+        **get_client().stats(),
+        "singleflight": get_singleflight().stats(),
+        "postprocess": postprocess_stats.snapshot(),
+    })
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_status(request):
+    """
+    Hit/miss counters and size of the generated-recipe response cache.
+    """
+    return Response(get_cache().stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def usage_rollup(request):
+    """
+    Requests, upstream calls, tokens and average latency grouped by
+    ?group=user|model|hour over the last ?hours=24.
+    """
+    group = request.GET.get('group', 'user')
+    if group not in metrics.GROUPS:
+        return Response({'error': f"group must be one of {', '.join(metrics.GROUPS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        hours = int(request.GET.get('hours', 24))
+    except ValueError:
+        return Response({'error': 'hours must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(metrics.rollup(group, timezone.now() - timedelta(hours=hours)))
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of this process's generation metrics. Open
+    to staff sessions, or to scrapers presenting settings.METRICS_TOKEN.
+    """
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and request.headers.get("Authorization") == f"Bearer {token}":
+        authorized = True
+    if not authorized:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(metrics.prometheus_text(), content_type="text/plain; version=0.0.4")
+
+
+@require_POST
+async def generate_recipes_stream(request):
+    """
+    Streaming variant of generate_recipes. Relays upstream tokens as
+    Server-Sent Events; must be served over ASGI (backend/asgi.py) so each
+    open stream costs a coroutine rather than a worker thread.
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = RecipeRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Same limits, in the same order, as the DRF views (token bucket,
+    # concurrency, then the budget), checked by hand since this is a plain
+    # async Django view
+    user = await request.auser()
+    ident = client_ident(request, user)
+    limit = settings.LLM_MAX_CONCURRENT_PER_USER
+    busy = "Too many concurrent generations. Wait for one to finish."
+    wait = await sync_to_async(take_token)('llm', ident)
+    if wait:
+        return JsonResponse({"detail": "Request was throttled."}, status=status.HTTP_429_TOO_MANY_REQUESTS,
+                            headers={"Retry-After": str(math.ceil(wait))})
+    if not await sync_to_async(slot_available)(ident, limit):
+        return JsonResponse({"detail": busy}, status=status.HTTP_429_TOO_MANY_REQUESTS,
+                            headers={"Retry-After": "1"})
+
+    payload = build_payload(serializer.validated_data, stream=True)
+
+    async def events():
+        # The slot is only taken, and the budget only charged, once the
+        # response is being sent: a client that goes away before that never
+        # starts the generator, so its finally (and the release) would never
+        # run and it would pay for a generation it never got.
+        if not await sync_to_async(acquire_slot)(ident, limit):
+            yield sse_event({"error": busy}, event="error")
+            return
+        wait = await sync_to_async(spend_budget)(ident, payload["max_tokens"])
+        if wait:
+            await sync_to_async(release_slot)(ident)
+            yield sse_event({"error": "Daily token budget exceeded.", "retry_after": math.ceil(wait)}, event="error")
+            return
+        started = time.perf_counter()
+        outcome = "ok"
+        usage = {}
+        try:
+            async for event in stream_sse(payload, usage):
+                if event.startswith("event: error"):
+                    outcome = "UpstreamError"
+                yield event
+        except BaseException:
+            outcome = "disconnected"
+            raise
+        finally:
+            await sync_to_async(release_slot)(ident)
+            metrics.record_stream(user, payload["model"], time.perf_counter() - started, outcome, usage)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -11,6 +11,18 @@ interface Ingredient {
   unit: string
 }
 
+interface SummaryBucket {
+  count: number
+  quantities: Record<string, number>
+}
+
+interface FridgeSummary {
+  date: string
+  total: number
+  conditions: Record<'expired' | 'expiring_soon' | 'expiring_week' | 'good', SummaryBucket>
+  categories: Record<string, SummaryBucket & Record<string, number>>
+}
+
 interface IngredientsState {
   ingredients: Ingredient[]
   loading: boolean
@@ -19,6 +31,7 @@ interface IngredientsState {
   totalPages: number
   nextPage: number | null
   previousPage: number | null
+  summary: FridgeSummary | null
 }
 
 export const useIngredientsStore = defineStore('ingredients', {
@@ -29,7 +42,8 @@ export const useIngredientsStore = defineStore('ingredients', {
     currentPage: 1,
     totalPages: 1,
     nextPage: null,
-    previousPage: null
+    previousPage: null,
+    summary: null
   }),
 
   actions: {
@@ -62,6 +76,15 @@ export const useIngredientsStore = defineStore('ingredients', {
       }
     },
 
+    async fetchSummary() {
+      try {
+        const response = await apiClient.get('/ingredients/summary/')
+        this.summary = response.data
+      } catch (error) {
+        console.error('Failed to fetch fridge summary:', error)
+      }
+    },
+
     async addIngredient(ingredient: Omit<Ingredient, 'id'>) {
       try {
         // Get CSRF token before making the request
@@ -75,6 +98,18 @@ export const useIngredientsStore = defineStore('ingredients', {
       }
     },
 
+    async addIngredients(ingredients: Omit<Ingredient, 'id'>[]) {
+      try {
+        await apiClient.get('/auth/csrf/')
+        const response = await apiClient.post('/ingredients/bulk/', ingredients)
+        this.ingredients.push(...response.data)
+        return true
+      } catch (error) {
+        console.error('Failed to add ingredients:', error)
+        return false
+      }
+    },
+
     async updateIngredient(id: number, ingredient: Partial<Ingredient>) {
       try {
         // Get CSRF token before making the request
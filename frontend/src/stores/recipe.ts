@@ -18,6 +18,14 @@ export interface Recipe {
   favorite?: boolean
 }
 
+export interface RecipePage {
+  results: Recipe[]
+  current_page: number
+  num_pages: number
+  next_page: number | null
+  previous_page: number | null
+}
+
 interface RecipesState {
   recipes: Recipe[]
   loading: boolean
@@ -25,7 +33,7 @@ interface RecipesState {
   currentPage: number
   totalPages: number
   nextPage: number | null
-  previousPage: null
+  previousPage: number | null
 }
 
 // Optional: for protected routes
@@ -56,6 +64,15 @@ export const useRecipesStore = defineStore('recipes', {
   }),
 
   actions: {
+    setPage(page: RecipePage) {
+      this.recipes = page.results
+      this.currentPage = page.current_page
+      this.totalPages = page.num_pages
+      this.nextPage = page.next_page
+      this.previousPage = page.previous_page
+      this.error = null
+    },
+
     async fetchRecipes(params: { page?: number; search?: string; favorite?: boolean } = {}) {
       this.loading = true
       try {
@@ -66,12 +83,7 @@ export const useRecipesStore = defineStore('recipes', {
         })
 
         const response = await apiClient.get(`/save-recipe/?${queryParams.toString()}`)
-        this.recipes = response.data.results
-        this.currentPage = response.data.current_page
-        this.totalPages = response.data.num_pages
-        this.nextPage = response.data.next_page
-        this.previousPage = response.data.previous_page
-        this.error = null
+        this.setPage(response.data)
       } catch (error) {
         console.error('Failed to fetch recipes:', error)
         this.error = 'Failed to fetch recipes'
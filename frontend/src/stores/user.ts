@@ -1,5 +1,7 @@
 import { defineStore } from 'pinia'
 import { apiClient } from '@/api' // Import the configured apiClient instance
+import { useIngredientsStore } from './ingredients'
+import { useRecipesStore } from './recipe'
 
 interface User {
   id: number
@@ -37,11 +39,17 @@ export const useUserStore = defineStore('user', {
       if (this.isInitialized) return
       
       try {
-        // First get CSRF token
-        await apiClient.get('/auth/csrf/')
-        
-        // Then check auth status
-        await this.checkAuth()
+        // CSRF token, session user, fridge summary and the first recipe
+        // page in one request
+        const response = await apiClient.get('/auth/bootstrap/')
+        const data = response.data
+        if (data.user && data.account) {
+          this.user = data.user
+          this.account = data.account
+          this.isAuthenticated = true
+          useIngredientsStore().summary = data.summary
+          useRecipesStore().setPage(data.recipes)
+        }
       } catch (error) {
         console.error('Failed to initialize auth:', error)
         // Don't clear auth on initialization failure